@@ -9,6 +9,17 @@ import sys
 import subprocess
 import tempfile
 import json
+import hashlib
+import functools
+import io
+import contextlib
+import asyncio
+import contextvars
+import inspect
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -19,12 +30,33 @@ load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file_
 MODEL = os.getenv("TEST_MODEL") or os.getenv("MODEL_ID") or "glm-5"
 
 
+def has_api_key():
+    """True when an API key for the LLM tier is configured."""
+    return bool(os.getenv("TEST_API_KEY") or os.getenv("ANTHROPIC_API_KEY"))
+
+
+def llm_test(fn):
+    """Mark a test as needing the model; run_tests prunes these without a key."""
+    fn.llm = True
+    return fn
+
+
+def serial_test(fn):
+    """Mark a test that patches shared module state; run_tests never overlaps it."""
+    fn.serial = True
+    return fn
+
+
+@functools.lru_cache(maxsize=1)
 def get_client():
     """Get Anthropic client configured for testing.
 
     Tries TEST_API_KEY first, falls back to ANTHROPIC_API_KEY from .env.
     Returns None if neither is set (tests will SKIP).
     Clears ANTHROPIC_AUTH_TOKEN to avoid conflicts with third-party endpoints.
+
+    Cached: every test in the process shares one client, and its keep-alive
+    connection pool, instead of paying a fresh TCP+TLS handshake per test.
     """
     from anthropic import Anthropic
 
@@ -37,6 +69,102 @@ def get_client():
     return Anthropic(api_key=api_key, base_url=base_url)
 
 
+def get_async_client():
+    """AsyncAnthropic counterpart of get_client(); None without an API key.
+
+    Not cached: an async client's connection pool is bound to the event loop
+    it was first used on, so each test creates its own.
+    """
+    from anthropic import AsyncAnthropic
+
+    api_key = os.getenv("TEST_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
+    base_url = os.getenv("TEST_BASE_URL") or os.getenv("ANTHROPIC_BASE_URL") or "https://open.bigmodel.cn/api/anthropic"
+    if not api_key:
+        return None
+
+    os.environ.pop("ANTHROPIC_AUTH_TOKEN", None)
+    client = AsyncAnthropic(api_key=api_key, base_url=base_url)
+    if llm_batching():
+        return _loop_batcher(client)
+    return client
+
+
+def llm_batching():
+    """True when LLM_BATCH=1 routes async model calls through the Message Batches API."""
+    return os.getenv("LLM_BATCH") == "1"
+
+
+# One batcher per event loop, so every test gathered on that loop shares it
+_BATCHERS = weakref.WeakKeyDictionary()
+
+
+def _loop_batcher(client):
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return BatchingAsyncClient(client)
+    if loop not in _BATCHERS:
+        _BATCHERS[loop] = BatchingAsyncClient(client)
+    return _BATCHERS[loop]
+
+
+class BatchingAsyncClient:
+    """Stand-in for AsyncAnthropic whose messages.create goes through a Message Batch.
+
+    Calls arriving within `window` seconds of the first pending one are sent
+    as a single batch, which is polled with exponential backoff; each caller
+    then gets its own Message back, so run_agent_async (and its disk cache)
+    work unchanged. Batches are billed at half price but may take minutes,
+    which suits CI throughput rather than interactive runs.
+    """
+
+    def __init__(self, client, window=0.5):
+        self._client = client
+        self._window = window
+        self._pending = []  # (params, future)
+        self._flush = None
+        self.messages = self  # So callers can keep writing client.messages.create(...)
+
+    async def create(self, **params):
+        # Snapshot now: run_agent_async keeps appending to the same messages list
+        params["messages"] = [{"role": m["role"], "content": _to_plain(m["content"])}
+                              for m in params["messages"]]
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((params, future))
+        if self._flush is None:
+            self._flush = asyncio.ensure_future(self._flush_after_window())
+        return await future
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self._window)
+        pending, self._pending, self._flush = self._pending, [], None
+        try:
+            results = await self._run_batch([params for params, _ in pending])
+        except Exception as e:
+            results = {str(i): e for i in range(len(pending))}
+        for i, (_, future) in enumerate(pending):
+            result = results.get(str(i), RuntimeError("batch returned no result"))
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            elif result.type != "succeeded":
+                future.set_exception(RuntimeError(f"batch request {result.type}: {getattr(result, 'error', '')}"))
+            else:
+                future.set_result(result.message)
+
+    async def _run_batch(self, requests):
+        """Submit requests as one batch, wait for it to end, return {custom_id: result}."""
+        batches = self._client.messages.batches
+        batch = await batches.create(requests=[
+            {"custom_id": str(i), "params": params} for i, params in enumerate(requests)
+        ])
+        delay = 1.0
+        while batch.processing_status != "ended":
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60.0)
+            batch = await batches.retrieve(batch.id)
+        return {entry.custom_id: entry.result async for entry in await batches.results(batch.id)}
+
+
 # =============================================================================
 # Tool Definitions (Anthropic format)
 # =============================================================================
@@ -397,18 +525,104 @@ def execute_tool(name, args, workdir=None, **kwargs):
 # Agent Loop Runner
 # =============================================================================
 
+DEFAULT_SYSTEM = "You are a coding agent. Use tools to complete tasks."
+
+# On-disk cache of LLM runs: cached model outputs, fresh assertions.
+# LLM_CACHE=off disables it, LLM_CACHE=refresh re-records every entry.
+LLM_CACHE_DIR = Path(os.path.dirname(os.path.abspath(__file__))).parent / ".llm_cache"
+
+# Stands in for the per-run temp workdir in cache keys and recordings
+WORKDIR_TOKEN = "<WORKDIR>"
+
+
+def _mask_workdir(text, workdir):
+    """Replace workdir in text (a prompt or a JSON recording) with WORKDIR_TOKEN."""
+    if not workdir:
+        return text
+    return text.replace(json.dumps(str(workdir))[1:-1], WORKDIR_TOKEN)
+
+
+def _cache_key(task, tools, system, max_turns, workdir=None):
+    """Hash everything the model sees, including full tool schemas.
+
+    Editing a tool's description or input_schema changes the key, so stale
+    recordings are never replayed against a different tool surface. The
+    workdir is masked out, so prompts naming a fresh tempfile dir still
+    hit the cache on the next run.
+    """
+    payload = json.dumps({
+        "model": MODEL,
+        "prompt": _mask_workdir(task, workdir),
+        "system": _mask_workdir(system, workdir),
+        "tools": sorted(tools, key=lambda t: t["name"]),
+        "max_turns": max_turns,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _to_plain(content):
+    """Convert SDK content blocks to plain dicts so messages can be stored as JSON."""
+    if isinstance(content, list):
+        return [b.model_dump() if hasattr(b, "model_dump") else b for b in content]
+    return content
+
+
+def _cache_path(task, tools, system_prompt, max_turns, workdir=None):
+    """Cache file for this run, or None when LLM_CACHE=off."""
+    if os.getenv("LLM_CACHE", "on") == "off":
+        return None
+    return LLM_CACHE_DIR / f"{_cache_key(task, tools, system_prompt, max_turns, workdir)}.json"
+
+
+def _cache_replay(path, workdir, ctx):
+    """Return a cached (text, calls, messages), replaying its tool calls, or None."""
+    if path is None or os.getenv("LLM_CACHE") == "refresh" or not path.exists():
+        return None
+    recording = path.read_text()
+    if workdir:
+        recording = recording.replace(WORKDIR_TOKEN, json.dumps(str(workdir))[1:-1])
+    cached = json.loads(recording)
+    if ctx is None:
+        ctx = {}
+    calls = [(name, args) for name, args in cached["calls"]]
+    for name, args in calls:
+        execute_tool(name, args, workdir=workdir, ctx=ctx)
+    return cached["text"], calls, cached["messages"]
+
+
+def _cache_store(path, result, workdir=None):
+    if path is None:
+        return
+    text, calls, messages = result
+    LLM_CACHE_DIR.mkdir(exist_ok=True)
+    path.write_text(_mask_workdir(json.dumps({
+        "text": text,
+        "calls": calls,
+        "messages": [{"role": m["role"], "content": _to_plain(m["content"])} for m in messages],
+    }), workdir))
+
+
 def run_agent(client, task, tools, system=None, max_turns=10, workdir=None, ctx=None):
-    """Run agent loop using Anthropic messages API.
+    """Run agent loop using Anthropic messages API, memoized on disk.
 
     Returns (final_text, tool_calls_made, messages).
     tool_calls_made is a list of (tool_name, tool_input) tuples.
+
+    On a cache hit the recorded tool calls are replayed through execute_tool,
+    so files and ctx state the test asserts on are still produced.
     """
+    system_prompt = system or DEFAULT_SYSTEM
+    path = _cache_path(task, tools, system_prompt, max_turns, workdir)
+    cached = _cache_replay(path, workdir, ctx)
+    if cached:
+        return cached
+
     messages = [{"role": "user", "content": task}]
-    system_prompt = system or "You are a coding agent. Use tools to complete tasks."
     tool_calls_made = []
     if ctx is None:
         ctx = {}
 
+    result = None, tool_calls_made, messages
     for _ in range(max_turns):
         response = client.messages.create(
             model=MODEL,
@@ -417,54 +631,139 @@ def run_agent(client, task, tools, system=None, max_turns=10, workdir=None, ctx=
             tools=tools,
             max_tokens=2000,
         )
+        text = _apply_turn(response, messages, tool_calls_made, workdir, ctx)
+        if text is not None:
+            result = text, tool_calls_made, messages
+            break
+
+    _cache_store(path, result, workdir)
+    return result
+
 
-        if response.stop_reason != "tool_use":
-            text = ""
-            for block in response.content:
-                if hasattr(block, "text"):
-                    text += block.text
-            return text, tool_calls_made, messages
+async def run_agent_async(client, task, tools, system=None, max_turns=10, workdir=None, ctx=None):
+    """Async twin of run_agent for an AsyncAnthropic client (see get_async_client).
 
-        tool_uses = [b for b in response.content if b.type == "tool_use"]
-        results = []
-        for tc in tool_uses:
-            tool_calls_made.append((tc.name, tc.input))
-            output = execute_tool(tc.name, tc.input, workdir=workdir, ctx=ctx)
-            results.append({
-                "type": "tool_result",
-                "tool_use_id": tc.id,
-                "content": output[:5000],
-            })
+    Lets independent LLM tests overlap their network waits under asyncio.
+    Shares run_agent's on-disk cache.
+    """
+    system_prompt = system or DEFAULT_SYSTEM
+    path = _cache_path(task, tools, system_prompt, max_turns, workdir)
+    cached = _cache_replay(path, workdir, ctx)
+    if cached:
+        return cached
 
-        messages.append({"role": "assistant", "content": response.content})
-        messages.append({"role": "user", "content": results})
+    messages = [{"role": "user", "content": task}]
+    tool_calls_made = []
+    if ctx is None:
+        ctx = {}
 
-    return None, tool_calls_made, messages
+    result = None, tool_calls_made, messages
+    for _ in range(max_turns):
+        response = await client.messages.create(
+            model=MODEL,
+            system=system_prompt,
+            messages=messages,
+            tools=tools,
+            max_tokens=2000,
+        )
+        text = _apply_turn(response, messages, tool_calls_made, workdir, ctx)
+        if text is not None:
+            result = text, tool_calls_made, messages
+            break
+
+    _cache_store(path, result, workdir)
+    return result
+
+
+def _apply_turn(response, messages, tool_calls_made, workdir, ctx):
+    """Handle one model response: return final text, or run its tools and return None."""
+    if response.stop_reason != "tool_use":
+        text = ""
+        for block in response.content:
+            if hasattr(block, "text"):
+                text += block.text
+        return text
+
+    tool_uses = [b for b in response.content if b.type == "tool_use"]
+    results = []
+    for tc in tool_uses:
+        tool_calls_made.append((tc.name, tc.input))
+        output = execute_tool(tc.name, tc.input, workdir=workdir, ctx=ctx)
+        results.append({
+            "type": "tool_result",
+            "tool_use_id": tc.id,
+            "content": output[:5000],
+        })
+
+    messages.append({"role": "assistant", "content": response.content})
+    messages.append({"role": "user", "content": results})
+    return None
 
 
 # =============================================================================
 # Test Runner
 # =============================================================================
 
-def run_tests(tests):
-    """Run a list of test functions with consistent formatting."""
-    failed = []
-    for test_fn in tests:
-        name = test_fn.__name__
-        print(f"\n{'='*60}")
-        print(f"Running: {name}")
-        print('=' * 60)
-        try:
-            if not test_fn():
-                failed.append(name)
-        except Exception as e:
-            print(f"FAILED: {e}")
-            import traceback
-            traceback.print_exc()
-            failed.append(name)
+def run_tests(tests, llm_tests=(), workers=1, llm_workers=None):
+    """Run a list of test functions with consistent formatting.
+
+    Tests are split into two tiers. Pure tests run first: those marked
+    @serial_test (they patch module globals) one at a time, the rest on a
+    ThreadPoolExecutor of `workers` threads. Then the LLM tier (tests marked
+    @llm_test, plus anything passed as llm_tests): `async def` tests are
+    gathered on one event loop and plain ones share a thread pool, at most
+    llm_workers at a time, overlapping API latency while staying under rate
+    limits. LLM_CONCURRENCY overrides the default limit of 4; with LLM_BATCH=1
+    every async test gathers at once so their calls share a Message Batch
+    (see BatchingAsyncClient). Output is captured per test and printed in
+    list order.
+
+    The LLM tier is dropped before dispatch when no API key is set.
+    """
+    order = list(tests) + list(llm_tests)
+    llm_tests = [fn for fn in order if getattr(fn, "llm", False) or fn in llm_tests]
+    pure = [fn for fn in order if fn not in llm_tests]
+    llm_workers = llm_workers or int(os.getenv("LLM_CONCURRENCY", "4"))
+    skipped = []
+    if not has_api_key():
+        skipped = [fn for fn in llm_tests if getattr(fn, "llm", False)]
+        llm_tests = [fn for fn in llm_tests if fn not in skipped]
+        if skipped:
+            print(f"SKIPPED {len(skipped)} LLM tests (no API key)")
+
+    by_name = {}
+    if workers > 1:
+        serial = [fn for fn in pure if getattr(fn, "serial", False)]
+        parallel = [fn for fn in pure if fn not in serial]
+        with _routed_stdout():
+            for fn in serial:
+                by_name[fn.__name__] = _invoke(fn)
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                for r in ex.map(_invoke, parallel):
+                    by_name[r[0]] = r
+    else:
+        for fn in pure:
+            by_name[fn.__name__] = _invoke_live(fn)
+    if llm_tests:
+        async_tests = [fn for fn in llm_tests if inspect.iscoroutinefunction(fn)]
+        sync_tests = [fn for fn in llm_tests if not inspect.iscoroutinefunction(fn)]
+        with _routed_stdout():
+            if async_tests:
+                limit = len(async_tests) if llm_batching() else llm_workers
+                for r in asyncio.run(_gather_async(async_tests, limit)):
+                    by_name[r[0]] = r
+            with ThreadPoolExecutor(max_workers=llm_workers) as ex:
+                for r in ex.map(_invoke, sync_tests):
+                    by_name[r[0]] = r
+
+    ran = [by_name[fn.__name__] for fn in order if fn.__name__ in by_name]
+    failed = [name for name, ok, _ in ran if not ok]
+    # Captured test logs go out in one write, not one (or more) per test
+    sys.stdout.write("".join(output for _, _, output in ran))
 
     print(f"\n{'='*60}")
-    print(f"Results: {len(tests) - len(failed)}/{len(tests)} passed")
+    print(f"Results: {len(ran) - len(failed)}/{len(ran)} passed"
+          + (f" ({len(skipped)} LLM tests skipped)" if skipped else ""))
     print('=' * 60)
 
     if failed:
@@ -473,3 +772,124 @@ def run_tests(tests):
     else:
         print("All tests passed!")
         return True
+
+
+# Fallback scratch directory for tests run without the harness (scratch=None)
+_DEFAULT_SCRATCH = tempfile.TemporaryDirectory(prefix="tests_scratch_")
+
+
+def new_inbox(scratch=None):
+    """Return a fresh inbox path inside scratch (or the shared fallback dir)."""
+    base = scratch or Path(_DEFAULT_SCRATCH.name)
+    return base / f"{uuid.uuid4().hex}.jsonl"
+
+
+def add_mate(tm, team, name, scratch=None, **kw):
+    """Register a Teammate with a fresh inbox in tm's team and return it.
+
+    The Teammate class comes from tm's own module, so one helper serves
+    every v8 variant.
+    """
+    teammate_cls = sys.modules[type(tm).__module__].Teammate
+    mate = teammate_cls(name=name, team_name=team, inbox_path=new_inbox(scratch), **kw)
+    tm._teams[team][name] = mate
+    return mate
+
+
+def _header(name):
+    print(f"\n{'='*60}")
+    print(f"Running: {name}")
+    print('=' * 60)
+
+
+def _fail(e):
+    print(f"FAILED: {e}")
+    import traceback
+    traceback.print_exc(file=sys.stdout)
+    return False
+
+
+def _run_one_test(test_fn):
+    """Run a test; tests taking a `scratch` argument get a fresh temp dir."""
+    _header(test_fn.__name__)
+    try:
+        with contextlib.ExitStack() as stack:
+            kwargs = {}
+            if "scratch" in inspect.signature(test_fn).parameters:
+                kwargs["scratch"] = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+            if inspect.iscoroutinefunction(test_fn):
+                return bool(asyncio.run(test_fn(**kwargs)))
+            return bool(test_fn(**kwargs))
+    except Exception as e:
+        return _fail(e)
+
+
+def _invoke_live(test_fn):
+    """Run a test printing straight to stdout. Returns (name, ok, "")."""
+    return test_fn.__name__, _run_one_test(test_fn), ""
+
+
+def _invoke(test_fn):
+    """Run a test with its output captured. Returns (name, ok, output)."""
+    buf = io.StringIO()
+    with _capture(buf):
+        ok = _run_one_test(test_fn)
+    return test_fn.__name__, ok, buf.getvalue()
+
+
+async def _gather_async(tests, limit):
+    sem = asyncio.Semaphore(limit)
+
+    async def invoke(test_fn):
+        async with sem:
+            buf = io.StringIO()
+            with _capture(buf):
+                _header(test_fn.__name__)
+                try:
+                    ok = bool(await test_fn())
+                except Exception as e:
+                    ok = _fail(e)
+            return test_fn.__name__, ok, buf.getvalue()
+
+    return await asyncio.gather(*(invoke(fn) for fn in tests))
+
+
+# Buffer that the current thread / asyncio task is capturing into, if any
+_capture_buf = contextvars.ContextVar("capture_buf", default=None)
+
+
+class _RoutedStdout:
+    """sys.stdout stand-in that routes writes to the current context's buffer."""
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+
+    def write(self, text):
+        return (_capture_buf.get() or self.fallback).write(text)
+
+    def flush(self):
+        pass
+
+
+@contextlib.contextmanager
+def _routed_stdout():
+    original = sys.stdout
+    sys.stdout = _RoutedStdout(original)
+    try:
+        yield
+    finally:
+        sys.stdout = original
+
+
+@contextlib.contextmanager
+def _capture(buf):
+    """Capture stdout into buf: per thread/task under _routed_stdout, else globally."""
+    if isinstance(sys.stdout, _RoutedStdout):
+        token = _capture_buf.set(buf)
+        try:
+            yield
+        finally:
+            _capture_buf.reset(token)
+    else:
+        with contextlib.redirect_stdout(buf):
+            yield
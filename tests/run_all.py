@@ -1,25 +1,85 @@
-"""Run all per-session test files."""
+"""Run all per-session test files.
+
+Each session runs in its own Python process, so no state leaks between
+sessions and a hung session is killed after 600s. Sessions run concurrently;
+each child's output is buffered and printed once it finishes so logs don't
+interleave. Pass --serial to run them one at a time with live output (useful
+when debugging a hang), and --refresh to re-record the on-disk LLM cache (see
+tests/helpers.py).
+"""
+import os
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 SESSIONS = ["v0", "v1", "v2", "v3", "v4", "v5", "v6", "v7", "v8a", "v8b", "v8c", "v9", "unit"]
+TIMEOUT = 600
+
 
-failed = []
-for session in SESSIONS:
+def _header(session):
     print(f"\n{'#' * 70}")
     print(f"# Running test_{session}.py")
     print('#' * 70)
-    result = subprocess.run(
-        [sys.executable, f"tests/test_{session}.py"],
-        timeout=600,
-    )
-    if result.returncode != 0:
-        failed.append(session)
-
-print(f"\n{'#' * 70}")
-if failed:
-    print(f"FAILED sessions: {failed}")
-    sys.exit(1)
-else:
-    print(f"All {len(SESSIONS)} session tests passed!")
-    sys.exit(0)
+
+
+def _run_one(session):
+    """Run one session file, returning (session, returncode, output)."""
+    try:
+        result = subprocess.run(
+            [sys.executable, f"tests/test_{session}.py"],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+            timeout=TIMEOUT,
+        )
+        return session, result.returncode, result.stdout
+    except subprocess.TimeoutExpired as e:
+        out = e.stdout.decode() if isinstance(e.stdout, bytes) else (e.stdout or "")
+        return session, -1, out + f"TIMEOUT after {TIMEOUT}s\n"
+
+
+def run_serial():
+    failed = []
+    for session in SESSIONS:
+        _header(session)
+        try:
+            result = subprocess.run(
+                [sys.executable, f"tests/test_{session}.py"],
+                timeout=TIMEOUT,
+            )
+            ok = result.returncode == 0
+        except subprocess.TimeoutExpired:
+            print(f"TIMEOUT after {TIMEOUT}s")
+            ok = False
+        if not ok:
+            failed.append(session)
+    return failed
+
+
+def run_parallel():
+    failed = []
+    workers = max(1, (os.cpu_count() or 1) - 2)
+    # Threads only wait on the child processes, which do the actual work
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futs = [ex.submit(_run_one, s) for s in SESSIONS]
+        for fut in as_completed(futs):
+            session, rc, out = fut.result()
+            _header(session)
+            sys.stdout.write(out)
+            sys.stdout.flush()
+            if rc != 0:
+                failed.append(session)
+    # Report in SESSIONS order regardless of completion order
+    return [s for s in SESSIONS if s in failed]
+
+
+if __name__ == "__main__":
+    if "--refresh" in sys.argv:
+        os.environ["LLM_CACHE"] = "refresh"  # Inherited by every session process
+    failed = run_serial() if "--serial" in sys.argv else run_parallel()
+
+    print(f"\n{'#' * 70}")
+    if failed:
+        print(f"FAILED sessions: {failed}")
+        sys.exit(1)
+    else:
+        print(f"All {len(SESSIONS)} session tests passed!")
+        sys.exit(0)
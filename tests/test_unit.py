@@ -439,6 +439,144 @@ def test_v4_skill_loader_parse_invalid():
     return True
 
 
+def test_v4_skill_loader_frontmatter_edges():
+    """Test v4 SkillLoader frontmatter boundaries: CRLF, unterminated, extra markers."""
+    from v4_skills_agent import SkillLoader
+    from pathlib import Path
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        cases = {
+            "crlf": b"---\r\nname: crlf\r\ndescription: 'x: y'\r\n---\r\nBody\r\n",
+            "open": b"---\nname: open\ndescription: never closed\n",
+            "eof": b"---\nname: eof\ndescription: marker without newline\n---",
+            "rule": b"---\nname: rule\ndescription: d\n---  \nA\n---\nB\n",
+        }
+        for name, data in cases.items():
+            (root / name).mkdir()
+            (root / name / "SKILL.md").write_bytes(data)
+        (root / "no-skill-md").mkdir()
+        (root / "stray.txt").write_text("not a skill dir")
+
+        loader = SkillLoader(root)
+        assert sorted(loader.skills) == ["crlf", "rule"]
+        assert loader.skills["crlf"]["description"] == "x: y"
+        assert loader.skills["crlf"]["body"] == "Body"
+        assert loader.skills["rule"]["body"] == "A\n---\nB", "Only the first closing marker ends frontmatter"
+
+    assert SkillLoader(Path(tmpdir)).skills == {}, "Missing skills dir loads nothing"
+    print("PASS: test_v4_skill_loader_frontmatter_edges")
+    return True
+
+
+def test_v4_skill_descriptions_sorted():
+    """Test v4 skill descriptions are ordered by folder name, not listing order."""
+    from v4_skills_agent import SkillLoader
+    from pathlib import Path
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        for name in ["zeta", "alpha", "mid"]:
+            (root / name).mkdir()
+            (root / name / "SKILL.md").write_text(f"---\nname: {name}\ndescription: d\n---\nBody\n")
+        descriptions = SkillLoader(root).get_descriptions()
+        assert descriptions == "- alpha: d\n- mid: d\n- zeta: d", descriptions
+    print("PASS: test_v4_skill_descriptions_sorted")
+    return True
+
+
+def test_v4_skill_loader_parse_cache():
+    """Test v4 SkillLoader reuses cached parses and re-parses only changed SKILL.md files."""
+    import os
+    from v4_skills_agent import SKILL_CACHE, SkillLoader
+    from pathlib import Path
+    import tempfile
+
+    class CountingLoader(SkillLoader):
+        parsed = []
+
+        def parse_skill_md(self, path):
+            self.parsed.append(path.parent.name)
+            return super().parse_skill_md(path)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        for name in ("alpha", "beta"):
+            (root / name).mkdir()
+            (root / name / "SKILL.md").write_text(f"---\nname: {name}\ndescription: {name} skill\n---\n{name} body\n")
+        (root / "broken").mkdir()
+        (root / "broken" / "SKILL.md").write_text("no frontmatter\n")
+
+        first = CountingLoader(root)
+        assert sorted(CountingLoader.parsed) == ["alpha", "beta", "broken"]
+        assert (root / SKILL_CACHE).exists()
+
+        CountingLoader.parsed.clear()
+        warm = CountingLoader(root)
+        assert CountingLoader.parsed == [], "Unchanged skills (valid or not) come from the cache"
+        assert warm.skills["alpha"]["body"] == first.skills["alpha"]["body"] == "alpha body"
+        assert warm.skills["alpha"]["dir"] == root / "alpha"
+        assert warm.get_descriptions() == first.get_descriptions()
+
+        skill_md = root / "beta" / "SKILL.md"
+        skill_md.write_text("---\nname: beta\ndescription: changed\n---\nnew body, longer\n")
+        st = skill_md.stat()
+        os.utime(skill_md, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+        CountingLoader.parsed.clear()
+        assert CountingLoader(root).skills["beta"]["description"] == "changed"
+        assert CountingLoader.parsed == ["beta"]
+
+    print("PASS: test_v4_skill_loader_parse_cache")
+    return True
+
+
+def test_v4_skill_body_loaded_lazily():
+    """Test v4 SkillLoader keeps only a body offset until the body is asked for."""
+    from v4_skills_agent import SkillLoader
+    from pathlib import Path
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        skill_dir = Path(tmpdir) / "lazy"
+        skill_dir.mkdir()
+        (skill_dir / "SKILL.md").write_bytes(
+            "---\nname: lazy\ndescription: d\n---\n\n# Lazy ✓\r\nBody\n".encode())
+        (Path(tmpdir) / "empty").mkdir()
+        (Path(tmpdir) / "empty" / "SKILL.md").write_text("---\nname: empty\ndescription: d\n---\n")
+
+        loader = SkillLoader(Path(tmpdir))
+        skill = loader.skills["lazy"]
+        assert "body" not in skill, "Body should not be read at load time"
+        assert skill["body"] == "# Lazy ✓\nBody"
+        assert "Body" in loader.get_skill_content("lazy")
+        assert loader.skills["empty"]["body"] == ""
+
+        # Edited after loading: the body is found again, not read at the old offset
+        loader = SkillLoader(Path(tmpdir))
+        (skill_dir / "SKILL.md").write_text("---\nname: lazy\ndescription: a longer one\n---\nNew body\n")
+        assert loader.skills["lazy"]["body"] == "New body"
+
+    print("PASS: test_v4_skill_body_loaded_lazily")
+    return True
+
+
+def test_v4_run_skill_memoized():
+    """Test v4 run_skill builds each skill reply once and reports unknown skills."""
+    from v4_skills_agent import SKILLS, run_skill, skill_message
+    name = SKILLS.list_skills()[0]
+    first = run_skill(name, "x")
+    hits = skill_message.cache_info().hits
+    assert run_skill(name, "x") is first, "Repeat load should return the cached reply"
+    assert skill_message.cache_info().hits == hits + 1
+    assert first.startswith(f'<skill-loaded name="{name}" args="x">')
+    assert run_skill(name).startswith(f'<skill-loaded name="{name}">')
+    assert run_skill("no-such-skill").startswith("Error: Unknown skill 'no-such-skill'")
+    print("PASS: test_v4_run_skill_memoized")
+    return True
+
+
 def test_v4_skill_loader_get_content():
     """Test v4 SkillLoader get_skill_content."""
     from v4_skills_agent import SkillLoader
@@ -640,6 +778,75 @@ def test_v5_microcompact_skips_small():
     return True
 
 
+def test_v5_read_cache_invalidation():
+    """Verify v5 serves re-reads from cache and drops them after write, edit and bash."""
+    import tempfile
+    from v5_compression_agent import WORKDIR, read_cached, run_bash, run_edit, run_read, run_write
+    with tempfile.TemporaryDirectory(dir=WORKDIR) as tmpdir:
+        path = os.path.relpath(os.path.join(tmpdir, "f.txt"), WORKDIR)
+        run_write(path, "one\ntwo\n")
+        assert run_read(path) == "one\ntwo"
+        hits = read_cached.cache_info().hits
+        assert run_read(path) == "one\ntwo"
+        assert read_cached.cache_info().hits == hits + 1, "Repeat read should hit the cache"
+        run_edit(path, "one", "ONE")
+        assert run_read(path) == "ONE\ntwo"
+        run_bash(f"printf 'abc\\n' > {path}")
+        assert run_read(path) == "abc"
+    print("PASS: test_v5_read_cache_invalidation")
+    return True
+
+
+def test_v5_safe_path_prefix_check():
+    """Verify v5 safe_path allows the workspace itself and blocks traversal and symlink escapes."""
+    import tempfile
+    from pathlib import Path
+    from v5_compression_agent import WORKDIR, safe_path
+    assert safe_path(".") == WORKDIR.resolve()
+    assert safe_path("a/../b.txt") == WORKDIR.resolve() / "b.txt"
+    # A sibling sharing the workspace name as a prefix is outside too
+    for bad in ["../x", "/etc/passwd", f"../{WORKDIR.name}_sibling/x"]:
+        try:
+            safe_path(bad)
+            assert False, f"{bad} should escape"
+        except ValueError:
+            pass
+    with tempfile.TemporaryDirectory(dir=WORKDIR) as tmpdir:
+        link = Path(tmpdir, "out")
+        link.symlink_to("/etc")
+        try:
+            safe_path(os.path.relpath(link / "passwd", WORKDIR))
+            assert False, "Symlink out of the workspace should be blocked"
+        except ValueError:
+            pass
+    print("PASS: test_v5_safe_path_prefix_check")
+    return True
+
+
+def test_v7_bash_output_capped():
+    """Verify v7 bash merges stderr and keeps only the first 50000 bytes of a flood."""
+    from v7_background_agent import run_bash
+    out = run_bash("yes | head -c 200000; echo oops >&2")
+    assert len(out) <= 50000, f"Output should be capped, got {len(out)} chars"
+    assert out.startswith("y\ny"), "Head of the output should be kept"
+    assert run_bash("echo oops >&2") == "oops", "stderr should be merged"
+    assert run_bash("true") == "(no output)"
+    print("PASS: test_v7_bash_output_capped")
+    return True
+
+
+def test_v7_bash_timeout_after_stdout_closed():
+    """Verify the bash deadline holds even when the command closes stdout early."""
+    import time
+    from v7_background_agent import _exec_bash
+    start = time.monotonic()
+    out = _exec_bash("exec >/dev/null 2>&1; sleep 8", timeout=1)
+    assert time.monotonic() - start < 5, "Command should be killed at the deadline"
+    assert "timed out after 1 seconds" in out, out
+    print("PASS: test_v7_bash_timeout_after_stdout_closed")
+    return True
+
+
 def test_v5_should_compact():
     """Test v5 should_compact threshold detection using TOKEN_THRESHOLD constant."""
     from v5_compression_agent import ContextManager
@@ -1407,6 +1614,642 @@ def test_v3_context_isolation():
     return True
 
 
+def test_v3_start_tool_call_overlaps_tasks():
+    """Verify v3 start_tool_call runs Explore Tasks side by side but keeps writes in call order."""
+    import time
+    from types import SimpleNamespace
+    import v3_subagent
+
+    log = []
+
+    def fake_execute(name, args):
+        if name == "Task":
+            time.sleep(0.3)
+        log.append(name)
+        return f"{name}:{args['n']}"
+
+    calls = [SimpleNamespace(name=name, input={"n": i, "subagent_type": "Explore"})
+             for i, name in enumerate(["Task", "Task", "Task", "write_file", "read_file"])]
+    orig = v3_subagent.execute_tool
+    v3_subagent.execute_tool = fake_execute
+    try:
+        start, futures = time.time(), []
+        for tc in calls:
+            v3_subagent.start_tool_call(tc, futures)
+        outputs = [f.result() for f in futures]
+        elapsed = time.time() - start
+    finally:
+        v3_subagent.execute_tool = orig
+
+    assert outputs == ["Task:0", "Task:1", "Task:2", "write_file:3", "read_file:4"]
+    assert elapsed < 0.8, f"Three 0.3s Tasks should overlap, took {elapsed:.2f}s"
+    assert log[:3] == ["Task"] * 3 and log[3] == "write_file", "Write must wait for earlier calls"
+    assert not v3_subagent.is_read_only(SimpleNamespace(name="Task", input={"subagent_type": "general-purpose"}))
+    assert not v3_subagent.is_read_only(SimpleNamespace(name="bash", input={})), "bash can write"
+    print("PASS: test_v3_start_tool_call_overlaps_tasks")
+    return True
+
+
+def test_v3_agent_loop_starts_tools_mid_stream():
+    """Verify v3 starts a read while the rest of the response is still streaming."""
+    import contextlib
+    import threading
+    from types import SimpleNamespace
+    import v3_subagent
+    from anthropic.types import TextBlock, ToolUseBlock
+
+    started = threading.Event()
+    seen_mid_stream = []
+
+    def fake_execute(name, args):
+        started.set()
+        return args["path"]
+
+    class FakeStream:
+        def __init__(self, blocks, stop_reason):
+            self.blocks, self.stop_reason = blocks, stop_reason
+
+        def __iter__(self):
+            for block in self.blocks:
+                yield SimpleNamespace(type="content_block_start")
+                yield SimpleNamespace(type="content_block_stop", content_block=block)
+            seen_mid_stream.append(started.wait(5))  # The model is "still generating"
+            yield SimpleNamespace(type="message_stop")
+
+        def get_final_message(self):
+            return SimpleNamespace(stop_reason=self.stop_reason, content=self.blocks)
+
+    @contextlib.contextmanager
+    def fake_stream(messages, **kwargs):
+        if len(messages) == 1:
+            yield FakeStream([
+                ToolUseBlock(type="tool_use", id="t1", name="read_file", input={"path": "a.py"}),
+                ToolUseBlock(type="tool_use", id="t2", name="read_file", input={"path": "b.py"}),
+            ], "tool_use")
+        else:
+            yield FakeStream([TextBlock(type="text", text="Done")], "end_turn")
+
+    orig = v3_subagent.client, v3_subagent.execute_tool
+    v3_subagent.client = SimpleNamespace(messages=SimpleNamespace(stream=fake_stream))
+    v3_subagent.execute_tool = fake_execute
+    try:
+        messages = v3_subagent.agent_loop([{"role": "user", "content": "ls"}])
+    finally:
+        v3_subagent.client, v3_subagent.execute_tool = orig
+
+    assert seen_mid_stream[0], "A read should start before the stream ends"
+    first, second = messages[2]["content"]
+    assert first == {"type": "tool_result", "tool_use_id": "t1", "content": "a.py"}
+    assert second == {"type": "tool_result", "tool_use_id": "t2", "content": "b.py",
+                      "cache_control": {"type": "ephemeral"}}, "Newest results carry the cache breakpoint"
+    assert messages[-1]["role"] == "assistant"
+    print("PASS: test_v3_agent_loop_starts_tools_mid_stream")
+    return True
+
+
+def test_v3_agent_loop_settles_early_tools():
+    """Verify v3 never runs a cut-off or writing call mid-stream and awaits started reads."""
+    import contextlib
+    import threading
+    import time
+    from types import SimpleNamespace
+    import v3_subagent
+    from anthropic.types import ToolUseBlock
+
+    started, finished = threading.Event(), threading.Event()
+    ran, in_stream = [], threading.local()
+
+    def fake_execute(name, args):
+        ran.append((name, getattr(in_stream, "on", False)))
+        started.set()
+        time.sleep(0.05)
+        finished.set()
+        return "ok"
+
+    read = ToolUseBlock(type="tool_use", id="t1", name="read_file", input={"path": "a.py"})
+    write = ToolUseBlock(type="tool_use", id="t2", name="bash", input={"command": "touch x"})
+    # What the SDK hands out for a write_file cut off by max_tokens: "content" never arrived
+    cut = ToolUseBlock(type="tool_use", id="t3", name="write_file", input={"path": "a.py"})
+
+    class FakeStream:
+        def __init__(self, blocks, stop_reason, fail=False):
+            self.blocks, self.stop_reason, self.fail = blocks, stop_reason, fail
+
+        def __iter__(self):
+            in_stream.on = True
+            try:
+                for block in self.blocks:
+                    yield SimpleNamespace(type="content_block_start")
+                    if self.fail and block is not self.blocks[0] and started.wait(5):
+                        # Drop the stream while the read is running
+                        raise ConnectionError("stream dropped")
+                    yield SimpleNamespace(type="content_block_stop", content_block=block)
+            finally:
+                in_stream.on = False
+
+        def get_final_message(self):
+            return SimpleNamespace(stop_reason=self.stop_reason, content=self.blocks)
+
+    def run(*turns):
+        turns = iter(turns)
+
+        @contextlib.contextmanager
+        def fake_stream(messages, **kwargs):
+            yield next(turns)
+        v3_subagent.client = SimpleNamespace(messages=SimpleNamespace(stream=fake_stream))
+        return v3_subagent.agent_loop([{"role": "user", "content": "go"}])
+
+    orig = v3_subagent.client, v3_subagent.execute_tool
+    v3_subagent.execute_tool = fake_execute
+    try:
+        messages = run(FakeStream([read, cut], "max_tokens"))
+        assert messages[-1]["role"] == "assistant", "A cut-short turn ends the loop"
+        assert "write_file" not in [name for name, _ in ran], "The truncated write must not run"
+        assert started.is_set() == finished.is_set(), "A started read is awaited before returning"
+
+        ran.clear()
+        run(FakeStream([write, read], "tool_use"), FakeStream([], "end_turn"))
+        assert ran == [("bash", False), ("read_file", False)], \
+            f"Calls from the first write on run after the stream, in order: {ran}"
+
+        started.clear()
+        finished.clear()
+        try:
+            run(FakeStream([read, write], "tool_use", fail=True))
+            assert False, "Stream errors should propagate"
+        except ConnectionError:
+            pass
+        assert finished.is_set(), "Running tools should be awaited before the error propagates"
+    finally:
+        v3_subagent.client, v3_subagent.execute_tool = orig
+    print("PASS: test_v3_agent_loop_settles_early_tools")
+    return True
+
+
+def test_v3_cache_breakpoint_moves():
+    """Verify v3/v4 keep a single conversation cache breakpoint, on the newest user message."""
+    import v3_subagent
+    import v4_skills_agent
+    for mod in (v3_subagent, v4_skills_agent):
+        def result(i):
+            return {"role": "user", "content": [{"type": "tool_result", "tool_use_id": f"t{i}", "content": "x"}]}
+        messages = [{"role": "user", "content": "go"}]
+        mod.mark_cache_breakpoint(messages)
+        assert messages == [{"role": "user", "content": "go"}], "Plain-text prompts are left alone"
+        for i in range(3):
+            messages += [{"role": "assistant", "content": []}, result(i)]
+            mod.mark_cache_breakpoint(messages)
+        marked = [m for m in messages if isinstance(m["content"], list) and m["content"]
+                  and "cache_control" in m["content"][-1]]
+        assert marked == [messages[-1]], "Only the newest user message is marked"
+        messages.append({"role": "assistant", "content": []})
+        mod.mark_cache_breakpoint(messages)
+        assert "cache_control" in messages[-2]["content"][-1], "Assistant turns don't move it"
+    print("PASS: test_v3_cache_breakpoint_moves")
+    return True
+
+
+def test_v4_run_tool_calls_overlaps_tasks():
+    """Verify v4 runs Explore Tasks and Skill loads side by side but keeps other calls in order."""
+    import time
+    from types import SimpleNamespace
+    import v4_skills_agent
+
+    log = []
+
+    def fake_execute(name, args):
+        if name in ("Task", "Skill"):
+            time.sleep(0.3)
+        log.append(name)
+        return f"{name}:{args['n']}"
+
+    explore = {"subagent_type": "Explore"}
+    calls = [SimpleNamespace(name=name, input={"n": i, **extra}) for i, (name, extra) in enumerate([
+        ("Task", explore), ("Skill", {}), ("Task", explore), ("edit_file", {}), ("bash", {}),
+        ("Task", {"subagent_type": "general-purpose"}), ("read_file", {}),
+    ])]
+    orig = v4_skills_agent.execute_tool
+    v4_skills_agent.execute_tool = fake_execute
+    try:
+        start = time.time()
+        outputs = v4_skills_agent.run_tool_calls(calls)
+        elapsed = time.time() - start
+    finally:
+        v4_skills_agent.execute_tool = orig
+
+    assert outputs == ["Task:0", "Skill:1", "Task:2", "edit_file:3", "bash:4", "Task:5", "read_file:6"]
+    assert elapsed < 1.1, f"The first three 0.3s calls should overlap, took {elapsed:.2f}s"
+    assert log[3:6] == ["edit_file", "bash", "Task"], "Calls that may write wait for earlier calls"
+    assert not v4_skills_agent.is_read_only(calls[4]), "bash can write"
+    print("PASS: test_v4_run_tool_calls_overlaps_tasks")
+    return True
+
+
+def test_v3_subagent_prefix_cacheable():
+    """Verify v3 subagents of one type share a fixed, cache-marked system prompt and tool list."""
+    import inspect
+    from v3_subagent import AGENT_TYPES, SUB_SYSTEM, SUB_TOOLS, get_tools_for_agent, run_task
+    for name, config in AGENT_TYPES.items():
+        block, = SUB_SYSTEM[name]
+        assert block["cache_control"] == {"type": "ephemeral"}
+        assert config["prompt"] in block["text"] and name in block["text"]
+        assert SUB_TOOLS[name] == get_tools_for_agent(name)
+    source = inspect.getsource(run_task)
+    assert "SUB_SYSTEM[subagent_type]" in source and "SUB_TOOLS[subagent_type]" in source
+    print("PASS: test_v3_subagent_prefix_cacheable")
+    return True
+
+
+def test_v3_subcontext_resumes_conversation():
+    """Verify v3 run_task continues a named subagent conversation and keeps unnamed ones fresh."""
+    import contextlib
+    import copy
+    from types import SimpleNamespace
+    import v3_subagent
+    from anthropic.types import TextBlock
+
+    seen = []
+
+    class FakeStream:
+        def __init__(self, blocks):
+            self.blocks = blocks
+
+        def __iter__(self):
+            return (SimpleNamespace(type="content_block_stop", content_block=b) for b in self.blocks)
+
+        def get_final_message(self):
+            return SimpleNamespace(content=self.blocks, stop_reason="end_turn")
+
+    @contextlib.contextmanager
+    def fake_stream(**kwargs):
+        seen.append(copy.copy(kwargs["messages"]))
+        yield FakeStream([TextBlock(type="text", text=f"answer {len(seen)}")])
+
+    orig = v3_subagent.client
+    v3_subagent.client = SimpleNamespace(messages=SimpleNamespace(stream=fake_stream))
+    try:
+        assert v3_subagent.run_task("q1", "first", "Explore", "auth") == "answer 1"
+        assert v3_subagent.run_task("q2", "follow-up", "Explore", "auth") == "answer 2"
+        assert v3_subagent.run_task("q3", "other", "Explore") == "answer 3"
+    finally:
+        v3_subagent.client = orig
+        v3_subagent.SUBCONTEXTS.pop(("Explore", "auth"), None)
+
+    assert [m["role"] for m in seen[1]] == ["user", "assistant", "user"]
+    assert seen[1][0]["content"] == "first" and seen[1][2]["content"] == "follow-up"
+    assert seen[1][1]["content"][0].text == "answer 1"
+    assert seen[2] == [{"role": "user", "content": "other"}], "No id: fresh context"
+    print("PASS: test_v3_subcontext_resumes_conversation")
+    return True
+
+
+def test_v3_large_results_externalized():
+    """Verify v3 stores large tool results once, when recorded, behind a readable pointer."""
+    from types import SimpleNamespace
+    from v3_subagent import MAX_RESULT, PREVIEW, TOOL_OUTPUT_DIR, externalize, run_read
+    big = "y" * (MAX_RESULT + 1)
+    bash = SimpleNamespace(id="toolu_test0", name="bash")
+    try:
+        content = externalize(bash, big)
+        pointer = ".agent_cache/tool_toolu_test0.txt"
+        assert content == f"[output stored at {pointer}, {len(big)} chars]\n{big[:PREVIEW]}..."
+        assert run_read(pointer) == big, "Full output must be readable back"
+        assert externalize(bash, "small") == "small"
+        assert externalize(SimpleNamespace(id="toolu_test1", name="read_file"), big) == big, \
+            "read_file results stay whole"
+    finally:
+        (TOOL_OUTPUT_DIR / "tool_toolu_test0.txt").unlink(missing_ok=True)
+    print("PASS: test_v3_large_results_externalized")
+    return True
+
+
+def test_v3_subagent_requests_bounded():
+    """Verify at most MAX_SUBAGENTS v3 subagent requests are in flight at once."""
+    import contextlib
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from types import SimpleNamespace
+    import v3_subagent
+    from anthropic.types import TextBlock
+
+    lock = threading.Lock()
+    live = peak = 0
+
+    text = TextBlock(type="text", text="ok")
+
+    class FakeStream:
+        def __iter__(self):
+            nonlocal live, peak
+            with lock:
+                live += 1
+                peak = max(peak, live)
+            time.sleep(0.05)
+            with lock:
+                live -= 1
+            yield SimpleNamespace(type="content_block_stop", content_block=text)
+
+        def get_final_message(self):
+            return SimpleNamespace(content=[text], stop_reason="end_turn")
+
+    @contextlib.contextmanager
+    def fake_stream(**kwargs):
+        yield FakeStream()
+
+    orig = v3_subagent.client
+    v3_subagent.client = SimpleNamespace(messages=SimpleNamespace(stream=fake_stream))
+    try:
+        n = v3_subagent.MAX_SUBAGENTS * 2
+        with ThreadPoolExecutor(n) as ex:
+            results = list(ex.map(lambda i: v3_subagent.run_task(f"t{i}", "go", "Explore"), range(n)))
+    finally:
+        v3_subagent.client = orig
+    assert results == ["ok"] * n
+    assert 1 < peak <= v3_subagent.MAX_SUBAGENTS, f"peak {peak} in-flight requests"
+    print("PASS: test_v3_subagent_requests_bounded")
+    return True
+
+
+def test_v4_prompt_prefixes_cacheable():
+    """Verify v3/v4 main loops and v4 subagents send cache-marked, prebuilt system prompts."""
+    import inspect
+    import v3_subagent
+    import v4_skills_agent
+    for mod in (v3_subagent, v4_skills_agent):
+        block, = mod.SYSTEM_BLOCKS
+        assert block == {"type": "text", "text": mod.SYSTEM, "cache_control": {"type": "ephemeral"}}
+        assert "system=SYSTEM_BLOCKS" in inspect.getsource(mod.agent_loop)
+    for name, config in v4_skills_agent.AGENT_TYPES.items():
+        block, = v4_skills_agent.SUB_SYSTEM[name]
+        assert block["cache_control"] == {"type": "ephemeral"} and config["prompt"] in block["text"]
+        assert v4_skills_agent.SUB_TOOLS[name] == v4_skills_agent.get_tools_for_agent(name)
+    source = inspect.getsource(v4_skills_agent.run_task)
+    assert "SUB_SYSTEM[subagent_type]" in source and "SUB_TOOLS[subagent_type]" in source
+    print("PASS: test_v4_prompt_prefixes_cacheable")
+    return True
+
+
+def test_v3_bash_blocklist():
+    """Verify v3/v4 block the same dangerous substrings as the other versions, however wrapped."""
+    import v3_subagent
+    import v4_skills_agent
+    for mod in (v3_subagent, v4_skills_agent):
+        for cmd in ["rm -rf /", "sudo apt install", "ls && FOO=1 sudo x", "/usr/bin/sudo ls",
+                    'bash -c "sudo ls"', "echo `sudo id`", "eval sudo ls", "xargs sudo rm",
+                    "rm -rf //", "shutdown now"]:
+            assert "Dangerous" in mod.run_bash(cmd), f"Should block {cmd!r}"
+    assert v3_subagent.run_bash("echo out; echo err >&2") == "out\nerr"
+    print("PASS: test_v3_bash_blocklist")
+    return True
+
+
+def test_v3_bash_shell_pool():
+    """Verify v3 reuses pooled shells without leaking state and caps their output."""
+    from v3_subagent import IDLE_SHELLS, WORKDIR, run_bash
+    assert run_bash("cd /; export LEAK=1; echo out") == "out"
+    shells = list(IDLE_SHELLS)
+    assert run_bash("pwd; echo ${LEAK:-clean}") == f"{WORKDIR}\nclean"
+    assert IDLE_SHELLS == shells, "The idle shell should be reused"
+    assert run_bash("cat") == "(no output)", "Commands must not read the shell's stdin"
+    assert len(run_bash("yes | head -c 200000")) <= 50000
+    assert run_bash("echo still alive") == "still alive"
+    assert run_bash("(sleep 0.2; echo late) & echo now") == "now"
+    assert run_bash("sleep 0.4; echo next") == "next", "Background output must not leak"
+    print("PASS: test_v3_bash_shell_pool")
+    return True
+
+
+def test_v3_read_cache_invalidation():
+    """Verify v3 caches repeat reads and drops them after write, edit and bash."""
+    import tempfile
+    from v3_subagent import WORKDIR, read_cached, run_bash, run_edit, run_read, run_write
+    with tempfile.TemporaryDirectory(dir=WORKDIR) as tmpdir:
+        path = os.path.relpath(os.path.join(tmpdir, "f.txt"), WORKDIR)
+        run_write(path, "one\ntwo\n")
+        assert run_read(path) == "one\ntwo"
+        hits = read_cached.cache_info().hits
+        assert run_read(path) == "one\ntwo"
+        assert read_cached.cache_info().hits == hits + 1, "Repeat read should hit the cache"
+        run_edit(path, "one", "ONE")
+        assert run_read(path) == "ONE\ntwo"
+        run_bash(f"printf 'abc\\ndef\\n' > {path}")
+        assert run_read(path) == "abc\ndef"
+    print("PASS: test_v3_read_cache_invalidation")
+    return True
+
+
+def test_v3_read_head_only():
+    """Verify v3 read_file output for limits, CRLF and the 50000-char cap on large files."""
+    import tempfile
+    from v3_subagent import WORKDIR, run_read
+    with tempfile.TemporaryDirectory(dir=WORKDIR) as tmpdir:
+        fp = os.path.join(tmpdir, "big.log")
+        path = os.path.relpath(fp, WORKDIR)
+        with open(fp, "w", newline="") as f:
+            f.write("first\r\nsecond\r\n" + "z" * 10 + "\n" * 200000)
+        assert run_read(path, 2) == "first\nsecond"
+        assert run_read(path, 3) == "first\nsecond\n" + "z" * 10
+        full = run_read(path)
+        assert len(full) == 50000 and full.startswith("first\nsecond\nzzz")
+    print("PASS: test_v3_read_head_only")
+    return True
+
+
+def test_v3_safe_path_cache_follows_bash():
+    """Verify v3 safe_path memoizes resolution but re-resolves after bash re-links a path."""
+    import tempfile
+    from pathlib import Path
+    from v3_subagent import WORKDIR, resolve_in_workdir, run_bash, safe_path
+    with tempfile.TemporaryDirectory(dir=WORKDIR) as tmpdir:
+        link = os.path.relpath(os.path.join(tmpdir, "link"), WORKDIR)
+        os.mkdir(os.path.join(tmpdir, "inside"))
+        os.symlink("inside", os.path.join(tmpdir, "link"))
+        assert safe_path(link) == Path(tmpdir, "inside").resolve()
+        hits = resolve_in_workdir.cache_info().hits
+        safe_path(link)
+        assert resolve_in_workdir.cache_info().hits == hits + 1, "Repeat lookup should hit the cache"
+        run_bash(f"ln -sfn / {link}")
+        try:
+            safe_path(link)
+            assert False, "Re-linked path escaping the workspace must be rejected"
+        except ValueError:
+            pass
+    print("PASS: test_v3_safe_path_cache_follows_bash")
+    return True
+
+
+def test_v3_bash_reads_fresh_output():
+    """Verify v3 re-runs repeated read-only commands, so outside writes are seen."""
+    import tempfile
+    from v3_subagent import WORKDIR, run_bash
+    with tempfile.TemporaryDirectory(dir=WORKDIR) as tmpdir:
+        fp = os.path.join(tmpdir, "build.log")
+        path = os.path.relpath(fp, WORKDIR)
+        with open(fp, "w") as f:
+            f.write("one\n")
+        assert run_bash(f"cat {path}") == "one"
+        with open(fp, "a") as f:  # e.g. a background job appending to its log
+            f.write("two\n")
+        assert run_bash(f"cat {path}") == "one\ntwo"
+    print("PASS: test_v3_bash_reads_fresh_output")
+    return True
+
+
+def test_v3_tool_dispatch_table():
+    """Verify v3/v4/v5 dispatch covers every tool schema and rejects unknown names."""
+    import v3_subagent
+    import v4_skills_agent
+    import v5_compression_agent
+    for mod in (v3_subagent, v4_skills_agent, v5_compression_agent):
+        assert set(mod.TOOL_DISPATCH) == {t["name"] for t in mod.ALL_TOOLS}
+        assert mod.execute_tool("nope", {}) == "Unknown tool: nope"
+        assert mod.execute_tool("bash", {"command": "echo dispatched"}) == "dispatched"
+    print("PASS: test_v3_tool_dispatch_table")
+    return True
+
+
+def test_v3_todo_items_slotted():
+    """Verify v3/v6 keep validated todos as slotted Todo records and skip unchanged resends."""
+    import v3_subagent
+    import v6_tasks_agent
+    for mod in (v3_subagent, v6_tasks_agent):
+        tm = mod.TodoManager()
+        out = tm.update([
+            {"content": " A ", "status": "COMPLETED", "activeForm": "Doing A"},
+            {"content": "B", "status": "in_progress", "activeForm": "Doing B"},
+        ] + [{"content": f"C{i}", "activeForm": "c"} for i in range(25)])
+        assert len(tm.items) == 20, "Only the first 20 are kept"
+        assert tm.items[0] == mod.Todo("A", "completed", "Doing A")
+        assert not hasattr(tm.items[0], "__dict__")
+        assert out.startswith("[x] A\n[>] B\n[ ] C0") and out.endswith("(1/20 done)")
+        try:
+            tm.update([{"content": f"C{i}", "activeForm": "c"} for i in range(20)] + [{"content": "D"}])
+            assert False, "Items past the 20th are validated too"
+        except ValueError as e:
+            assert "Item 20" in str(e)
+        items = [{"content": "A", "status": "pending", "activeForm": "a"}]
+        first = tm.update(items)
+        assert tm.update([dict(i) for i in items]) is first, "Unchanged resend reuses the rendering"
+        assert tm.update([{**items[0], "status": "completed"}]) == "[x] A\n(1/1 done)"
+    print("PASS: test_v3_todo_items_slotted")
+    return True
+
+
+def test_v3_write_raw_roundtrip():
+    """Verify v3 write_file writes multi-MiB contents intact and truncates on overwrite."""
+    import tempfile
+    import v3_subagent
+    from v3_subagent import WORKDIR, WRITEV_CHUNK, run_write
+    with tempfile.TemporaryDirectory(dir=WORKDIR) as tmpdir:
+        fp = os.path.join(tmpdir, "sub", "big.txt")
+        path = os.path.relpath(fp, WORKDIR)
+        big = "é" * (WRITEV_CHUNK * 2) + "end"  # Several writev slices
+        assert run_write(path, big).startswith("Wrote")
+        with open(fp, "rb") as f:
+            assert f.read() == big.encode()
+        run_write(path, "short")
+        with open(fp, "rb") as f:
+            assert f.read() == b"short", "Overwrite should truncate"
+
+        v3_subagent.HAS_WRITEV = False  # As on Windows: plain os.write only
+        try:
+            run_write(path, big)
+        finally:
+            v3_subagent.HAS_WRITEV = True
+        with open(fp, "rb") as f:
+            assert f.read() == big.encode()
+    print("PASS: test_v3_write_raw_roundtrip")
+    return True
+
+
+def test_v3_edit_single_scan():
+    """Verify v3 edit_file replaces only the first match, in LF and CRLF files alike."""
+    import tempfile
+    from v3_subagent import WORKDIR, run_edit
+    with tempfile.TemporaryDirectory(dir=WORKDIR) as tmpdir:
+        fp = os.path.join(tmpdir, "f.txt")
+        path = os.path.relpath(fp, WORKDIR)
+        with open(fp, "wb") as f:
+            f.write(b"a = 1\na = 1\n")
+        assert run_edit(path, "a = 1", "a = 22") == f"Edited {path}"
+        assert open(fp, "rb").read() == b"a = 22\na = 1\n"
+        assert run_edit(path, "missing", "x").startswith("Error: Text not found")
+
+        with open(fp, "wb") as f:
+            f.write(b"x\r\ny\r\n")
+        assert run_edit(path, "x\ny", "z") == f"Edited {path}", "CRLF falls back to newline-normalized text"
+        assert open(fp, "rb").read().replace(b"\r\n", b"\n") == b"z\n"
+    print("PASS: test_v3_edit_single_scan")
+    return True
+
+
+def test_v3_progress_reporter_coalesces():
+    """Verify v3 subagent progress updates are batched into few repaints of one block."""
+    import io
+    import time
+    from v3_subagent import ProgressReporter
+
+    class Recorder(io.StringIO):
+        writes = 0
+
+        def write(self, s):
+            self.writes += 1
+            return super().write(s)
+
+    out = Recorder()
+    reporter = ProgressReporter(out=out)
+    a = reporter.start("  [explore] a")
+    b = reporter.start("  [plan] b")
+    for i in range(500):
+        reporter.update(a, f"  [explore] a ... {i} tools")
+        reporter.update(b, f"  [plan] b ... {i} tools")
+    time.sleep(reporter.INTERVAL * 3)
+    reporter.finish(a, "  [explore] a - done")
+    reporter.finish(b, "  [plan] b - done")
+
+    assert out.writes <= 6, f"1000 updates should coalesce, got {out.writes} writes"
+    final = out.getvalue().rsplit("\x1b[2A", 1)[-1]
+    assert final == "\r\x1b[K  [explore] a - done\n\r\x1b[K  [plan] b - done\n", repr(final)
+    assert reporter.rows == {} and reporter.drawn == 0, "Finished block should be released"
+    print("PASS: test_v3_progress_reporter_coalesces")
+    return True
+
+
+def test_v3_progress_reporter_print_and_failures():
+    """Verify v3 prints above the progress block and finishes rows of failed subagents."""
+    import io
+    from types import SimpleNamespace
+    import v3_subagent
+    from v3_subagent import ProgressReporter
+
+    out = io.StringIO()
+    reporter = ProgressReporter(out=out)
+    assert reporter.painter is None, "No repaint thread until something is reported"
+    row = reporter.start("  [explore] a")
+    reporter.print("> bash")
+    assert out.getvalue().endswith("\x1b[1A\r\x1b[J> bash\n\r\x1b[K  [explore] a\n"), repr(out.getvalue())
+    reporter.finish(row, "  [explore] a - done")
+
+    def failing_stream(**kwargs):
+        raise ConnectionError("API down")
+
+    orig = v3_subagent.PROGRESS, v3_subagent.client
+    v3_subagent.PROGRESS = ProgressReporter(out=io.StringIO())
+    v3_subagent.client = SimpleNamespace(messages=SimpleNamespace(stream=failing_stream))
+    try:
+        try:
+            v3_subagent.run_task("look", "look around", "Explore")
+            assert False, "The subagent's error should propagate"
+        except ConnectionError:
+            pass
+        assert not v3_subagent.PROGRESS.running, "A failed subagent must finish its row"
+        assert "[Explore] look - failed" in v3_subagent.PROGRESS.out.getvalue()
+    finally:
+        v3_subagent.PROGRESS, v3_subagent.client = orig
+    print("PASS: test_v3_progress_reporter_print_and_failures")
+    return True
+
+
 # =============================================================================
 # v0 Mechanism Tests
 # =============================================================================
@@ -1443,6 +2286,18 @@ def test_v0_subagent_via_bash():
     return True
 
 
+def test_v0_system_prompt_cacheable():
+    """Verify v0 sends SYSTEM as a single cache-marked text block."""
+    import inspect
+    from v0_bash_agent import SYSTEM, SYSTEM_BLOCKS, chat, create_message
+    assert len(SYSTEM_BLOCKS) == 1 and SYSTEM_BLOCKS[0]["text"] == SYSTEM
+    assert SYSTEM_BLOCKS[0]["cache_control"] == {"type": "ephemeral"}
+    assert create_message.keywords["system"] is SYSTEM_BLOCKS, "chat() must send the cached blocks"
+    assert "create_message(" in inspect.getsource(chat)
+    print("PASS: test_v0_system_prompt_cacheable")
+    return True
+
+
 # =============================================================================
 # v1 Mechanism Tests (extended)
 # =============================================================================
@@ -1494,6 +2349,26 @@ def test_v1_bash_dangerous_commands():
     return True
 
 
+def test_v1_bash_shell_pool():
+    """Verify v1 reuses pooled shells without leaking state between commands."""
+    from v1_basic_agent import IDLE_SHELLS, WORKDIR, run_bash
+    assert run_bash("cd /; export LEAK=1; echo out; echo err >&2") == "out\nerr"
+    shells = list(IDLE_SHELLS)
+    assert run_bash("pwd; echo ${LEAK:-clean}") == f"{WORKDIR}\nclean"
+    assert IDLE_SHELLS == shells, "The idle shell should be reused"
+
+    assert run_bash("exit 3") == "(no output)"
+    assert "unbalanced" not in run_bash("echo 'unbalanced"), "Syntax errors are reported, not hung on"
+    assert run_bash("cat") == "(no output)", "Commands must not read the shell's stdin"
+    assert run_bash("echo still alive") == "still alive"
+
+    # A background job's late output must not land in the next command's result
+    assert run_bash("(sleep 0.2; echo late) & echo now") == "now"
+    assert run_bash("sleep 0.4; echo next") == "next"
+    print("PASS: test_v1_bash_shell_pool")
+    return True
+
+
 def test_v1_agent_loop_structure():
     """Verify v1 agent_loop has the core while-True + stop_reason pattern."""
     import inspect
@@ -1507,6 +2382,191 @@ def test_v1_agent_loop_structure():
     return True
 
 
+def test_v1_agent_loop_starts_tools_mid_stream():
+    """Verify v1 starts a read while the rest of the response is still streaming."""
+    import contextlib
+    import threading
+    from types import SimpleNamespace
+    from anthropic.types import TextBlock, ToolUseBlock
+    import v1_basic_agent
+
+    started = threading.Event()
+    seen_mid_stream = []
+
+    def fake_execute(name, args):
+        started.set()
+        return f"read {args['path']}"
+
+    class FakeStream:
+        def __init__(self, blocks, stop_reason):
+            self.blocks, self.stop_reason = blocks, stop_reason
+
+        def __iter__(self):
+            for block in self.blocks:
+                yield SimpleNamespace(type="content_block_start")
+                yield SimpleNamespace(type="content_block_stop", content_block=block)
+            seen_mid_stream.append(started.wait(5))  # The model is "still generating"
+            yield SimpleNamespace(type="message_stop")
+
+        def get_final_message(self):
+            return SimpleNamespace(stop_reason=self.stop_reason, content=self.blocks)
+
+    @contextlib.contextmanager
+    def fake_stream_message(messages):
+        if len(messages) == 1:
+            yield FakeStream([
+                TextBlock(type="text", text="Reading"),
+                ToolUseBlock(type="tool_use", id="t1", name="read_file", input={"path": "a.py"}),
+                ToolUseBlock(type="tool_use", id="t2", name="read_file", input={"path": "b.py"}),
+            ], "tool_use")
+        else:
+            yield FakeStream([TextBlock(type="text", text="Done")], "end_turn")
+
+    orig = v1_basic_agent.stream_message, v1_basic_agent.execute_tool
+    v1_basic_agent.stream_message, v1_basic_agent.execute_tool = fake_stream_message, fake_execute
+    try:
+        messages = v1_basic_agent.agent_loop([{"role": "user", "content": "ls"}])
+    finally:
+        v1_basic_agent.stream_message, v1_basic_agent.execute_tool = orig
+
+    assert seen_mid_stream[0], "A read should start before the stream ends"
+    assert messages[2]["content"] == [
+        {"type": "tool_result", "tool_use_id": "t1", "content": "read a.py"},
+        {"type": "tool_result", "tool_use_id": "t2", "content": "read b.py"},
+    ]
+    assert messages[1]["content"][1] == {"type": "tool_use", "id": "t1", "name": "read_file", "input": {"path": "a.py"}}
+    assert messages[-1]["content"] == [{"type": "text", "text": "Done"}], "History holds plain dicts"
+    print("PASS: test_v1_agent_loop_starts_tools_mid_stream")
+    return True
+
+
+def test_v1_agent_loop_settles_early_tools():
+    """Verify v1 never runs a cut-off tool call and awaits started reads on errors."""
+    import contextlib
+    import threading
+    import time
+    from types import SimpleNamespace
+    from anthropic.types import ToolUseBlock
+    import v1_basic_agent
+
+    started, finished = threading.Event(), threading.Event()
+    ran = []
+
+    def fake_execute(name, args):
+        ran.append(name)
+        started.set()
+        time.sleep(0.05)
+        finished.set()
+        return "ok"
+
+    read = ToolUseBlock(type="tool_use", id="t1", name="read_file", input={"path": "a.py"})
+    # What the SDK hands out for a write_file cut off by max_tokens: "content" never arrived
+    cut = ToolUseBlock(type="tool_use", id="t2", name="write_file", input={"path": "a.py"})
+
+    class FakeStream:
+        def __init__(self, fail):
+            self.fail = fail
+
+        def __iter__(self):
+            yield SimpleNamespace(type="content_block_start")
+            yield SimpleNamespace(type="content_block_stop", content_block=read)
+            yield SimpleNamespace(type="content_block_start")
+            if self.fail:
+                started.wait(5)  # Drop the stream while the read is running
+                raise ConnectionError("stream dropped")
+            yield SimpleNamespace(type="content_block_stop", content_block=cut)
+
+        def get_final_message(self):
+            return SimpleNamespace(stop_reason="max_tokens", content=[read, cut])
+
+    def make_stream(fail):
+        @contextlib.contextmanager
+        def fake_stream_message(messages):
+            yield FakeStream(fail)
+        return fake_stream_message
+
+    orig = v1_basic_agent.stream_message, v1_basic_agent.execute_tool
+    v1_basic_agent.execute_tool = fake_execute
+    try:
+        v1_basic_agent.stream_message = make_stream(fail=False)
+        messages = v1_basic_agent.agent_loop([{"role": "user", "content": "ls"}])
+        assert messages[-1]["role"] == "assistant", "A cut-short turn ends the loop"
+        assert "write_file" not in ran, "The truncated write must not run"
+        assert started.is_set() == finished.is_set(), "A started read is awaited before returning"
+
+        started.clear()
+        finished.clear()
+        v1_basic_agent.stream_message = make_stream(fail=True)
+        try:
+            v1_basic_agent.agent_loop([{"role": "user", "content": "ls"}])
+            assert False, "Stream errors should propagate"
+        except ConnectionError:
+            pass
+        assert finished.is_set(), "Running tools should be awaited before the error propagates"
+    finally:
+        v1_basic_agent.stream_message, v1_basic_agent.execute_tool = orig
+    print("PASS: test_v1_agent_loop_settles_early_tools")
+    return True
+
+
+def test_v1_start_tool_call_orders_writes():
+    """Verify v1 overlaps only read_file calls; anything that may write runs after earlier calls, in order."""
+    import time
+    from types import SimpleNamespace
+    import v1_basic_agent
+
+    log = []
+
+    def fake_execute(name, args):
+        if name == "read_file":
+            time.sleep(0.2)
+        log.append(args["n"])
+        return f"{name}:{args['n']}"
+
+    calls = [SimpleNamespace(name=name, input={"n": i})
+             for i, name in enumerate(["read_file", "read_file", "edit_file", "edit_file", "bash", "read_file"])]
+    orig = v1_basic_agent.execute_tool
+    v1_basic_agent.execute_tool = fake_execute
+    try:
+        start, futures = time.time(), []
+        for tc in calls:
+            v1_basic_agent.start_tool_call(tc, futures)
+        outputs = [f.result() for f in futures]
+        elapsed = time.time() - start
+    finally:
+        v1_basic_agent.execute_tool = orig
+
+    assert outputs == ["read_file:0", "read_file:1", "edit_file:2", "edit_file:3", "bash:4", "read_file:5"]
+    assert elapsed < 0.6, f"The two leading reads should overlap, took {elapsed:.2f}s"
+    assert log[2:5] == [2, 3, 4], "Edits and bash run one at a time, after the reads before them"
+    print("PASS: test_v1_start_tool_call_orders_writes")
+    return True
+
+
+def test_v1_read_cache_invalidation():
+    """Verify v1 serves repeat reads from cache but never returns stale content."""
+    import tempfile
+    from v1_basic_agent import WORKDIR, read_cached, run_bash, run_edit, run_read, run_write
+    with tempfile.TemporaryDirectory(dir=WORKDIR) as tmpdir:
+        path = os.path.relpath(os.path.join(tmpdir, "f.txt"), WORKDIR)
+        run_write(path, "one\ntwo\nthree\n")
+        assert run_read(path) == "one\ntwo\nthree"
+        hits = read_cached.cache_info().hits
+        assert run_read(path) == "one\ntwo\nthree"
+        assert read_cached.cache_info().hits == hits + 1, "Repeat read should hit the cache"
+        assert run_read(path, 1) == "one\n... (2 more lines)"
+
+        # Same-size rewrites, possibly within one mtime tick
+        run_edit(path, "one", "ONE")
+        assert run_read(path) == "ONE\ntwo\nthree"
+        run_write(path, "uno\ntwo\nthree\n")
+        assert run_read(path) == "uno\ntwo\nthree"
+        run_bash(f"printf 'x\\ny\\n' > {path}")
+        assert run_read(path) == "x\ny"
+    print("PASS: test_v1_read_cache_invalidation")
+    return True
+
+
 # =============================================================================
 # v2 Mechanism Tests (extended)
 # =============================================================================
@@ -1546,6 +2606,70 @@ def test_v2_todo_render_format_detailed():
     return True
 
 
+def test_v2_todo_render_cache():
+    """Verify TodoManager reuses its rendering until the list actually changes."""
+    from v2_todo_agent import TodoManager
+    tm = TodoManager()
+    items = [{"content": "Alpha", "status": "in_progress", "activeForm": "Alpha-ing"}]
+    first = tm.update(items)
+    assert tm.update([dict(i) for i in items]) is first, "Unchanged list should reuse the rendering"
+
+    items[0]["status"] = "completed"
+    assert tm.update(items) != first and "[x] Alpha" in tm.render()
+
+    tm.items = []
+    assert tm.render() == "No todos.", "Replacing items directly must not serve stale text"
+    print("PASS: test_v2_todo_render_cache")
+    return True
+
+
+def test_v2_nag_reminder_leads_results():
+    """Verify v2 puts NAG_REMINDER ahead of the tool results, and TodoWrite resets the count."""
+    import contextlib
+    from types import SimpleNamespace
+    from anthropic.types import TextBlock, ToolUseBlock
+    import v2_todo_agent
+
+    turns = iter([
+        [ToolUseBlock(type="tool_use", id="t1", name="bash", input={"command": "ls"})],
+        [ToolUseBlock(type="tool_use", id="t2", name="TodoWrite", input={"items": []})],
+        [TextBlock(type="text", text="Done")],
+    ])
+
+    class FakeStream:
+        def __init__(self, blocks):
+            self.blocks = blocks
+
+        def __iter__(self):
+            return (SimpleNamespace(type="content_block_stop", content_block=b) for b in self.blocks)
+
+        def get_final_message(self):
+            stop_reason = "tool_use" if self.blocks[0].type == "tool_use" else "end_turn"
+            return SimpleNamespace(stop_reason=stop_reason, content=self.blocks)
+
+    @contextlib.contextmanager
+    def fake_stream_message(messages):
+        yield FakeStream(next(turns))
+
+    orig = v2_todo_agent.stream_message, v2_todo_agent.execute_tool, v2_todo_agent.rounds_without_todo
+    v2_todo_agent.stream_message = fake_stream_message
+    v2_todo_agent.execute_tool = lambda name, args: f"ran {name}"
+    v2_todo_agent.rounds_without_todo = 10
+    try:
+        messages = v2_todo_agent.agent_loop([{"role": "user", "content": "go"}])
+        rounds = v2_todo_agent.rounds_without_todo
+    finally:
+        v2_todo_agent.stream_message, v2_todo_agent.execute_tool, v2_todo_agent.rounds_without_todo = orig
+
+    first, second = messages[2]["content"], messages[4]["content"]
+    assert first[0] == {"type": "text", "text": v2_todo_agent.NAG_REMINDER}
+    assert first[1]["tool_use_id"] == "t1" and len(first) == 2
+    assert [b["tool_use_id"] for b in second] == ["t2"], "No reminder once TodoWrite is used"
+    assert rounds == 0
+    print("PASS: test_v2_nag_reminder_leads_results")
+    return True
+
+
 def test_v2_status_progression_enforcement():
     """Verify TodoManager allows valid status values only."""
     from v2_todo_agent import TodoManager
@@ -2404,156 +3528,198 @@ def test_task_file_naming_sanitized_no_prefix():
     return True
 # =============================================================================
 
+TESTS = [
+    # Basic tests
+    test_imports,
+    test_todo_manager_basic,
+    test_todo_manager_constraints,
+    test_reminder_constants,
+    test_nag_reminder_in_agent_loop,
+    test_env_config,
+    test_default_model,
+    test_tool_schemas,
+    # TodoManager edge cases
+    test_todo_manager_empty_list,
+    test_todo_manager_status_transitions,
+    test_todo_manager_missing_fields,
+    test_todo_manager_invalid_status,
+    test_todo_manager_render_format,
+    # v3 tests
+    test_v3_agent_types_structure,
+    test_v3_get_tools_for_agent,
+    test_v3_get_agent_descriptions,
+    test_v3_task_tool_schema,
+    # v4 tests
+    test_v4_skill_loader_init,
+    test_v4_skill_loader_parse_valid,
+    test_v4_skill_loader_parse_invalid,
+    test_v4_skill_loader_frontmatter_edges,
+    test_v4_skill_descriptions_sorted,
+    test_v4_skill_loader_parse_cache,
+    test_v4_skill_body_loaded_lazily,
+    test_v4_run_skill_memoized,
+    test_v4_skill_loader_get_content,
+    test_v4_skill_loader_list_skills,
+    test_v4_skill_tool_schema,
+    # Security tests
+    test_v3_safe_path,
+    # Config tests
+    test_base_url_config,
+    # v5 tests
+    test_v5_estimate_tokens,
+    test_v5_microcompact_keeps_recent,
+    test_v5_microcompact_skips_small,
+    test_v5_read_cache_invalidation,
+    test_v5_safe_path_prefix_check,
+    test_v7_bash_output_capped,
+    test_v7_bash_timeout_after_stdout_closed,
+    test_v5_should_compact,
+    test_v5_handle_large_output,
+    test_v5_save_transcript,
+    # v6 tests
+    test_v6_task_create,
+    test_v6_task_get,
+    test_v6_task_update_status,
+    test_v6_task_dependencies,
+    test_v6_task_complete_clears_deps,
+    test_v6_task_list,
+    test_v6_task_persistence,
+    test_v6_task_delete,
+    test_v6_task_tools_in_all_tools,
+    # v7 tests
+    test_v7_background_run,
+    test_v7_background_get_output_blocking,
+    test_v7_background_get_output_nonblocking,
+    test_v7_background_notifications,
+    test_v7_background_stop,
+    test_v7_tools_in_all_tools,
+    # v8 tests
+    test_v8_create_team,
+    test_v8_send_message,
+    test_v8_message_types,
+    test_v8_delete_team,
+    test_v8_team_tools_in_all_tools,
+    test_v8_team_status,
+    # v5 mechanism-specific
+    test_v5_compactable_tools,
+    test_v5_auto_compact_source,
+    # v6 mechanism-specific
+    test_v6_dependency_bidirectional,
+    # v7 mechanism-specific
+    test_v7_tool_count,
+    test_v7_daemon_threads,
+    test_v7_notification_drain_clears,
+    test_v7_notification_xml_construction,
+    test_v7_summary_truncation,
+    # v8 mechanism-specific
+    test_v8_tool_count,
+    test_v8_teammate_tools_subset,
+    test_v8_message_types_count,
+    test_v8_teammate_bg_prefix,
+    test_v8_spawn_teammate_errors,
+    test_v8_find_teammate_cross_team,
+    test_v8_teammate_loop_structure,
+    test_v8_broadcast_to_all,
+    test_v8_delete_sends_shutdown,
+    # v2/v3 mechanism-specific
+    test_v2_system_reminders,
+    test_v3_context_isolation,
+    test_v3_start_tool_call_overlaps_tasks,
+    test_v3_agent_loop_starts_tools_mid_stream,
+    test_v3_agent_loop_settles_early_tools,
+    test_v3_cache_breakpoint_moves,
+    test_v4_run_tool_calls_overlaps_tasks,
+    test_v3_subagent_prefix_cacheable,
+    test_v3_subcontext_resumes_conversation,
+    test_v3_large_results_externalized,
+    test_v3_subagent_requests_bounded,
+    test_v4_prompt_prefixes_cacheable,
+    test_v3_bash_blocklist,
+    test_v3_bash_shell_pool,
+    test_v3_read_cache_invalidation,
+    test_v3_read_head_only,
+    test_v3_safe_path_cache_follows_bash,
+    test_v3_bash_reads_fresh_output,
+    test_v3_tool_dispatch_table,
+    test_v3_todo_items_slotted,
+    test_v3_write_raw_roundtrip,
+    test_v3_edit_single_scan,
+    test_v3_progress_reporter_coalesces,
+    test_v3_progress_reporter_print_and_failures,
+    # --- NEW: v0 mechanism tests ---
+    test_v0_only_bash_tool,
+    test_v0_agent_loop_recursion,
+    test_v0_subagent_via_bash,
+    test_v0_system_prompt_cacheable,
+    # --- NEW: v1 mechanism tests ---
+    test_v1_exactly_four_tools,
+    test_v1_safe_path_validation,
+    test_v1_bash_dangerous_commands,
+    test_v1_bash_shell_pool,
+    test_v1_agent_loop_structure,
+    test_v1_agent_loop_starts_tools_mid_stream,
+    test_v1_agent_loop_settles_early_tools,
+    test_v1_start_tool_call_orders_writes,
+    test_v1_read_cache_invalidation,
+    # --- NEW: v2 mechanism tests ---
+    test_v2_todo_max_items_enforced,
+    test_v2_todo_render_format_detailed,
+    test_v2_todo_render_cache,
+    test_v2_nag_reminder_leads_results,
+    test_v2_status_progression_enforcement,
+    # --- NEW: v3 mechanism tests ---
+    test_v3_agent_types_exactly_three,
+    test_v3_task_prevents_recursion,
+    test_v3_run_task_isolation,
+    # --- NEW: v4 mechanism tests ---
+    test_v4_skill_loader_yaml_edge_cases,
+    test_v4_skill_loader_cache_separation,
+    test_v4_skill_loader_empty_frontmatter,
+    # --- NEW: v5 mechanism tests ---
+    test_v5_compactable_tools_set,
+    test_v5_estimate_tokens_precision,
+    test_v5_microcompact_empty_messages,
+    test_v5_microcompact_all_recent,
+    test_v5_microcompact_no_compactable,
+    test_v5_should_compact_various_thresholds,
+    test_v5_handle_large_output_at_boundary,
+    test_v5_keep_recent_constant,
+    # --- NEW: v6 mechanism tests ---
+    test_v6_task_thread_safety,
+    test_v6_dependency_chain,
+    test_v6_task_delete_removes_disk,
+    test_v6_task_active_form,
+    test_v6_task_owner_tracking,
+    # --- NEW: v7 mechanism tests ---
+    test_v7_background_error_handling,
+    test_v7_stop_then_get_output,
+    test_v7_multiple_concurrent_tasks,
+    test_v7_notification_has_required_fields,
+    # --- NEW: v8 mechanism tests ---
+    test_v8_create_team_creates_directory,
+    test_v8_check_inbox_missing_file,
+    test_v8_broadcast_excludes_sender,
+    test_v8_teammate_tools_excludes_team_mgmt,
+    test_v8_find_teammate_with_team_name,
+    test_v8_send_message_validates_type,
+    test_v9_teammate_identity_injection,
+    test_v9_unclaimed_task_filter,
+    test_v9_teammate_loop_phases,
+    # --- NEW: cross-version parity tests ---
+    test_context_manager_parity,
+    # --- NEW: behavioral tests ---
+    test_auto_compact_replaces_all_messages,
+    test_microcompact_min_savings_threshold,
+    test_compactable_tools_exactly_eight,
+    test_v7_notification_attachment_format,
+    test_v7_output_file_extension,
+    test_bash_timeout_default,
+    test_task_file_naming_sanitized_no_prefix,
+]
+
+
 if __name__ == "__main__":
-    tests = [
-        # Basic tests
-        test_imports,
-        test_todo_manager_basic,
-        test_todo_manager_constraints,
-        test_reminder_constants,
-        test_nag_reminder_in_agent_loop,
-        test_env_config,
-        test_default_model,
-        test_tool_schemas,
-        # TodoManager edge cases
-        test_todo_manager_empty_list,
-        test_todo_manager_status_transitions,
-        test_todo_manager_missing_fields,
-        test_todo_manager_invalid_status,
-        test_todo_manager_render_format,
-        # v3 tests
-        test_v3_agent_types_structure,
-        test_v3_get_tools_for_agent,
-        test_v3_get_agent_descriptions,
-        test_v3_task_tool_schema,
-        # v4 tests
-        test_v4_skill_loader_init,
-        test_v4_skill_loader_parse_valid,
-        test_v4_skill_loader_parse_invalid,
-        test_v4_skill_loader_get_content,
-        test_v4_skill_loader_list_skills,
-        test_v4_skill_tool_schema,
-        # Security tests
-        test_v3_safe_path,
-        # Config tests
-        test_base_url_config,
-        # v5 tests
-        test_v5_estimate_tokens,
-        test_v5_microcompact_keeps_recent,
-        test_v5_microcompact_skips_small,
-        test_v5_should_compact,
-        test_v5_handle_large_output,
-        test_v5_save_transcript,
-        # v6 tests
-        test_v6_task_create,
-        test_v6_task_get,
-        test_v6_task_update_status,
-        test_v6_task_dependencies,
-        test_v6_task_complete_clears_deps,
-        test_v6_task_list,
-        test_v6_task_persistence,
-        test_v6_task_delete,
-        test_v6_task_tools_in_all_tools,
-        # v7 tests
-        test_v7_background_run,
-        test_v7_background_get_output_blocking,
-        test_v7_background_get_output_nonblocking,
-        test_v7_background_notifications,
-        test_v7_background_stop,
-        test_v7_tools_in_all_tools,
-        # v8 tests
-        test_v8_create_team,
-        test_v8_send_message,
-        test_v8_message_types,
-        test_v8_delete_team,
-        test_v8_team_tools_in_all_tools,
-        test_v8_team_status,
-        # v5 mechanism-specific
-        test_v5_compactable_tools,
-        test_v5_auto_compact_source,
-        # v6 mechanism-specific
-        test_v6_dependency_bidirectional,
-        # v7 mechanism-specific
-        test_v7_tool_count,
-        test_v7_daemon_threads,
-        test_v7_notification_drain_clears,
-        test_v7_notification_xml_construction,
-        test_v7_summary_truncation,
-        # v8 mechanism-specific
-        test_v8_tool_count,
-        test_v8_teammate_tools_subset,
-        test_v8_message_types_count,
-        test_v8_teammate_bg_prefix,
-        test_v8_spawn_teammate_errors,
-        test_v8_find_teammate_cross_team,
-        test_v8_teammate_loop_structure,
-        test_v8_broadcast_to_all,
-        test_v8_delete_sends_shutdown,
-        # v2/v3 mechanism-specific
-        test_v2_system_reminders,
-        test_v3_context_isolation,
-        # --- NEW: v0 mechanism tests ---
-        test_v0_only_bash_tool,
-        test_v0_agent_loop_recursion,
-        test_v0_subagent_via_bash,
-        # --- NEW: v1 mechanism tests ---
-        test_v1_exactly_four_tools,
-        test_v1_safe_path_validation,
-        test_v1_bash_dangerous_commands,
-        test_v1_agent_loop_structure,
-        # --- NEW: v2 mechanism tests ---
-        test_v2_todo_max_items_enforced,
-        test_v2_todo_render_format_detailed,
-        test_v2_status_progression_enforcement,
-        # --- NEW: v3 mechanism tests ---
-        test_v3_agent_types_exactly_three,
-        test_v3_task_prevents_recursion,
-        test_v3_run_task_isolation,
-        # --- NEW: v4 mechanism tests ---
-        test_v4_skill_loader_yaml_edge_cases,
-        test_v4_skill_loader_cache_separation,
-        test_v4_skill_loader_empty_frontmatter,
-        # --- NEW: v5 mechanism tests ---
-        test_v5_compactable_tools_set,
-        test_v5_estimate_tokens_precision,
-        test_v5_microcompact_empty_messages,
-        test_v5_microcompact_all_recent,
-        test_v5_microcompact_no_compactable,
-        test_v5_should_compact_various_thresholds,
-        test_v5_handle_large_output_at_boundary,
-        test_v5_keep_recent_constant,
-        # --- NEW: v6 mechanism tests ---
-        test_v6_task_thread_safety,
-        test_v6_dependency_chain,
-        test_v6_task_delete_removes_disk,
-        test_v6_task_active_form,
-        test_v6_task_owner_tracking,
-        # --- NEW: v7 mechanism tests ---
-        test_v7_background_error_handling,
-        test_v7_stop_then_get_output,
-        test_v7_multiple_concurrent_tasks,
-        test_v7_notification_has_required_fields,
-        # --- NEW: v8 mechanism tests ---
-        test_v8_create_team_creates_directory,
-        test_v8_check_inbox_missing_file,
-        test_v8_broadcast_excludes_sender,
-        test_v8_teammate_tools_excludes_team_mgmt,
-        test_v8_find_teammate_with_team_name,
-        test_v8_send_message_validates_type,
-        test_v9_teammate_identity_injection,
-        test_v9_unclaimed_task_filter,
-        test_v9_teammate_loop_phases,
-        # --- NEW: cross-version parity tests ---
-        test_context_manager_parity,
-        # --- NEW: behavioral tests ---
-        test_auto_compact_replaces_all_messages,
-        test_microcompact_min_savings_threshold,
-        test_compactable_tools_exactly_eight,
-        test_v7_notification_attachment_format,
-        test_v7_output_file_extension,
-        test_bash_timeout_default,
-        test_task_file_naming_sanitized_no_prefix,
-    ]
+    tests = TESTS
 
     failed = []
     for test_fn in tests:
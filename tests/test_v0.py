@@ -10,12 +10,13 @@ import tempfile
 import time
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from tests.helpers import get_client, run_agent, run_tests, MODEL
+from tests.helpers import get_client, run_agent, run_tests, llm_test, MODEL
 from tests.helpers import BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL, TODO_WRITE_TOOL
 
 V0_TOOLS = [BASH_TOOL]
 
 
+@llm_test
 def test_bash_echo():
     """Model runs echo command and reports the output."""
     client = get_client()
@@ -40,6 +41,7 @@ def test_bash_echo():
     return True
 
 
+@llm_test
 def test_bash_pipeline():
     """Model uses piped commands (grep | wc) on a prepared file."""
     client = get_client()
@@ -70,6 +72,7 @@ def test_bash_pipeline():
     return True
 
 
+@llm_test
 def test_bash_file_creation():
     """Model creates a file using bash (echo > file), proving bash alone can do file I/O."""
     client = get_client()
@@ -101,6 +104,7 @@ def test_bash_file_creation():
     return True
 
 
+@llm_test
 def test_bash_error_handling():
     """Model runs a nonexistent command and reports the error."""
     client = get_client()
@@ -125,6 +129,7 @@ def test_bash_error_handling():
     return True
 
 
+@llm_test
 def test_bash_multi_step():
     """Model chains multiple bash commands to accomplish a goal (create dir, write file, verify)."""
     client = get_client()
@@ -159,6 +164,7 @@ def test_bash_multi_step():
     return True
 
 
+@llm_test
 def test_bash_only_tool():
     """Verify model uses ONLY bash (no other tools available), even for file operations."""
     client = get_client()
@@ -194,6 +200,7 @@ def test_bash_only_tool():
     return True
 
 
+@llm_test
 def test_bash_subagent_spawn():
     """Model spawns a subagent via 'python v0_bash_agent.py' to list files."""
     client = get_client()
@@ -260,14 +267,17 @@ def test_bash_output_truncation():
     return True
 
 
+TESTS = [
+    test_bash_echo,
+    test_bash_pipeline,
+    test_bash_file_creation,
+    test_bash_error_handling,
+    test_bash_multi_step,
+    test_bash_only_tool,
+    test_bash_subagent_spawn,
+    test_bash_output_truncation,
+]
+
+
 if __name__ == "__main__":
-    sys.exit(0 if run_tests([
-        test_bash_echo,
-        test_bash_pipeline,
-        test_bash_file_creation,
-        test_bash_error_handling,
-        test_bash_multi_step,
-        test_bash_only_tool,
-        test_bash_subagent_spawn,
-        test_bash_output_truncation,
-    ]) else 1)
+    sys.exit(0 if run_tests(TESTS) else 1)
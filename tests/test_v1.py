@@ -10,12 +10,13 @@ import tempfile
 import time
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from tests.helpers import get_client, run_agent, run_tests, MODEL
+from tests.helpers import get_client, run_agent, run_tests, llm_test, MODEL
 from tests.helpers import BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL, TODO_WRITE_TOOL
 
 V1_TOOLS = [BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL]
 
 
+@llm_test
 def test_read_file():
     """Model reads a prepared file and reports content."""
     client = get_client()
@@ -43,6 +44,7 @@ def test_read_file():
     return True
 
 
+@llm_test
 def test_write_file():
     """Model creates a file with write_file (NOT bash echo)."""
     client = get_client()
@@ -71,6 +73,7 @@ def test_write_file():
     return True
 
 
+@llm_test
 def test_edit_file():
     """Model modifies existing file content using edit_file."""
     client = get_client()
@@ -102,6 +105,7 @@ def test_edit_file():
     return True
 
 
+@llm_test
 def test_read_then_edit():
     """Multi-tool: model reads a file then edits it."""
     client = get_client()
@@ -129,6 +133,7 @@ def test_read_then_edit():
     return True
 
 
+@llm_test
 def test_write_then_verify():
     """Write a file then read to verify its contents."""
     client = get_client()
@@ -154,6 +159,7 @@ def test_write_then_verify():
     return True
 
 
+@llm_test
 def test_tool_selection():
     """Model prefers read_file over cat for reading when both bash and read_file are available."""
     client = get_client()
@@ -181,6 +187,7 @@ def test_tool_selection():
     return True
 
 
+@llm_test
 def test_multi_file_workflow():
     """Create 3 files, read one, edit another -- full workflow."""
     client = get_client()
@@ -214,6 +221,7 @@ def test_multi_file_workflow():
     return True
 
 
+@llm_test
 def test_error_recovery():
     """Model handles missing file gracefully (read nonexistent file, then responds helpfully)."""
     client = get_client()
@@ -242,14 +250,17 @@ def test_error_recovery():
     return True
 
 
+TESTS = [
+    test_read_file,
+    test_write_file,
+    test_edit_file,
+    test_read_then_edit,
+    test_write_then_verify,
+    test_tool_selection,
+    test_multi_file_workflow,
+    test_error_recovery,
+]
+
+
 if __name__ == "__main__":
-    sys.exit(0 if run_tests([
-        test_read_file,
-        test_write_file,
-        test_edit_file,
-        test_read_then_edit,
-        test_write_then_verify,
-        test_tool_selection,
-        test_multi_file_workflow,
-        test_error_recovery,
-    ]) else 1)
+    sys.exit(0 if run_tests(TESTS) else 1)
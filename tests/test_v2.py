@@ -10,7 +10,7 @@ import tempfile
 import time
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from tests.helpers import get_client, run_agent, run_tests, MODEL
+from tests.helpers import get_client, run_agent, run_tests, llm_test, MODEL
 from tests.helpers import BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL, TODO_WRITE_TOOL
 
 from v2_todo_agent import TodoManager
@@ -166,6 +166,7 @@ def test_nag_reminder_exists():
 # LLM tests
 # =============================================================================
 
+@llm_test
 def test_llm_plans_before_acting():
     """Give multi-step task, model uses TodoWrite BEFORE file tools."""
     client = get_client()
@@ -201,6 +202,7 @@ def test_llm_plans_before_acting():
     return True
 
 
+@llm_test
 def test_llm_updates_todo_progress():
     """Model updates todo items from pending to completed as work proceeds."""
     client = get_client()
@@ -236,6 +238,7 @@ def test_llm_updates_todo_progress():
     return True
 
 
+@llm_test
 def test_llm_multi_step_execution():
     """3 file creation task: model plans with todo, creates all 3 files."""
     client = get_client()
@@ -275,6 +278,7 @@ def test_llm_multi_step_execution():
     return True
 
 
+@llm_test
 def test_llm_todo_with_errors():
     """Task that includes a step that will fail (edit nonexistent string). Model should handle gracefully."""
     client = get_client()
@@ -309,16 +313,19 @@ def test_llm_todo_with_errors():
     return True
 
 
+TESTS = [
+    test_todo_manager_basic,
+    test_todo_manager_one_in_progress,
+    test_todo_manager_status_progression,
+    test_todo_manager_render_format,
+    test_max_items_constraint,
+    test_nag_reminder_exists,
+    test_llm_plans_before_acting,
+    test_llm_updates_todo_progress,
+    test_llm_multi_step_execution,
+    test_llm_todo_with_errors,
+]
+
+
 if __name__ == "__main__":
-    sys.exit(0 if run_tests([
-        test_todo_manager_basic,
-        test_todo_manager_one_in_progress,
-        test_todo_manager_status_progression,
-        test_todo_manager_render_format,
-        test_max_items_constraint,
-        test_nag_reminder_exists,
-        test_llm_plans_before_acting,
-        test_llm_updates_todo_progress,
-        test_llm_multi_step_execution,
-        test_llm_todo_with_errors,
-    ]) else 1)
+    sys.exit(0 if run_tests(TESTS) else 1)
@@ -10,7 +10,7 @@ import tempfile
 import time
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from tests.helpers import get_client, run_agent, run_tests, MODEL
+from tests.helpers import get_client, run_agent, run_tests, llm_test, MODEL
 from tests.helpers import BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL
 from tests.helpers import TODO_WRITE_TOOL, SKILL_TOOL, TASK_CREATE_TOOL, TASK_LIST_TOOL, TASK_UPDATE_TOOL
 
@@ -166,6 +166,7 @@ def _run_with_task_tool(client, task, extra_tools=None):
     return None, tool_calls_made, messages
 
 
+@llm_test
 def test_llm_uses_subagent_tool():
     client = get_client()
     if not client:
@@ -183,6 +184,7 @@ def test_llm_uses_subagent_tool():
     return True
 
 
+@llm_test
 def test_llm_delegates_exploration():
     client = get_client()
     if not client:
@@ -202,6 +204,7 @@ def test_llm_delegates_exploration():
     return True
 
 
+@llm_test
 def test_llm_delegates_coding():
     client = get_client()
     if not client:
@@ -221,6 +224,7 @@ def test_llm_delegates_coding():
     return True
 
 
+@llm_test
 def test_explore_code_pipeline():
     """Two-step delegation: explore agent finds files, then code agent creates summary."""
     client = get_client()
@@ -261,16 +265,19 @@ def test_explore_code_pipeline():
 # =============================================================================
 
 
+TESTS = [
+    test_agent_types_defined,
+    test_explore_readonly,
+    test_code_full_access,
+    test_plan_readonly,
+    test_no_recursive_task,
+    test_context_isolation_fresh_history,
+    test_llm_uses_subagent_tool,
+    test_llm_delegates_exploration,
+    test_llm_delegates_coding,
+    test_explore_code_pipeline,
+]
+
+
 if __name__ == "__main__":
-    sys.exit(0 if run_tests([
-        test_agent_types_defined,
-        test_explore_readonly,
-        test_code_full_access,
-        test_plan_readonly,
-        test_no_recursive_task,
-        test_context_isolation_fresh_history,
-        test_llm_uses_subagent_tool,
-        test_llm_delegates_exploration,
-        test_llm_delegates_coding,
-        test_explore_code_pipeline,
-    ]) else 1)
+    sys.exit(0 if run_tests(TESTS) else 1)
@@ -11,7 +11,7 @@ import time
 from pathlib import Path
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from tests.helpers import get_client, run_agent, run_tests, MODEL
+from tests.helpers import get_client, run_agent, run_tests, llm_test, MODEL
 from tests.helpers import BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL
 from tests.helpers import TODO_WRITE_TOOL, SKILL_TOOL, TASK_CREATE_TOOL, TASK_LIST_TOOL, TASK_UPDATE_TOOL
 
@@ -174,6 +174,7 @@ def test_skill_tool_returns_content():
 # =============================================================================
 
 
+@llm_test
 def test_llm_loads_skill():
     client = get_client()
     if not client:
@@ -196,6 +197,7 @@ def test_llm_loads_skill():
     return True
 
 
+@llm_test
 def test_llm_follows_skill_instructions():
     client = get_client()
     if not client:
@@ -216,6 +218,7 @@ def test_llm_follows_skill_instructions():
     return True
 
 
+@llm_test
 def test_llm_skill_then_work():
     client = get_client()
     if not client:
@@ -238,6 +241,7 @@ def test_llm_skill_then_work():
     return True
 
 
+@llm_test
 def test_skill_cache_separation():
     client = get_client()
     if not client:
@@ -273,16 +277,19 @@ def test_skill_cache_separation():
 # =============================================================================
 
 
+TESTS = [
+    test_skill_loader_init,
+    test_skill_loader_parse_valid,
+    test_skill_loader_parse_invalid,
+    test_skill_loader_list,
+    test_skill_injection_mechanism,
+    test_skill_tool_returns_content,
+    test_llm_loads_skill,
+    test_llm_follows_skill_instructions,
+    test_llm_skill_then_work,
+    test_skill_cache_separation,
+]
+
+
 if __name__ == "__main__":
-    sys.exit(0 if run_tests([
-        test_skill_loader_init,
-        test_skill_loader_parse_valid,
-        test_skill_loader_parse_invalid,
-        test_skill_loader_list,
-        test_skill_injection_mechanism,
-        test_skill_tool_returns_content,
-        test_llm_loads_skill,
-        test_llm_follows_skill_instructions,
-        test_llm_skill_then_work,
-        test_skill_cache_separation,
-    ]) else 1)
+    sys.exit(0 if run_tests(TESTS) else 1)
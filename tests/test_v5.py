@@ -14,7 +14,7 @@ import inspect
 from pathlib import Path
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from tests.helpers import get_client, run_agent, run_tests, MODEL
+from tests.helpers import get_client, run_agent, run_tests, llm_test, MODEL
 from tests.helpers import BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL
 from tests.helpers import TODO_WRITE_TOOL, SKILL_TOOL, TASK_CREATE_TOOL, TASK_LIST_TOOL, TASK_UPDATE_TOOL
 
@@ -344,6 +344,7 @@ def test_microcompact_only_compactable_tools():
 V1_TOOLS = [BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL]
 
 
+@llm_test
 def test_llm_reads_multiple_files():
     client = get_client()
     if not client:
@@ -371,6 +372,7 @@ def test_llm_reads_multiple_files():
     return True
 
 
+@llm_test
 def test_llm_read_edit_workflow():
     client = get_client()
     if not client:
@@ -399,6 +401,7 @@ def test_llm_read_edit_workflow():
     return True
 
 
+@llm_test
 def test_llm_write_and_verify():
     client = get_client()
     if not client:
@@ -426,6 +429,7 @@ def test_llm_write_and_verify():
     return True
 
 
+@llm_test
 def test_llm_many_turns():
     client = get_client()
     if not client:
@@ -833,44 +837,47 @@ def test_token_formula_min_savings_interaction():
 # =============================================================================
 
 
+TESTS = [
+    test_estimate_tokens,
+    test_microcompact_preserves_recent,
+    test_microcompact_replaces_old,
+    test_microcompact_skips_small,
+    test_should_compact_threshold,
+    test_should_compact_under_threshold,
+    test_handle_large_output_passthrough,
+    test_handle_large_output_saves,
+    test_auto_compact_preserves_recent,
+    test_transcript_save_and_load,
+    test_microcompact_only_compactable_tools,
+    # v5 mechanism-specific
+    test_agent_loop_calls_microcompact,
+    test_compact_command_in_repl,
+    test_compactable_tools_constant,
+    test_keep_recent_constant,
+    test_token_threshold_constant,
+    test_notification_drain_in_agent_loop,
+    # v5 new mechanism tests
+    test_auto_compact_threshold_default,
+    test_auto_compact_threshold_large_output,
+    test_min_savings_guard,
+    test_min_savings_guard_proceeds,
+    test_estimate_tokens_formula,
+    test_compactable_tools_valid,
+    test_restore_recent_files_limits,
+    test_restore_recent_files_empty_cache,
+    test_image_token_constant,
+    test_restore_recent_files_with_actual_files,
+    test_should_compact_exactly_at_threshold,
+    test_should_compact_just_below_threshold,
+    test_image_token_estimation_constant,
+    test_token_formula_min_savings_interaction,
+    # LLM integration
+    test_llm_reads_multiple_files,
+    test_llm_read_edit_workflow,
+    test_llm_write_and_verify,
+    test_llm_many_turns,
+]
+
+
 if __name__ == "__main__":
-    sys.exit(0 if run_tests([
-        test_estimate_tokens,
-        test_microcompact_preserves_recent,
-        test_microcompact_replaces_old,
-        test_microcompact_skips_small,
-        test_should_compact_threshold,
-        test_should_compact_under_threshold,
-        test_handle_large_output_passthrough,
-        test_handle_large_output_saves,
-        test_auto_compact_preserves_recent,
-        test_transcript_save_and_load,
-        test_microcompact_only_compactable_tools,
-        # v5 mechanism-specific
-        test_agent_loop_calls_microcompact,
-        test_compact_command_in_repl,
-        test_compactable_tools_constant,
-        test_keep_recent_constant,
-        test_token_threshold_constant,
-        test_notification_drain_in_agent_loop,
-        # v5 new mechanism tests
-        test_auto_compact_threshold_default,
-        test_auto_compact_threshold_large_output,
-        test_min_savings_guard,
-        test_min_savings_guard_proceeds,
-        test_estimate_tokens_formula,
-        test_compactable_tools_valid,
-        test_restore_recent_files_limits,
-        test_restore_recent_files_empty_cache,
-        test_image_token_constant,
-        test_restore_recent_files_with_actual_files,
-        test_should_compact_exactly_at_threshold,
-        test_should_compact_just_below_threshold,
-        test_image_token_estimation_constant,
-        test_token_formula_min_savings_interaction,
-        # LLM integration
-        test_llm_reads_multiple_files,
-        test_llm_read_edit_workflow,
-        test_llm_write_and_verify,
-        test_llm_many_turns,
-    ]) else 1)
+    sys.exit(0 if run_tests(TESTS) else 1)
@@ -11,7 +11,7 @@ import time
 import json
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from tests.helpers import get_client, run_agent, run_tests, MODEL
+from tests.helpers import get_client, run_agent, run_tests, llm_test, MODEL
 from tests.helpers import BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL
 from tests.helpers import TASK_CREATE_TOOL, TASK_LIST_TOOL, TASK_UPDATE_TOOL
 
@@ -201,6 +201,7 @@ TOOLS = [BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL,
          TASK_CREATE_TOOL, TASK_LIST_TOOL, TASK_UPDATE_TOOL]
 
 
+@llm_test
 def test_llm_creates_tasks():
     client = get_client()
     if not client:
@@ -222,6 +223,7 @@ def test_llm_creates_tasks():
     return True
 
 
+@llm_test
 def test_llm_task_then_work():
     client = get_client()
     if not client:
@@ -246,6 +248,7 @@ def test_llm_task_then_work():
     return True
 
 
+@llm_test
 def test_llm_lists_tasks():
     client = get_client()
     if not client:
@@ -280,6 +283,7 @@ def test_llm_lists_tasks():
     return True
 
 
+@llm_test
 def test_llm_full_workflow():
     client = get_client()
     if not client:
@@ -540,35 +544,38 @@ def test_dependency_cleanup_on_complete():
 # Main
 # =============================================================================
 
+TESTS = [
+    test_task_create_auto_id,
+    test_task_get,
+    test_task_update_status,
+    test_task_update_subject,
+    test_task_list,
+    test_task_delete,
+    test_dependency_add_blocked_by,
+    test_dependency_completion_unblocks,
+    test_dependency_chain,
+    test_persistence_survives_reload,
+    # v6 mechanism-specific
+    test_v6_feature_gate,
+    test_v6_task_active_form,
+    test_v6_agent_loop_integrates_tasks,
+    test_v6_tasks_json_persistence_format,
+    test_v6_dependency_bidirectional,
+    # v6 new mechanism tests
+    test_highwatermark_persistence,
+    test_resolve_task_list_id_env_var,
+    test_resolve_task_list_id_team_name,
+    test_resolve_task_list_id_default,
+    test_metadata_field_roundtrip,
+    test_auto_owner_on_in_progress,
+    test_dependency_cleanup_on_complete,
+    # LLM integration
+    test_llm_creates_tasks,
+    test_llm_task_then_work,
+    test_llm_lists_tasks,
+    test_llm_full_workflow,
+]
+
+
 if __name__ == "__main__":
-    sys.exit(0 if run_tests([
-        test_task_create_auto_id,
-        test_task_get,
-        test_task_update_status,
-        test_task_update_subject,
-        test_task_list,
-        test_task_delete,
-        test_dependency_add_blocked_by,
-        test_dependency_completion_unblocks,
-        test_dependency_chain,
-        test_persistence_survives_reload,
-        # v6 mechanism-specific
-        test_v6_feature_gate,
-        test_v6_task_active_form,
-        test_v6_agent_loop_integrates_tasks,
-        test_v6_tasks_json_persistence_format,
-        test_v6_dependency_bidirectional,
-        # v6 new mechanism tests
-        test_highwatermark_persistence,
-        test_resolve_task_list_id_env_var,
-        test_resolve_task_list_id_team_name,
-        test_resolve_task_list_id_default,
-        test_metadata_field_roundtrip,
-        test_auto_owner_on_in_progress,
-        test_dependency_cleanup_on_complete,
-        # LLM integration
-        test_llm_creates_tasks,
-        test_llm_task_then_work,
-        test_llm_lists_tasks,
-        test_llm_full_workflow,
-    ]) else 1)
+    sys.exit(0 if run_tests(TESTS) else 1)
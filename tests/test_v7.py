@@ -11,7 +11,7 @@ import time
 import json
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from tests.helpers import get_client, run_agent, run_tests, MODEL
+from tests.helpers import get_client, run_agent, run_tests, llm_test, MODEL
 from tests.helpers import BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL
 from tests.helpers import TASK_CREATE_TOOL, TASK_LIST_TOOL, TASK_UPDATE_TOOL
 
@@ -530,6 +530,7 @@ V7_TOOLS = [BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL,
             TASK_OUTPUT_TOOL, TASK_STOP_TOOL]
 
 
+@llm_test
 def test_llm_uses_task_output():
     """LLM uses TaskOutput to retrieve a background task result.
 
@@ -566,6 +567,7 @@ def test_llm_uses_task_output():
     return True
 
 
+@llm_test
 def test_llm_uses_task_stop():
     """LLM uses TaskStop to terminate a running background task."""
     client = get_client()
@@ -591,6 +593,7 @@ def test_llm_uses_task_stop():
     return True
 
 
+@llm_test
 def test_llm_background_workflow():
     """LLM retrieves a background task output then writes a file.
 
@@ -634,6 +637,7 @@ def test_llm_background_workflow():
     return True
 
 
+@llm_test
 def test_llm_file_task():
     """Basic v7 test: LLM uses write_file + read_file for file operations."""
     client = get_client()
@@ -660,44 +664,47 @@ def test_llm_file_task():
 # Main
 # =============================================================================
 
+TESTS = [
+    # BackgroundManager unit tests
+    test_run_returns_id,
+    test_bash_id_prefix,
+    test_agent_id_prefix,
+    test_get_output_blocking,
+    test_get_output_nonblocking,
+    test_parallel_execution,
+    test_notifications_on_complete,
+    test_stop_task,
+    test_error_propagation,
+    test_notification_format,
+    test_concurrent_blocking_retrieval,
+    # Tools verification
+    test_v7_tools_in_all_tools,
+    test_v7_tool_count,
+    test_v7_id_prefix_mapping,
+    # Mechanism-specific
+    test_v7_notification_xml_format,
+    test_v7_agent_loop_drains_before_api,
+    test_v7_background_task_thread_daemon,
+    test_v7_timeout_on_blocking_get,
+    test_v7_notification_xml_construction,
+    test_v7_summary_truncation,
+    test_v7_event_based_waiting,
+    test_v7_bash_run_in_background_schema,
+    # v7 new mechanism tests
+    test_non_editable_queue_mode,
+    test_editable_queue_mode,
+    test_notification_xml_all_tags,
+    test_output_file_append,
+    test_output_file_incremental_read,
+    test_background_task_error_recovery,
+    test_output_file_incremental_read_offset,
+    # LLM integration tests
+    test_llm_uses_task_output,
+    test_llm_uses_task_stop,
+    test_llm_background_workflow,
+    test_llm_file_task,
+]
+
+
 if __name__ == "__main__":
-    sys.exit(0 if run_tests([
-        # BackgroundManager unit tests
-        test_run_returns_id,
-        test_bash_id_prefix,
-        test_agent_id_prefix,
-        test_get_output_blocking,
-        test_get_output_nonblocking,
-        test_parallel_execution,
-        test_notifications_on_complete,
-        test_stop_task,
-        test_error_propagation,
-        test_notification_format,
-        test_concurrent_blocking_retrieval,
-        # Tools verification
-        test_v7_tools_in_all_tools,
-        test_v7_tool_count,
-        test_v7_id_prefix_mapping,
-        # Mechanism-specific
-        test_v7_notification_xml_format,
-        test_v7_agent_loop_drains_before_api,
-        test_v7_background_task_thread_daemon,
-        test_v7_timeout_on_blocking_get,
-        test_v7_notification_xml_construction,
-        test_v7_summary_truncation,
-        test_v7_event_based_waiting,
-        test_v7_bash_run_in_background_schema,
-        # v7 new mechanism tests
-        test_non_editable_queue_mode,
-        test_editable_queue_mode,
-        test_notification_xml_all_tags,
-        test_output_file_append,
-        test_output_file_incremental_read,
-        test_background_task_error_recovery,
-        test_output_file_incremental_read_offset,
-        # LLM integration tests
-        test_llm_uses_task_output,
-        test_llm_uses_task_stop,
-        test_llm_background_workflow,
-        test_llm_file_task,
-    ]) else 1)
+    sys.exit(0 if run_tests(TESTS) else 1)
@@ -9,26 +9,52 @@ config.json persistence, TEAMS_DIR, BackgroundManager, and tool count.
 
 LLM integration tests verify the model can use TeamCreate/TeamDelete.
 """
+import ast
 import os
 import sys
 import tempfile
-import time
 import json
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from tests.helpers import get_client, run_agent, run_tests, MODEL
+from tests.helpers import get_async_client, run_agent_async, run_tests, llm_test, serial_test, new_inbox, add_mate, MODEL
 from tests.helpers import BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL
 from tests.helpers import TASK_CREATE_TOOL, TASK_LIST_TOOL, TASK_UPDATE_TOOL
 from tests.helpers import TASK_OUTPUT_TOOL, TASK_STOP_TOOL
 from tests.helpers import TEAM_CREATE_TOOL, TEAM_DELETE_TOOL
 
 from pathlib import Path
+import v8a_team_foundation
 from v8a_team_foundation import (
     TeammateManager, Teammate, TaskManager,
     TEAMMATE_TOOLS, ALL_TOOLS, TEAMS_DIR,
     BackgroundManager, TEAMMATE_COLORS,
 )
 
+# Tool-name sets are invariants of the module, computed once at import
+_TEAMMATE_NAMES = frozenset(t["name"] for t in TEAMMATE_TOOLS)
+_ALL_NAMES = frozenset(t["name"] for t in ALL_TOOLS)
+
+
+def _function_tokens(module, name):
+    """Identifiers, attribute names and string constants used in a function.
+
+    Parses the module once with ast rather than grepping inspect.getsource().
+    """
+    tree = ast.parse(Path(module.__file__).read_text())
+    fn = next(n for n in ast.walk(tree) if isinstance(n, ast.FunctionDef) and n.name == name)
+    tokens = set()
+    for node in ast.walk(fn):
+        if isinstance(node, ast.Name):
+            tokens.add(node.id)
+        elif isinstance(node, ast.Attribute):
+            tokens.add(node.attr)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+            tokens.add(node.value)
+    return frozenset(tokens)
+
+
+_LOOP_TOKENS = _function_tokens(v8a_team_foundation, "_teammate_loop")
+
 
 # =============================================================================
 # Unit Tests - TeammateManager Foundation
@@ -53,47 +79,41 @@ def test_create_duplicate_team():
     return True
 
 
-def test_delete_team():
+def test_delete_team(scratch=None):
     """Verify delete_team removes the team and marks teammates as shutdown."""
     tm = TeammateManager()
     tm.create_team("del-team")
 
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
-    teammate = Teammate(name="worker", team_name="del-team", inbox_path=inbox)
-    tm._teams["del-team"]["worker"] = teammate
+    teammate = add_mate(tm, "del-team", "worker", scratch)
 
     result = tm.delete_team("del-team")
     assert "deleted" in result.lower(), f"Expected 'deleted' in response, got: {result}"
     assert "del-team" not in tm._teams, "Team should be removed from _teams"
     assert teammate.status == "shutdown", "Teammate status should be 'shutdown'"
 
-    inbox.unlink(missing_ok=True)
     print("PASS: test_delete_team")
     return True
 
 
-def test_team_status():
+def test_team_status(scratch=None):
     """Verify get_team_status returns team info."""
     tm = TeammateManager()
     assert "No teams" in tm.get_team_status(), "Empty manager should say 'No teams'"
 
     tm.create_team("status-team")
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
-    teammate = Teammate(name="bob", team_name="status-team", inbox_path=inbox)
-    tm._teams["status-team"]["bob"] = teammate
+    add_mate(tm, "status-team", "bob", scratch)
 
     status = tm.get_team_status("status-team")
     assert "status-team" in status, f"Team name should be in status, got: {status}"
     assert "bob" in status, f"Member name should be in status, got: {status}"
 
-    inbox.unlink(missing_ok=True)
     print("PASS: test_team_status")
     return True
 
 
-def test_teammate_dataclass_defaults():
+def test_teammate_dataclass_defaults(scratch=None):
     """Verify Teammate dataclass defaults: status='active', agent_id auto-generated."""
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
+    inbox = new_inbox(scratch)
     t = Teammate(name="alice", team_name="test-team", inbox_path=inbox)
 
     assert t.status == "active", f"Initial status should be 'active', got '{t.status}'"
@@ -101,7 +121,6 @@ def test_teammate_dataclass_defaults():
     assert t.name == "alice"
     assert t.team_name == "test-team"
 
-    inbox.unlink(missing_ok=True)
     print("PASS: test_teammate_dataclass_defaults")
     return True
 
@@ -121,6 +140,7 @@ def test_teammate_status_transitions():
     return True
 
 
+@serial_test
 def test_config_json_created():
     """Verify create_team creates config.json with correct structure."""
     import v8a_team_foundation
@@ -142,7 +162,8 @@ def test_config_json_created():
     return True
 
 
-def test_config_persists_after_spawn():
+@serial_test
+def test_config_persists_after_spawn(scratch=None):
     """Verify config.json reflects team membership after _update_team_config."""
     import v8a_team_foundation
     orig_dir = v8a_team_foundation.TEAMS_DIR
@@ -151,9 +172,7 @@ def test_config_persists_after_spawn():
         tm = TeammateManager()
         tm.create_team("persist-test")
 
-        inbox = Path(tempfile.mktemp(suffix=".jsonl"))
-        mate = Teammate(name="alice", team_name="persist-test", inbox_path=inbox)
-        tm._teams["persist-test"]["alice"] = mate
+        add_mate(tm, "persist-test", "alice", scratch)
         tm._update_team_config("persist-test")
 
         config_path = Path(tmpdir) / "persist-test" / "config.json"
@@ -162,7 +181,6 @@ def test_config_persists_after_spawn():
         assert "alice" in member_names, \
             f"config.json should list 'alice' as member, got {member_names}"
 
-        inbox.unlink(missing_ok=True)
         v8a_team_foundation.TEAMS_DIR = orig_dir
     print("PASS: test_config_persists_after_spawn")
     return True
@@ -186,26 +204,19 @@ def test_agent_id_format():
     return True
 
 
-def test_teammate_colors_cycle():
+def test_teammate_colors_cycle(scratch=None):
     """Verify colors cycle through TEAMMATE_COLORS array."""
     tm = TeammateManager()
     tm.create_team("color-test")
     colors_seen = []
-    inboxes = []
     for i in range(7):
-        inbox = Path(tempfile.mktemp(suffix=".jsonl"))
         color_idx = i % len(TEAMMATE_COLORS)
-        mate = Teammate(name=f"w{i}", team_name="color-test", inbox_path=inbox,
-                        color=TEAMMATE_COLORS[color_idx])
-        tm._teams["color-test"][f"w{i}"] = mate
+        mate = add_mate(tm, "color-test", f"w{i}", scratch, color=TEAMMATE_COLORS[color_idx])
         colors_seen.append(mate.color)
-        inboxes.append(inbox)
 
     assert colors_seen[0] == colors_seen[5], "Color at index 0 should equal index 5 (cycling)"
     assert colors_seen[1] == colors_seen[6], "Color at index 1 should equal index 6 (cycling)"
 
-    for inbox in inboxes:
-        inbox.unlink(missing_ok=True)
     print("PASS: test_teammate_colors_cycle")
     return True
 
@@ -229,21 +240,21 @@ def test_spawn_teammate_returns_json():
     assert data["name"] == "w1"
     assert data["team"] == "spawn-test"
     assert data["status"] == "active"
+    threads = [m.thread for m in tm._teams["spawn-test"].values() if m.thread]
     tm.delete_team("spawn-test")
-    time.sleep(0.1)
+    for t in threads:
+        t.join(timeout=2.0)
     print("PASS: test_spawn_teammate_returns_json")
     return True
 
 
-def test_find_teammate_cross_team():
+def test_find_teammate_cross_team(scratch=None):
     """Verify _find_teammate searches across all teams when team_name is None."""
     tm = TeammateManager()
     tm.create_team("alpha")
     tm.create_team("beta")
 
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
-    mate = Teammate(name="hidden", team_name="beta", inbox_path=inbox)
-    tm._teams["beta"]["hidden"] = mate
+    add_mate(tm, "beta", "hidden", scratch)
 
     found = tm._find_teammate("hidden")
     assert found is not None, "Should find teammate across teams"
@@ -252,7 +263,6 @@ def test_find_teammate_cross_team():
     not_found = tm._find_teammate("nonexistent")
     assert not_found is None, "Should not find nonexistent teammate"
 
-    inbox.unlink(missing_ok=True)
     print("PASS: test_find_teammate_cross_team")
     return True
 
@@ -277,12 +287,10 @@ def test_v8a_tool_count():
 
 def test_v8a_no_send_message():
     """Verify v8a does NOT have SendMessage in its tools."""
-    all_names = {t["name"] for t in ALL_TOOLS}
-    assert "SendMessage" not in all_names, \
+    assert "SendMessage" not in _ALL_NAMES, \
         "v8a ALL_TOOLS should NOT include SendMessage (added in v8b)"
 
-    teammate_names = {t["name"] for t in TEAMMATE_TOOLS}
-    assert "SendMessage" not in teammate_names, \
+    assert "SendMessage" not in _TEAMMATE_NAMES, \
         "v8a TEAMMATE_TOOLS should NOT include SendMessage (added in v8b)"
     print("PASS: test_v8a_no_send_message")
     return True
@@ -290,33 +298,30 @@ def test_v8a_no_send_message():
 
 def test_v8a_teammate_tools_have_task_crud():
     """Verify TEAMMATE_TOOLS has base tools + task CRUD."""
-    tool_names = {t["name"] for t in TEAMMATE_TOOLS}
-    assert "bash" in tool_names
-    assert "read_file" in tool_names
-    assert "write_file" in tool_names
-    assert "edit_file" in tool_names
-    assert "TaskCreate" in tool_names
-    assert "TaskGet" in tool_names
-    assert "TaskUpdate" in tool_names
-    assert "TaskList" in tool_names
+    assert "bash" in _TEAMMATE_NAMES
+    assert "read_file" in _TEAMMATE_NAMES
+    assert "write_file" in _TEAMMATE_NAMES
+    assert "edit_file" in _TEAMMATE_NAMES
+    assert "TaskCreate" in _TEAMMATE_NAMES
+    assert "TaskGet" in _TEAMMATE_NAMES
+    assert "TaskUpdate" in _TEAMMATE_NAMES
+    assert "TaskList" in _TEAMMATE_NAMES
     print("PASS: test_v8a_teammate_tools_have_task_crud")
     return True
 
 
 def test_v8a_teammate_tools_exclude_team_mgmt():
     """Verify TEAMMATE_TOOLS excludes TeamCreate and TeamDelete."""
-    tool_names = {t["name"] for t in TEAMMATE_TOOLS}
-    assert "TeamCreate" not in tool_names, "Teammates should not have TeamCreate"
-    assert "TeamDelete" not in tool_names, "Teammates should not have TeamDelete"
+    assert "TeamCreate" not in _TEAMMATE_NAMES, "Teammates should not have TeamCreate"
+    assert "TeamDelete" not in _TEAMMATE_NAMES, "Teammates should not have TeamDelete"
     print("PASS: test_v8a_teammate_tools_exclude_team_mgmt")
     return True
 
 
 def test_v8a_all_tools_have_team_mgmt():
     """Verify ALL_TOOLS includes TeamCreate and TeamDelete."""
-    all_names = {t["name"] for t in ALL_TOOLS}
-    assert "TeamCreate" in all_names
-    assert "TeamDelete" in all_names
+    assert "TeamCreate" in _ALL_NAMES
+    assert "TeamDelete" in _ALL_NAMES
     print("PASS: test_v8a_all_tools_have_team_mgmt")
     return True
 
@@ -337,11 +342,9 @@ def test_task_board_sharing():
 
 def test_teammate_loop_has_tool_loop():
     """Verify _teammate_loop has tool execution and shutdown logic."""
-    import inspect
-    source = inspect.getsource(TeammateManager._teammate_loop)
-    assert "tool_use" in source, "Loop must check for tool_use stop reason"
-    assert "shutdown" in source, "Loop must handle shutdown"
-    assert "microcompact" in source, "Loop must support context compression"
+    assert "tool_use" in _LOOP_TOKENS, "Loop must check for tool_use stop reason"
+    assert "shutdown" in _LOOP_TOKENS, "Loop must handle shutdown"
+    assert "microcompact" in _LOOP_TOKENS, "Loop must support context compression"
     print("PASS: test_teammate_loop_has_tool_loop")
     return True
 
@@ -356,14 +359,15 @@ V8A_TOOLS = [BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL,
              TEAM_CREATE_TOOL, TEAM_DELETE_TOOL]
 
 
-def test_llm_creates_team():
+@llm_test
+async def test_llm_creates_team():
     """LLM uses TeamCreate to set up a new team."""
-    client = get_client()
+    client = get_async_client()
     if not client:
         print("SKIP: No API key")
         return True
 
-    text, calls, _ = run_agent(
+    text, calls, _ = await run_agent_async(
         client,
         "Create a new team called 'frontend-team' for building the UI. Use the TeamCreate tool.",
         V8A_TOOLS,
@@ -379,14 +383,15 @@ def test_llm_creates_team():
     return True
 
 
-def test_llm_team_lifecycle():
+@llm_test
+async def test_llm_team_lifecycle():
     """LLM creates and then deletes a team."""
-    client = get_client()
+    client = get_async_client()
     if not client:
         print("SKIP: No API key")
         return True
 
-    text, calls, _ = run_agent(
+    text, calls, _ = await run_agent_async(
         client,
         "Do the following in order:\n"
         "1) Create a team called 'temp-team' using TeamCreate\n"
@@ -410,31 +415,39 @@ def test_llm_team_lifecycle():
 # Main
 # =============================================================================
 
+UNIT_TESTS = [
+    test_create_team,
+    test_create_duplicate_team,
+    test_delete_team,
+    test_team_status,
+    test_teammate_dataclass_defaults,
+    test_teammate_status_transitions,
+    test_config_json_created,
+    test_config_persists_after_spawn,
+    test_teams_dir_defined,
+    test_agent_id_format,
+    test_teammate_colors_cycle,
+    test_spawn_teammate_error_no_team,
+    test_spawn_teammate_returns_json,
+    test_find_teammate_cross_team,
+    test_background_manager_teammate_prefix,
+    test_v8a_tool_count,
+    test_v8a_no_send_message,
+    test_v8a_teammate_tools_have_task_crud,
+    test_v8a_teammate_tools_exclude_team_mgmt,
+    test_v8a_all_tools_have_team_mgmt,
+    test_task_board_sharing,
+    test_teammate_loop_has_tool_loop,
+]
+
+LLM_TESTS = [
+    test_llm_creates_team,
+    test_llm_team_lifecycle,
+]
+
+TESTS = UNIT_TESTS + LLM_TESTS
+
+
 if __name__ == "__main__":
-    sys.exit(0 if run_tests([
-        test_create_team,
-        test_create_duplicate_team,
-        test_delete_team,
-        test_team_status,
-        test_teammate_dataclass_defaults,
-        test_teammate_status_transitions,
-        test_config_json_created,
-        test_config_persists_after_spawn,
-        test_teams_dir_defined,
-        test_agent_id_format,
-        test_teammate_colors_cycle,
-        test_spawn_teammate_error_no_team,
-        test_spawn_teammate_returns_json,
-        test_find_teammate_cross_team,
-        test_background_manager_teammate_prefix,
-        test_v8a_tool_count,
-        test_v8a_no_send_message,
-        test_v8a_teammate_tools_have_task_crud,
-        test_v8a_teammate_tools_exclude_team_mgmt,
-        test_v8a_all_tools_have_team_mgmt,
-        test_task_board_sharing,
-        test_teammate_loop_has_tool_loop,
-        # LLM integration
-        test_llm_creates_team,
-        test_llm_team_lifecycle,
-    ]) else 1)
+    ok = run_tests(UNIT_TESTS, llm_tests=LLM_TESTS, workers=os.cpu_count() or 1)
+    sys.exit(0 if ok else 1)
@@ -11,12 +11,11 @@ LLM integration tests verify the model can use SendMessage.
 """
 import os
 import sys
-import tempfile
 import time
 import json
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from tests.helpers import get_client, run_agent, run_tests, MODEL
+from tests.helpers import get_async_client, run_agent_async, run_tests, llm_test, add_mate, MODEL
 from tests.helpers import BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL
 from tests.helpers import TASK_CREATE_TOOL, TASK_LIST_TOOL, TASK_UPDATE_TOOL
 from tests.helpers import TASK_OUTPUT_TOOL, TASK_STOP_TOOL
@@ -24,43 +23,42 @@ from tests.helpers import TEAM_CREATE_TOOL, SEND_MESSAGE_TOOL, TEAM_DELETE_TOOL
 
 from pathlib import Path
 from v8b_messaging import (
-    TeammateManager, Teammate, TaskManager,
+    TeammateManager, TaskManager,
     MESSAGE_TYPES, TEAMMATE_TOOLS, ALL_TOOLS, TEAMS_DIR,
 )
 
+# Tool-name sets are invariants of the module, computed once at import
+_TEAMMATE_NAMES = frozenset(t["name"] for t in TEAMMATE_TOOLS)
+_ALL_NAMES = frozenset(t["name"] for t in ALL_TOOLS)
+
 
 # =============================================================================
 # Unit Tests - Messaging
 # =============================================================================
 
-def test_send_message():
+def test_send_message(scratch=None):
     """Verify send_message writes to recipient inbox file."""
     tm = TeammateManager()
     tm.create_team("msg-team")
 
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
-    teammate = Teammate(name="alice", team_name="msg-team", inbox_path=inbox)
-    tm._teams["msg-team"]["alice"] = teammate
+    teammate = add_mate(tm, "msg-team", "alice", scratch)
 
     tm.send_message("alice", "Hello Alice!", msg_type="message", team_name="msg-team")
 
-    assert inbox.exists(), "Inbox file should exist after sending message"
-    content = inbox.read_text()
+    assert teammate.inbox_path.exists(), "Inbox file should exist after sending message"
+    content = teammate.inbox_path.read_text()
     assert "Hello Alice!" in content
 
-    inbox.unlink(missing_ok=True)
     print("PASS: test_send_message")
     return True
 
 
-def test_check_inbox_drain():
+def test_check_inbox_drain(scratch=None):
     """Verify check_inbox returns all messages and empties the inbox."""
     tm = TeammateManager()
     tm.create_team("drain-team")
 
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
-    teammate = Teammate(name="alice", team_name="drain-team", inbox_path=inbox)
-    tm._teams["drain-team"]["alice"] = teammate
+    add_mate(tm, "drain-team", "alice", scratch)
 
     tm.send_message("alice", "First", msg_type="message", team_name="drain-team")
     tm.send_message("alice", "Second", msg_type="message", team_name="drain-team")
@@ -74,24 +72,21 @@ def test_check_inbox_drain():
     msgs_after = tm.check_inbox("alice", "drain-team")
     assert len(msgs_after) == 0, f"Inbox should be empty after drain, got {len(msgs_after)}"
 
-    inbox.unlink(missing_ok=True)
     print("PASS: test_check_inbox_drain")
     return True
 
 
-def test_inbox_jsonl_format():
+def test_inbox_jsonl_format(scratch=None):
     """Verify inbox uses JSONL format (one JSON object per line)."""
     tm = TeammateManager()
     tm.create_team("jsonl-team")
 
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
-    teammate = Teammate(name="fmt-test", team_name="jsonl-team", inbox_path=inbox)
-    tm._teams["jsonl-team"]["fmt-test"] = teammate
+    teammate = add_mate(tm, "jsonl-team", "fmt-test", scratch)
 
     tm.send_message("fmt-test", "Msg 1", msg_type="message", team_name="jsonl-team")
     tm.send_message("fmt-test", "Msg 2", msg_type="broadcast", team_name="jsonl-team")
 
-    with open(inbox) as f:
+    with open(teammate.inbox_path) as f:
         lines = [l.strip() for l in f if l.strip()]
 
     assert len(lines) == 2, f"Expected 2 JSONL lines, got {len(lines)}"
@@ -100,7 +95,6 @@ def test_inbox_jsonl_format():
         assert "type" in data, f"Line {i}: missing 'type'"
         assert "content" in data, f"Line {i}: missing 'content'"
 
-    inbox.unlink(missing_ok=True)
     print("PASS: test_inbox_jsonl_format")
     return True
 
@@ -115,14 +109,12 @@ def test_message_types_constant():
     return True
 
 
-def test_all_message_types_delivered():
+def test_all_message_types_delivered(scratch=None):
     """Verify all 5 message types can be sent and received."""
     tm = TeammateManager()
     tm.create_team("alltype-team")
 
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
-    teammate = Teammate(name="tester", team_name="alltype-team", inbox_path=inbox)
-    tm._teams["alltype-team"]["tester"] = teammate
+    add_mate(tm, "alltype-team", "tester", scratch)
 
     all_types = sorted(MESSAGE_TYPES)
     for msg_type in all_types:
@@ -136,22 +128,17 @@ def test_all_message_types_delivered():
     assert received_types == MESSAGE_TYPES, \
         f"Received types mismatch: expected {MESSAGE_TYPES}, got {received_types}"
 
-    inbox.unlink(missing_ok=True)
     print("PASS: test_all_message_types_delivered")
     return True
 
 
-def test_broadcast_sends_to_all_except_sender():
+def test_broadcast_sends_to_all_except_sender(scratch=None):
     """Verify broadcast sends to all teammates except the sender."""
     tm = TeammateManager()
     tm.create_team("bcast-team")
 
-    inboxes = {}
     for name in ["lead", "worker1", "worker2"]:
-        inbox = Path(tempfile.mktemp(suffix=".jsonl"))
-        mate = Teammate(name=name, team_name="bcast-team", inbox_path=inbox)
-        tm._teams["bcast-team"][name] = mate
-        inboxes[name] = inbox
+        add_mate(tm, "bcast-team", name, scratch)
 
     tm.send_message("", "Announcement", msg_type="broadcast",
                     sender="lead", team_name="bcast-team")
@@ -164,24 +151,18 @@ def test_broadcast_sends_to_all_except_sender():
         assert len(msgs) >= 1, f"{name} should receive broadcast"
         assert "Announcement" in msgs[0]["content"]
 
-    for inbox in inboxes.values():
-        inbox.unlink(missing_ok=True)
     print("PASS: test_broadcast_sends_to_all_except_sender")
     return True
 
 
-def test_broadcast_to_many_teammates():
+def test_broadcast_to_many_teammates(scratch=None):
     """Verify broadcast to 5+ teammates (excluding sender)."""
     tm = TeammateManager()
     tm.create_team("big-bcast")
 
-    inboxes = []
     names = ["sender"] + [f"worker{i}" for i in range(5)]
     for name in names:
-        inbox = Path(tempfile.mktemp(suffix=".jsonl"))
-        mate = Teammate(name=name, team_name="big-bcast", inbox_path=inbox)
-        tm._teams["big-bcast"][name] = mate
-        inboxes.append(inbox)
+        add_mate(tm, "big-bcast", name, scratch)
 
     tm.send_message("", "Team update", msg_type="broadcast",
                     sender="sender", team_name="big-bcast")
@@ -193,20 +174,16 @@ def test_broadcast_to_many_teammates():
         msgs = tm.check_inbox(f"worker{i}", "big-bcast")
         assert len(msgs) == 1, f"worker{i} should get 1 broadcast, got {len(msgs)}"
 
-    for inbox in inboxes:
-        inbox.unlink(missing_ok=True)
     print("PASS: test_broadcast_to_many_teammates")
     return True
 
 
-def test_broadcast_with_no_other_teammates():
+def test_broadcast_with_no_other_teammates(scratch=None):
     """Verify broadcast with only sender reaches 0 recipients."""
     tm = TeammateManager()
     tm.create_team("empty-bcast")
 
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
-    mate = Teammate(name="lonely", team_name="empty-bcast", inbox_path=inbox)
-    tm._teams["empty-bcast"]["lonely"] = mate
+    add_mate(tm, "empty-bcast", "lonely", scratch)
 
     result = tm.send_message("", "Nobody here", msg_type="broadcast",
                              sender="lonely", team_name="empty-bcast")
@@ -215,19 +192,16 @@ def test_broadcast_with_no_other_teammates():
     msgs = tm.check_inbox("lonely", "empty-bcast")
     assert len(msgs) == 0, "Sender should not receive own broadcast"
 
-    inbox.unlink(missing_ok=True)
     print("PASS: test_broadcast_with_no_other_teammates")
     return True
 
 
-def test_broadcast_no_recipient_required():
+def test_broadcast_no_recipient_required(scratch=None):
     """Verify broadcast works with empty recipient string."""
     tm = TeammateManager()
     tm.create_team("bcast-nr")
 
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
-    mate = Teammate(name="recv", team_name="bcast-nr", inbox_path=inbox)
-    tm._teams["bcast-nr"]["recv"] = mate
+    add_mate(tm, "bcast-nr", "recv", scratch)
 
     result = tm.send_message("", "Hello all", msg_type="broadcast",
                              sender="lead", team_name="bcast-nr")
@@ -235,7 +209,6 @@ def test_broadcast_no_recipient_required():
     msgs = tm.check_inbox("recv", "bcast-nr")
     assert len(msgs) >= 1
 
-    inbox.unlink(missing_ok=True)
     print("PASS: test_broadcast_no_recipient_required")
     return True
 
@@ -254,16 +227,14 @@ def test_message_requires_recipient():
 
 def test_v8b_has_send_message_tool():
     """Verify v8b ALL_TOOLS includes SendMessage."""
-    all_names = {t["name"] for t in ALL_TOOLS}
-    assert "SendMessage" in all_names, "v8b ALL_TOOLS must include SendMessage"
+    assert "SendMessage" in _ALL_NAMES, "v8b ALL_TOOLS must include SendMessage"
     print("PASS: test_v8b_has_send_message_tool")
     return True
 
 
 def test_v8b_teammate_tools_have_send_message():
     """Verify TEAMMATE_TOOLS includes SendMessage."""
-    tool_names = {t["name"] for t in TEAMMATE_TOOLS}
-    assert "SendMessage" in tool_names, "TEAMMATE_TOOLS must include SendMessage"
+    assert "SendMessage" in _TEAMMATE_NAMES, "TEAMMATE_TOOLS must include SendMessage"
     print("PASS: test_v8b_teammate_tools_have_send_message")
     return True
 
@@ -277,28 +248,24 @@ def test_v8b_tool_count():
 
 def test_v8b_teammate_tools_subset():
     """Verify TEAMMATE_TOOLS is a strict subset of ALL_TOOLS."""
-    teammate_names = {t["name"] for t in TEAMMATE_TOOLS}
-    all_names = {t["name"] for t in ALL_TOOLS}
-    assert teammate_names.issubset(all_names), \
-        f"Extra: {teammate_names - all_names}"
+    assert _TEAMMATE_NAMES.issubset(_ALL_NAMES), \
+        f"Extra: {_TEAMMATE_NAMES - _ALL_NAMES}"
     assert len(TEAMMATE_TOOLS) < len(ALL_TOOLS), \
         "TEAMMATE_TOOLS should have fewer tools than ALL_TOOLS"
     print("PASS: test_v8b_teammate_tools_subset")
     return True
 
 
-def test_check_inbox_atomicity():
+def test_check_inbox_atomicity(scratch=None):
     """Verify check_inbox uses lock file to prevent race."""
     tm = TeammateManager()
     tm.create_team("lock-team")
 
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
-    teammate = Teammate(name="locker", team_name="lock-team", inbox_path=inbox)
-    tm._teams["lock-team"]["locker"] = teammate
+    teammate = add_mate(tm, "lock-team", "locker", scratch)
 
     tm.send_message("locker", "msg1", msg_type="message", team_name="lock-team")
 
-    lock_path = inbox.with_suffix(".lock")
+    lock_path = teammate.inbox_path.with_suffix(".lock")
     fd = os.open(str(lock_path), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
     try:
         msgs = tm.check_inbox("locker", "lock-team")
@@ -310,22 +277,17 @@ def test_check_inbox_atomicity():
     msgs = tm.check_inbox("locker", "lock-team")
     assert len(msgs) == 1, f"Should get message after lock released, got {len(msgs)}"
 
-    inbox.unlink(missing_ok=True)
     print("PASS: test_check_inbox_atomicity")
     return True
 
 
-def test_shutdown_via_delete():
+def test_shutdown_via_delete(scratch=None):
     """Verify delete_team sends shutdown_request to all teammates."""
     tm = TeammateManager()
     tm.create_team("shutdown-team")
 
-    inbox_a = Path(tempfile.mktemp(suffix=".jsonl"))
-    inbox_b = Path(tempfile.mktemp(suffix=".jsonl"))
-    mate_a = Teammate(name="alpha", team_name="shutdown-team", inbox_path=inbox_a)
-    mate_b = Teammate(name="beta", team_name="shutdown-team", inbox_path=inbox_b)
-    tm._teams["shutdown-team"]["alpha"] = mate_a
-    tm._teams["shutdown-team"]["beta"] = mate_b
+    mate_a = add_mate(tm, "shutdown-team", "alpha", scratch)
+    mate_b = add_mate(tm, "shutdown-team", "beta", scratch)
 
     result = tm.delete_team("shutdown-team")
     assert "deleted" in result.lower()
@@ -333,7 +295,7 @@ def test_shutdown_via_delete():
     assert mate_a.status == "shutdown"
     assert mate_b.status == "shutdown"
 
-    for inbox, name in [(inbox_a, "alpha"), (inbox_b, "beta")]:
+    for inbox, name in [(mate_a.inbox_path, "alpha"), (mate_b.inbox_path, "beta")]:
         assert inbox.exists(), f"Inbox for {name} should exist"
         msgs = []
         with open(inbox, "r") as f:
@@ -345,8 +307,6 @@ def test_shutdown_via_delete():
         assert len(shutdown_msgs) >= 1, \
             f"Expected shutdown_request in {name}'s inbox, got {len(shutdown_msgs)}"
 
-    inbox_a.unlink(missing_ok=True)
-    inbox_b.unlink(missing_ok=True)
     print("PASS: test_shutdown_via_delete")
     return True
 
@@ -361,14 +321,15 @@ V8B_TOOLS = [BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL,
              TEAM_CREATE_TOOL, SEND_MESSAGE_TOOL, TEAM_DELETE_TOOL]
 
 
-def test_llm_sends_message():
+@llm_test
+async def test_llm_sends_message():
     """LLM uses SendMessage to communicate with a teammate."""
-    client = get_client()
+    client = get_async_client()
     if not client:
         print("SKIP: No API key")
         return True
 
-    text, calls, _ = run_agent(
+    text, calls, _ = await run_agent_async(
         client,
         "You MUST call the SendMessage tool right now with these parameters: "
         "type='message', recipient='alice', content='Please review the API code'. "
@@ -386,14 +347,15 @@ def test_llm_sends_message():
     return True
 
 
-def test_llm_broadcasts():
+@llm_test
+async def test_llm_broadcasts():
     """LLM uses SendMessage with type='broadcast'."""
-    client = get_client()
+    client = get_async_client()
     if not client:
         print("SKIP: No API key")
         return True
 
-    text, calls, _ = run_agent(
+    text, calls, _ = await run_agent_async(
         client,
         "Broadcast a message to all teammates: 'Stop all work, critical bug found'. "
         "Use SendMessage with type='broadcast'.",
@@ -411,14 +373,15 @@ def test_llm_broadcasts():
     return True
 
 
-def test_llm_team_workflow():
+@llm_test
+async def test_llm_team_workflow():
     """LLM creates team, sends message, deletes team -- full lifecycle."""
-    client = get_client()
+    client = get_async_client()
     if not client:
         print("SKIP: No API key")
         return True
 
-    text, calls, _ = run_agent(
+    text, calls, _ = await run_agent_async(
         client,
         "Do the following in order:\n"
         "1) Create a team called 'build-team' using TeamCreate\n"
@@ -444,26 +407,34 @@ def test_llm_team_workflow():
 # Main
 # =============================================================================
 
+UNIT_TESTS = [
+    test_send_message,
+    test_check_inbox_drain,
+    test_inbox_jsonl_format,
+    test_message_types_constant,
+    test_all_message_types_delivered,
+    test_broadcast_sends_to_all_except_sender,
+    test_broadcast_to_many_teammates,
+    test_broadcast_with_no_other_teammates,
+    test_broadcast_no_recipient_required,
+    test_message_requires_recipient,
+    test_v8b_has_send_message_tool,
+    test_v8b_teammate_tools_have_send_message,
+    test_v8b_tool_count,
+    test_v8b_teammate_tools_subset,
+    test_check_inbox_atomicity,
+    test_shutdown_via_delete,
+]
+
+LLM_TESTS = [
+    test_llm_sends_message,
+    test_llm_broadcasts,
+    test_llm_team_workflow,
+]
+
+TESTS = UNIT_TESTS + LLM_TESTS
+
+
 if __name__ == "__main__":
-    sys.exit(0 if run_tests([
-        test_send_message,
-        test_check_inbox_drain,
-        test_inbox_jsonl_format,
-        test_message_types_constant,
-        test_all_message_types_delivered,
-        test_broadcast_sends_to_all_except_sender,
-        test_broadcast_to_many_teammates,
-        test_broadcast_with_no_other_teammates,
-        test_broadcast_no_recipient_required,
-        test_message_requires_recipient,
-        test_v8b_has_send_message_tool,
-        test_v8b_teammate_tools_have_send_message,
-        test_v8b_tool_count,
-        test_v8b_teammate_tools_subset,
-        test_check_inbox_atomicity,
-        test_shutdown_via_delete,
-        # LLM integration
-        test_llm_sends_message,
-        test_llm_broadcasts,
-        test_llm_team_workflow,
-    ]) else 1)
+    ok = run_tests(UNIT_TESTS, llm_tests=LLM_TESTS, workers=os.cpu_count() or 1)
+    sys.exit(0 if ok else 1)
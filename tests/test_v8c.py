@@ -11,26 +11,72 @@ and race condition safety.
 
 LLM integration tests verify the model uses team + messaging + task tools.
 """
+import ast
+import functools
 import os
 import sys
 import tempfile
 import time
 import json
 import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from tests.helpers import get_client, run_agent, run_tests, MODEL
+from tests.helpers import get_async_client, run_agent_async, run_tests, llm_test, add_mate, MODEL
 from tests.helpers import BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL
 from tests.helpers import TASK_CREATE_TOOL, TASK_LIST_TOOL, TASK_UPDATE_TOOL
 from tests.helpers import TASK_OUTPUT_TOOL, TASK_STOP_TOOL
 from tests.helpers import TEAM_CREATE_TOOL, SEND_MESSAGE_TOOL, TEAM_DELETE_TOOL
 
 from pathlib import Path
+import v8c_coordination
 from v8c_coordination import (
-    TeammateManager, Teammate, TaskManager,
+    TeammateManager, Teammate, TaskManager, Task,
     TEAMMATE_TOOLS, ALL_TOOLS, TEAMS_DIR,
 )
 
+# Tool-name sets are invariants of the module, computed once at import
+_TEAMMATE_NAMES = frozenset(t["name"] for t in TEAMMATE_TOOLS)
+_ALL_NAMES = frozenset(t["name"] for t in ALL_TOOLS)
+
+
+# Teams dir shared by every test that goes through _shared_tm(); lives for the process
+_SHARED_TEAMS_DIR = tempfile.TemporaryDirectory()
+
+
+@functools.lru_cache(maxsize=1)
+def _shared_tm():
+    """One TeammateManager reused by tests that don't need their own teams dir."""
+    return TeammateManager(teams_dir=Path(_SHARED_TEAMS_DIR.name))
+
+
+def _new_team(tm, prefix):
+    """Create a uniquely named team on tm so tests sharing it never collide."""
+    name = f"{prefix}-{uuid.uuid4().hex[:8]}"
+    tm.create_team(name)
+    return name
+
+
+def _read_config(config_path):
+    """Parse config.json straight from bytes (json detects the UTF-8 encoding)."""
+    return json.loads(config_path.read_bytes())
+
+
+@functools.lru_cache(maxsize=1)
+def _v8c_source():
+    """v8c_coordination.py source, read once for all source-scan tests."""
+    return Path(v8c_coordination.__file__).read_text()
+
+
+@functools.lru_cache(maxsize=None)
+def _v8c_function_source(name):
+    """Source of a function in v8c_coordination, sliced from the cached file."""
+    source = _v8c_source()
+    node = next(n for n in ast.walk(ast.parse(source))
+                if isinstance(n, ast.FunctionDef) and n.name == name)
+    return ast.get_source_segment(source, node)
+
 
 # =============================================================================
 # Unit Tests - Shared Task Board
@@ -109,29 +155,33 @@ def test_task_owner_persistence():
 
 
 def test_multi_owner_race_condition():
-    """Verify concurrent task owner updates remain consistent."""
+    """Verify that of two concurrent claims on one task exactly one wins.
+
+    Two pooled workers meet at a Barrier before every claim so each pair
+    actually collides on TaskManager's lock, one fresh task per round.
+    """
     with tempfile.TemporaryDirectory() as tmpdir:
         task_mgr = TaskManager(Path(tmpdir))
-        task_mgr.create("Race task")
+        barrier = threading.Barrier(2)  # Cyclic: re-arms after every pair
 
-        errors = []
-
-        def claim(owner):
+        def claim(task_id, owner):
+            barrier.wait(timeout=5)
             try:
-                task_mgr.update("1", owner=owner)
-            except Exception as e:
-                errors.append(e)
-
-        t1 = threading.Thread(target=claim, args=("alice",))
-        t2 = threading.Thread(target=claim, args=("bob",))
-        t1.start()
-        t2.start()
-        t1.join()
-        t2.join()
-
-        assert len(errors) == 0, f"Race errors: {errors}"
-        final = task_mgr.get("1")
-        assert final.owner in ("alice", "bob"), f"Owner should be alice or bob, got '{final.owner}'"
+                return task_mgr.claim(task_id, owner)
+            except ValueError as e:
+                return str(e)
+
+        for _ in range(50):
+            task_id = task_mgr.create("Race task").id
+            with ThreadPoolExecutor(max_workers=2) as ex:
+                results = list(ex.map(claim, [task_id] * 2, ["alice", "bob"]))
+
+            won = [r for r in results if isinstance(r, Task)]
+            lost = [r for r in results if isinstance(r, str)]
+            assert len(won) == 1 and len(lost) == 1, f"Exactly one claim should win, got {results}"
+            winner = won[0].owner
+            assert lost[0] == f"Task {task_id} already claimed by {winner}", lost[0]
+            assert task_mgr.get(task_id).owner == winner
     print("PASS: test_multi_owner_race_condition")
     return True
 
@@ -140,52 +190,43 @@ def test_multi_owner_race_condition():
 # Unit Tests - Shutdown Protocol
 # =============================================================================
 
-def test_shutdown_sets_teammate_status():
+def test_shutdown_sets_teammate_status(scratch=None):
     """Verify delete_team marks all teammates as 'shutdown'."""
-    tm = TeammateManager()
-    tm.create_team("sd-team")
+    tm = _shared_tm()
+    team = _new_team(tm, "sd-team")
 
-    inbox_a = Path(tempfile.mktemp(suffix=".jsonl"))
-    inbox_b = Path(tempfile.mktemp(suffix=".jsonl"))
-    mate_a = Teammate(name="a", team_name="sd-team", inbox_path=inbox_a)
-    mate_b = Teammate(name="b", team_name="sd-team", inbox_path=inbox_b)
-    tm._teams["sd-team"]["a"] = mate_a
-    tm._teams["sd-team"]["b"] = mate_b
+    mate_a = add_mate(tm, team, "a", scratch)
+    mate_b = add_mate(tm, team, "b", scratch)
 
-    tm.delete_team("sd-team")
+    tm.delete_team(team)
     assert mate_a.status == "shutdown"
     assert mate_b.status == "shutdown"
 
-    inbox_a.unlink(missing_ok=True)
-    inbox_b.unlink(missing_ok=True)
     print("PASS: test_shutdown_sets_teammate_status")
     return True
 
 
-def test_shutdown_sends_request_with_id():
+def test_shutdown_sends_request_with_id(scratch=None):
     """Verify shutdown_request messages in inbox contain necessary fields."""
-    tm = TeammateManager()
-    tm.create_team("reqid-team")
+    tm = _shared_tm()
+    team = _new_team(tm, "reqid-team")
 
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
-    mate = Teammate(name="worker", team_name="reqid-team", inbox_path=inbox)
-    tm._teams["reqid-team"]["worker"] = mate
+    add_mate(tm, team, "worker", scratch)
 
     tm.send_message("worker", "shutting down", msg_type="shutdown_request",
-                    team_name="reqid-team")
+                    team_name=team)
 
-    msgs = tm.check_inbox("worker", "reqid-team")
+    msgs = tm.check_inbox("worker", team)
     assert len(msgs) == 1
     assert msgs[0]["type"] == "shutdown_request"
 
-    inbox.unlink(missing_ok=True)
     print("PASS: test_shutdown_sends_request_with_id")
     return True
 
 
 def test_pending_shutdowns_tracking():
     """Verify _pending_shutdowns dict exists on TeammateManager."""
-    tm = TeammateManager()
+    tm = _shared_tm()
     assert hasattr(tm, "_pending_shutdowns"), "v8c must have _pending_shutdowns"
     assert isinstance(tm._pending_shutdowns, dict)
     print("PASS: test_pending_shutdowns_tracking")
@@ -208,20 +249,17 @@ def test_teammate_status_lifecycle():
     return True
 
 
-def test_get_team_status_shows_members():
+def test_get_team_status_shows_members(scratch=None):
     """Verify get_team_status includes member info."""
-    tm = TeammateManager()
-    tm.create_team("info-team")
+    tm = _shared_tm()
+    team = _new_team(tm, "info-team")
 
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
-    mate = Teammate(name="alice", team_name="info-team", inbox_path=inbox)
-    tm._teams["info-team"]["alice"] = mate
+    add_mate(tm, team, "alice", scratch)
 
-    status = tm.get_team_status("info-team")
-    assert "info-team" in status
+    status = tm.get_team_status(team)
+    assert team in status
     assert "alice" in status
 
-    inbox.unlink(missing_ok=True)
     print("PASS: test_get_team_status_shows_members")
     return True
 
@@ -232,73 +270,52 @@ def test_get_team_status_shows_members():
 
 def test_config_json_structure():
     """Verify config.json has name, members, leadAgentId."""
-    import v8c_coordination
-    orig_dir = v8c_coordination.TEAMS_DIR
     with tempfile.TemporaryDirectory() as tmpdir:
-        v8c_coordination.TEAMS_DIR = Path(tmpdir)
-        tm = TeammateManager()
+        tm = TeammateManager(teams_dir=Path(tmpdir))
         tm.create_team("cfg-test")
 
         config_path = Path(tmpdir) / "cfg-test" / "config.json"
         assert config_path.exists()
-        data = json.loads(config_path.read_text())
+        data = _read_config(config_path)
         assert data["name"] == "cfg-test"
         assert "members" in data
         assert "leadAgentId" in data
-
-        v8c_coordination.TEAMS_DIR = orig_dir
     print("PASS: test_config_json_structure")
     return True
 
 
-def test_config_updates_after_member_add():
+def test_config_updates_after_member_add(scratch=None):
     """Verify config.json reflects added member."""
-    import v8c_coordination
-    orig_dir = v8c_coordination.TEAMS_DIR
     with tempfile.TemporaryDirectory() as tmpdir:
-        v8c_coordination.TEAMS_DIR = Path(tmpdir)
-        tm = TeammateManager()
+        tm = TeammateManager(teams_dir=Path(tmpdir))
         tm.create_team("member-cfg")
 
-        inbox = Path(tempfile.mktemp(suffix=".jsonl"))
-        mate = Teammate(name="alice", team_name="member-cfg", inbox_path=inbox)
-        tm._teams["member-cfg"]["alice"] = mate
+        add_mate(tm, "member-cfg", "alice", scratch)
         tm._update_team_config("member-cfg")
 
         config_path = Path(tmpdir) / "member-cfg" / "config.json"
-        data = json.loads(config_path.read_text())
+        data = _read_config(config_path)
         names = [m["name"] for m in data["members"]]
         assert "alice" in names
-
-        inbox.unlink(missing_ok=True)
-        v8c_coordination.TEAMS_DIR = orig_dir
     print("PASS: test_config_updates_after_member_add")
     return True
 
 
-def test_config_updates_after_member_remove():
+def test_config_updates_after_member_remove(scratch=None):
     """Verify config.json reflects removed member."""
-    import v8c_coordination
-    orig_dir = v8c_coordination.TEAMS_DIR
     with tempfile.TemporaryDirectory() as tmpdir:
-        v8c_coordination.TEAMS_DIR = Path(tmpdir)
-        tm = TeammateManager()
+        tm = TeammateManager(teams_dir=Path(tmpdir))
         tm.create_team("rem-cfg")
 
-        inbox = Path(tempfile.mktemp(suffix=".jsonl"))
-        mate = Teammate(name="bob", team_name="rem-cfg", inbox_path=inbox)
-        tm._teams["rem-cfg"]["bob"] = mate
+        add_mate(tm, "rem-cfg", "bob", scratch)
         tm._update_team_config("rem-cfg")
 
         del tm._teams["rem-cfg"]["bob"]
         tm._update_team_config("rem-cfg")
 
         config_path = Path(tmpdir) / "rem-cfg" / "config.json"
-        data = json.loads(config_path.read_text())
+        data = _read_config(config_path)
         assert len(data["members"]) == 0
-
-        inbox.unlink(missing_ok=True)
-        v8c_coordination.TEAMS_DIR = orig_dir
     print("PASS: test_config_updates_after_member_remove")
     return True
 
@@ -316,29 +333,24 @@ def test_v8c_tool_count():
 
 def test_v8c_has_send_message():
     """Verify v8c has SendMessage in ALL_TOOLS and TEAMMATE_TOOLS."""
-    all_names = {t["name"] for t in ALL_TOOLS}
-    assert "SendMessage" in all_names
-
-    teammate_names = {t["name"] for t in TEAMMATE_TOOLS}
-    assert "SendMessage" in teammate_names
+    assert "SendMessage" in _ALL_NAMES
+    assert "SendMessage" in _TEAMMATE_NAMES
     print("PASS: test_v8c_has_send_message")
     return True
 
 
 def test_v8c_teammate_tools_have_task_crud():
     """Verify TEAMMATE_TOOLS has task CRUD tools."""
-    names = {t["name"] for t in TEAMMATE_TOOLS}
-    for expected in ["TaskCreate", "TaskGet", "TaskUpdate", "TaskList"]:
-        assert expected in names, f"Missing {expected}"
+    expected = {"TaskCreate", "TaskGet", "TaskUpdate", "TaskList"}
+    assert _TEAMMATE_NAMES.issuperset(expected), f"Missing {expected - _TEAMMATE_NAMES}"
     print("PASS: test_v8c_teammate_tools_have_task_crud")
     return True
 
 
 def test_v8c_teammate_tools_exclude_team_mgmt():
     """Verify TEAMMATE_TOOLS excludes TeamCreate, TeamDelete."""
-    names = {t["name"] for t in TEAMMATE_TOOLS}
-    assert "TeamCreate" not in names
-    assert "TeamDelete" not in names
+    assert _TEAMMATE_NAMES.isdisjoint({"TeamCreate", "TeamDelete"}), \
+        f"Teammates should not have {_TEAMMATE_NAMES & {'TeamCreate', 'TeamDelete'}}"
     print("PASS: test_v8c_teammate_tools_exclude_team_mgmt")
     return True
 
@@ -349,8 +361,7 @@ def test_v8c_teammate_tools_exclude_team_mgmt():
 
 def test_v8c_agent_loop_has_drain():
     """Verify v8c code has drain_notifications."""
-    import v8c_coordination
-    source = open(v8c_coordination.__file__).read()
+    source = _v8c_source()
     assert "drain_notifications" in source, "Must have drain_notifications"
     assert "def agent_loop" in source, "Must have agent_loop function"
     print("PASS: test_v8c_agent_loop_has_drain")
@@ -359,8 +370,7 @@ def test_v8c_agent_loop_has_drain():
 
 def test_v8c_teammate_loop_has_inbox_check():
     """Verify _teammate_loop checks inbox."""
-    import inspect
-    source = inspect.getsource(TeammateManager._teammate_loop)
+    source = _v8c_function_source("_teammate_loop")
     assert "check_inbox" in source, "Must check inbox in teammate loop"
     print("PASS: test_v8c_teammate_loop_has_inbox_check")
     return True
@@ -376,14 +386,15 @@ V8C_TOOLS = [BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL,
              TEAM_CREATE_TOOL, SEND_MESSAGE_TOOL, TEAM_DELETE_TOOL]
 
 
-def test_llm_team_and_task_workflow():
+@llm_test
+async def test_llm_team_and_task_workflow():
     """LLM creates team, creates task, sends message, cleans up."""
-    client = get_client()
+    client = get_async_client()
     if not client:
         print("SKIP: No API key")
         return True
 
-    text, calls, _ = run_agent(
+    text, calls, _ = await run_agent_async(
         client,
         "Do the following in order:\n"
         "1) Create a team called 'dev-team' using TeamCreate\n"
@@ -407,14 +418,15 @@ def test_llm_team_and_task_workflow():
     return True
 
 
-def test_llm_shutdown_request():
+@llm_test
+async def test_llm_shutdown_request():
     """LLM uses SendMessage with type='shutdown_request'."""
-    client = get_client()
+    client = get_async_client()
     if not client:
         print("SKIP: No API key")
         return True
 
-    text, calls, _ = run_agent(
+    text, calls, _ = await run_agent_async(
         client,
         "You MUST call the SendMessage tool with these exact parameters: "
         "type='shutdown_request', recipient='worker-1', content='Shutting down'. "
@@ -436,34 +448,42 @@ def test_llm_shutdown_request():
 # Main
 # =============================================================================
 
+UNIT_TESTS = [
+    # Shared task board
+    test_task_board_sharing,
+    test_task_claiming_with_blocking,
+    test_task_claim_and_unblock,
+    test_task_owner_persistence,
+    test_multi_owner_race_condition,
+    # Shutdown protocol
+    test_shutdown_sets_teammate_status,
+    test_shutdown_sends_request_with_id,
+    test_pending_shutdowns_tracking,
+    # Status tracking
+    test_teammate_status_lifecycle,
+    test_get_team_status_shows_members,
+    # Config persistence
+    test_config_json_structure,
+    test_config_updates_after_member_add,
+    test_config_updates_after_member_remove,
+    # Tools
+    test_v8c_tool_count,
+    test_v8c_has_send_message,
+    test_v8c_teammate_tools_have_task_crud,
+    test_v8c_teammate_tools_exclude_team_mgmt,
+    # Agent loop
+    test_v8c_agent_loop_has_drain,
+    test_v8c_teammate_loop_has_inbox_check,
+]
+
+LLM_TESTS = [
+    test_llm_team_and_task_workflow,
+    test_llm_shutdown_request,
+]
+
+TESTS = UNIT_TESTS + LLM_TESTS
+
+
 if __name__ == "__main__":
-    sys.exit(0 if run_tests([
-        # Shared task board
-        test_task_board_sharing,
-        test_task_claiming_with_blocking,
-        test_task_claim_and_unblock,
-        test_task_owner_persistence,
-        test_multi_owner_race_condition,
-        # Shutdown protocol
-        test_shutdown_sets_teammate_status,
-        test_shutdown_sends_request_with_id,
-        test_pending_shutdowns_tracking,
-        # Status tracking
-        test_teammate_status_lifecycle,
-        test_get_team_status_shows_members,
-        # Config persistence
-        test_config_json_structure,
-        test_config_updates_after_member_add,
-        test_config_updates_after_member_remove,
-        # Tools
-        test_v8c_tool_count,
-        test_v8c_has_send_message,
-        test_v8c_teammate_tools_have_task_crud,
-        test_v8c_teammate_tools_exclude_team_mgmt,
-        # Agent loop
-        test_v8c_agent_loop_has_drain,
-        test_v8c_teammate_loop_has_inbox_check,
-        # LLM integration
-        test_llm_team_and_task_workflow,
-        test_llm_shutdown_request,
-    ]) else 1)
+    ok = run_tests(UNIT_TESTS, llm_tests=LLM_TESTS, workers=os.cpu_count() or 1)
+    sys.exit(0 if ok else 1)
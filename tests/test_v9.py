@@ -17,7 +17,7 @@ import json
 import inspect
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from tests.helpers import get_client, run_agent, run_tests, MODEL
+from tests.helpers import get_client, run_agent, run_tests, llm_test, new_inbox, MODEL
 from tests.helpers import BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL
 from tests.helpers import TASK_CREATE_TOOL, TASK_LIST_TOOL, TASK_UPDATE_TOOL
 from tests.helpers import TASK_OUTPUT_TOOL, TASK_STOP_TOOL
@@ -162,17 +162,15 @@ def test_v9_idle_loop_unclaimed_filter():
     return True
 
 
-def test_v9_broadcast_excludes_sender():
+def test_v9_broadcast_excludes_sender(scratch=None):
     """Verify broadcast sends to N-1 teammates (excludes the sender)."""
     tm = TeammateManager()
     tm.create_team("v9-excl-test")
 
-    inboxes = []
     for name in ["sender", "recv1", "recv2"]:
-        inbox = Path(tempfile.mktemp(suffix=".jsonl"))
+        inbox = new_inbox(scratch)
         mate = Teammate(name=name, team_name="v9-excl-test", inbox_path=inbox)
         tm._teams["v9-excl-test"][name] = mate
-        inboxes.append(inbox)
 
     tm.send_message("", "Hello all", msg_type="broadcast",
                      sender="sender", team_name="v9-excl-test")
@@ -184,9 +182,6 @@ def test_v9_broadcast_excludes_sender():
         msgs = tm.check_inbox(name, "v9-excl-test")
         assert len(msgs) == 1, f"{name} should have received 1 broadcast"
 
-    for inbox in inboxes:
-        inbox.unlink(missing_ok=True)
-
     print("PASS: test_v9_broadcast_excludes_sender")
     return True
 
@@ -296,12 +291,12 @@ def test_idle_poll_interval_default():
 # =============================================================================
 
 
-def test_idle_cycle_message_wake():
+def test_idle_cycle_message_wake(scratch=None):
     """Verify _idle_phase returns 'resume' when inbox messages arrive."""
     from v9_autonomous_agent import TeammateManager, Teammate, IDLE_REASONS
     tm = TeammateManager()
     tm.create_team("idle-msg-test")
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
+    inbox = new_inbox(scratch)
     mate = Teammate(name="idler", team_name="idle-msg-test", inbox_path=inbox)
     tm._teams["idle-msg-test"]["idler"] = mate
 
@@ -312,17 +307,16 @@ def test_idle_cycle_message_wake():
     sub_messages = [{"role": "user", "content": "initial"}]
     result = tm._idle_phase(mate, sub_messages)
     assert result == "resume", f"Expected 'resume' on message wake, got '{result}'"
-    inbox.unlink(missing_ok=True)
     print("PASS: test_idle_cycle_message_wake")
     return True
 
 
-def test_idle_cycle_task_wake():
+def test_idle_cycle_task_wake(scratch=None):
     """Verify _idle_phase returns 'resume' when unclaimed task appears."""
     from v9_autonomous_agent import TeammateManager, Teammate, TASK_MGR
     tm = TeammateManager()
     tm.create_team("idle-task-test")
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
+    inbox = new_inbox(scratch)
     mate = Teammate(name="claimer", team_name="idle-task-test", inbox_path=inbox)
     tm._teams["idle-task-test"]["claimer"] = mate
 
@@ -332,19 +326,18 @@ def test_idle_cycle_task_wake():
     sub_messages = [{"role": "user", "content": "initial"}]
     result = tm._idle_phase(mate, sub_messages)
     assert result == "resume", f"Expected 'resume' on task claim, got '{result}'"
-    inbox.unlink(missing_ok=True)
     print("PASS: test_idle_cycle_task_wake")
     return True
 
 
-def test_idle_cycle_timeout():
+def test_idle_cycle_timeout(scratch=None):
     """Verify _idle_phase returns 'timeout' after IDLE_TIMEOUT with no work."""
     import v9_autonomous_agent
     from v9_autonomous_agent import TeammateManager, Teammate
 
     tm = TeammateManager()
     tm.create_team("idle-timeout-test")
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
+    inbox = new_inbox(scratch)
     mate = Teammate(name="patient", team_name="idle-timeout-test", inbox_path=inbox)
     tm._teams["idle-timeout-test"]["patient"] = mate
 
@@ -360,17 +353,16 @@ def test_idle_cycle_timeout():
 
     v9_autonomous_agent.IDLE_TIMEOUT = orig_timeout
     v9_autonomous_agent.IDLE_POLL_INTERVAL = orig_interval
-    inbox.unlink(missing_ok=True)
     print("PASS: test_idle_cycle_timeout")
     return True
 
 
-def test_auto_claim_filters_blocked():
+def test_auto_claim_filters_blocked(scratch=None):
     """Create blocked task, verify _scan_unclaimed_tasks does not claim it."""
     from v9_autonomous_agent import TeammateManager, Teammate, TASK_MGR
     tm = TeammateManager()
     tm.create_team("block-filter-test")
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
+    inbox = new_inbox(scratch)
     mate = Teammate(name="scanner", team_name="block-filter-test", inbox_path=inbox)
     tm._teams["block-filter-test"]["scanner"] = mate
 
@@ -385,17 +377,16 @@ def test_auto_claim_filters_blocked():
     t2_refreshed = TASK_MGR.get(t2.id)
     assert t2_refreshed.owner != "scanner", \
         "Blocked task should not be claimed"
-    inbox.unlink(missing_ok=True)
     print("PASS: test_auto_claim_filters_blocked")
     return True
 
 
-def test_auto_claim_filters_owned():
+def test_auto_claim_filters_owned(scratch=None):
     """Create owned task, verify _scan_unclaimed_tasks does not claim it."""
     from v9_autonomous_agent import TeammateManager, Teammate, TASK_MGR
     tm = TeammateManager()
     tm.create_team("own-filter-test")
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
+    inbox = new_inbox(scratch)
     mate = Teammate(name="scanner2", team_name="own-filter-test", inbox_path=inbox)
     tm._teams["own-filter-test"]["scanner2"] = mate
 
@@ -407,7 +398,6 @@ def test_auto_claim_filters_owned():
     t_refreshed = TASK_MGR.get(t.id)
     assert t_refreshed.owner == "someone-else", \
         "Already-owned task should keep its owner"
-    inbox.unlink(missing_ok=True)
     print("PASS: test_auto_claim_filters_owned")
     return True
 
@@ -428,12 +418,12 @@ def test_identity_reinjection():
     return True
 
 
-def test_plan_approval_approve():
+def test_plan_approval_approve(scratch=None):
     """Send plan_approval_response with approve, verify teammate resumes."""
     from v9_autonomous_agent import TeammateManager, Teammate
     tm = TeammateManager()
     tm.create_team("plan-test")
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
+    inbox = new_inbox(scratch)
     mate = Teammate(name="planner", team_name="plan-test", inbox_path=inbox)
     tm._teams["plan-test"]["planner"] = mate
 
@@ -445,17 +435,16 @@ def test_plan_approval_approve():
     # Should have injected a user message about approval
     assert any("APPROVED" in str(m.get("content", "")) for m in sub_messages), \
         "Approved plan should inject APPROVED text into conversation"
-    inbox.unlink(missing_ok=True)
     print("PASS: test_plan_approval_approve")
     return True
 
 
-def test_plan_approval_reject():
+def test_plan_approval_reject(scratch=None):
     """Send plan_approval_response with reject+feedback, verify feedback injected."""
     from v9_autonomous_agent import TeammateManager, Teammate
     tm = TeammateManager()
     tm.create_team("plan-reject-test")
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
+    inbox = new_inbox(scratch)
     mate = Teammate(name="planner2", team_name="plan-reject-test", inbox_path=inbox)
     tm._teams["plan-reject-test"]["planner2"] = mate
 
@@ -467,7 +456,6 @@ def test_plan_approval_reject():
                "Add error handling" in str(m.get("content", ""))
                for m in sub_messages), \
         "Rejected plan should inject feedback text"
-    inbox.unlink(missing_ok=True)
     print("PASS: test_plan_approval_reject")
     return True
 
@@ -485,12 +473,12 @@ def test_idle_reasons():
     return True
 
 
-def test_plan_approval_end_to_end():
+def test_plan_approval_end_to_end(scratch=None):
     """Write plan_approval_response message to inbox, call check_inbox, verify processing."""
     from v9_autonomous_agent import TeammateManager, Teammate
     tm = TeammateManager()
     tm.create_team("plan-e2e-test")
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
+    inbox = new_inbox(scratch)
     mate = Teammate(name="planner-e2e", team_name="plan-e2e-test", inbox_path=inbox)
     tm._teams["plan-e2e-test"]["planner-e2e"] = mate
 
@@ -514,19 +502,18 @@ def test_plan_approval_end_to_end():
     assert any("APPROVED" in str(m.get("content", "")) for m in sub_messages), \
         "Approved plan should inject APPROVED text into conversation"
 
-    inbox.unlink(missing_ok=True)
     print("PASS: test_plan_approval_end_to_end")
     return True
 
 
-def test_idle_phase_returns_timeout_on_empty():
+def test_idle_phase_returns_timeout_on_empty(scratch=None):
     """Call _idle_phase with no inbox messages and no unclaimed tasks, verify timeout."""
     import v9_autonomous_agent
     from v9_autonomous_agent import TeammateManager, Teammate
 
     tm = TeammateManager()
     tm.create_team("idle-empty-test")
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
+    inbox = new_inbox(scratch)
     mate = Teammate(name="empty-idler", team_name="idle-empty-test", inbox_path=inbox)
     tm._teams["idle-empty-test"]["empty-idler"] = mate
 
@@ -543,18 +530,17 @@ def test_idle_phase_returns_timeout_on_empty():
 
     v9_autonomous_agent.IDLE_TIMEOUT = orig_timeout
     v9_autonomous_agent.IDLE_POLL_INTERVAL = orig_interval
-    inbox.unlink(missing_ok=True)
     print("PASS: test_idle_phase_returns_timeout_on_empty")
     return True
 
 
-def test_claim_task_sets_owner_and_status():
+def test_claim_task_sets_owner_and_status(scratch=None):
     """Create a task, call _claim_task, verify task.owner is set and status becomes in_progress."""
     from v9_autonomous_agent import TeammateManager, Teammate, TASK_MGR
 
     tm = TeammateManager()
     tm.create_team("claim-test")
-    inbox = Path(tempfile.mktemp(suffix=".jsonl"))
+    inbox = new_inbox(scratch)
     mate = Teammate(name="claimer-test", team_name="claim-test", inbox_path=inbox)
     tm._teams["claim-test"]["claimer-test"] = mate
 
@@ -577,7 +563,6 @@ def test_claim_task_sets_owner_and_status():
            task.subject in sub_messages[-1]["content"], \
         "Injected message should reference the claimed task"
 
-    inbox.unlink(missing_ok=True)
     print("PASS: test_claim_task_sets_owner_and_status")
     return True
 
@@ -622,6 +607,7 @@ V9_TOOLS = [BASH_TOOL, READ_FILE_TOOL, WRITE_FILE_TOOL, EDIT_FILE_TOOL,
             TEAM_CREATE_TOOL, SEND_MESSAGE_TOOL, TEAM_DELETE_TOOL]
 
 
+@llm_test
 def test_llm_v9_creates_team():
     """LLM uses TeamCreate to set up a new team (same capability as v8)."""
     client = get_client()
@@ -645,6 +631,7 @@ def test_llm_v9_creates_team():
     return True
 
 
+@llm_test
 def test_llm_v9_task_workflow():
     """LLM creates a task and lists tasks."""
     client = get_client()
@@ -672,6 +659,7 @@ def test_llm_v9_task_workflow():
     return True
 
 
+@llm_test
 def test_llm_v9_full_autonomous_flow():
     """LLM creates team, creates tasks, and sends message -- full v9 flow."""
     client = get_client()
@@ -705,44 +693,47 @@ def test_llm_v9_full_autonomous_flow():
 # Main
 # =============================================================================
 
+TESTS = [
+    # v9 autonomous loop structure
+    test_v9_teammate_loop_has_idle_phase,
+    test_v9_teammate_loop_auto_claiming,
+    test_v9_teammate_loop_identity_injection,
+    test_v9_teammate_loop_shutdown_on_request,
+    test_v9_teammate_loop_context_compression,
+    # v9 inherits v8 capabilities
+    test_v9_inherits_v8_messaging,
+    test_v9_message_types_complete,
+    test_v9_teammate_tools_exclude_team_mgmt,
+    test_v9_all_tools_count,
+    # v9 specific mechanisms
+    test_v9_idle_loop_unclaimed_filter,
+    test_v9_broadcast_excludes_sender,
+    test_v9_task_manager_thread_safety,
+    test_v9_dependency_chain,
+    test_v9_vs_v8c_loop_difference,
+    test_v9_system_prompt_mentions_autonomous,
+    # v9 constant tests
+    test_idle_poll_interval_default,
+    # v9 new mechanism tests
+    test_idle_cycle_message_wake,
+    test_idle_cycle_task_wake,
+    test_idle_cycle_timeout,
+    test_auto_claim_filters_blocked,
+    test_auto_claim_filters_owned,
+    test_identity_reinjection,
+    test_plan_approval_approve,
+    test_plan_approval_reject,
+    test_idle_reasons,
+    test_plan_approval_end_to_end,
+    test_idle_phase_returns_timeout_on_empty,
+    test_claim_task_sets_owner_and_status,
+    test_reinject_identity_preserves_existing_content,
+    # LLM integration
+    test_llm_v9_creates_team,
+    test_llm_v9_task_workflow,
+    test_llm_v9_full_autonomous_flow,
+]
+
+
 if __name__ == "__main__":
-    sys.exit(0 if run_tests([
-        # v9 autonomous loop structure
-        test_v9_teammate_loop_has_idle_phase,
-        test_v9_teammate_loop_auto_claiming,
-        test_v9_teammate_loop_identity_injection,
-        test_v9_teammate_loop_shutdown_on_request,
-        test_v9_teammate_loop_context_compression,
-        # v9 inherits v8 capabilities
-        test_v9_inherits_v8_messaging,
-        test_v9_message_types_complete,
-        test_v9_teammate_tools_exclude_team_mgmt,
-        test_v9_all_tools_count,
-        # v9 specific mechanisms
-        test_v9_idle_loop_unclaimed_filter,
-        test_v9_broadcast_excludes_sender,
-        test_v9_task_manager_thread_safety,
-        test_v9_dependency_chain,
-        test_v9_vs_v8c_loop_difference,
-        test_v9_system_prompt_mentions_autonomous,
-        # v9 constant tests
-        test_idle_poll_interval_default,
-        # v9 new mechanism tests
-        test_idle_cycle_message_wake,
-        test_idle_cycle_task_wake,
-        test_idle_cycle_timeout,
-        test_auto_claim_filters_blocked,
-        test_auto_claim_filters_owned,
-        test_identity_reinjection,
-        test_plan_approval_approve,
-        test_plan_approval_reject,
-        test_idle_reasons,
-        test_plan_approval_end_to_end,
-        test_idle_phase_returns_timeout_on_empty,
-        test_claim_task_sets_owner_and_status,
-        test_reinject_identity_preserves_existing_content,
-        # LLM integration
-        test_llm_v9_creates_team,
-        test_llm_v9_task_workflow,
-        test_llm_v9_full_autonomous_flow,
-    ]) else 1)
+    sys.exit(0 if run_tests(TESTS) else 1)
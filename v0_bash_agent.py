@@ -49,6 +49,7 @@ Usage:
 
 from anthropic import Anthropic
 from dotenv import load_dotenv
+import functools
 import subprocess
 import sys
 import os
@@ -96,6 +97,20 @@ When to use subagent:
 
 The subagent runs in isolation and returns only its final summary."""
 
+# TOOL and SYSTEM never change, so mark the end of that prefix as cacheable:
+# the API then reuses it across turns (and subagents) instead of re-reading it.
+# Tools come before system in the prompt, so this one breakpoint covers both.
+SYSTEM_BLOCKS = [{"type": "text", "text": SYSTEM, "cache_control": {"type": "ephemeral"}}]
+
+# Every turn sends the same model/system/tools/budget: bind them once
+create_message = functools.partial(
+    client.messages.create,
+    model=MODEL,
+    system=SYSTEM_BLOCKS,
+    tools=TOOL,
+    max_tokens=8000
+)
+
 
 def chat(prompt, history=None):
     """
@@ -121,13 +136,7 @@ def chat(prompt, history=None):
 
     while True:
         # 1. Call the model with tools
-        response = client.messages.create(
-            model=MODEL,
-            system=SYSTEM,
-            messages=history,
-            tools=TOOL,
-            max_tokens=8000
-        )
+        response = create_message(messages=history)
 
         # 2. Build assistant message content (preserve both text and tool_use blocks)
         content = []
@@ -46,8 +46,20 @@ Usage:
     python v1_basic_agent.py
 """
 
+import asyncio
+import atexit
+import functools
+import mmap
 import os
+import re
+import shlex
+import shutil
+import signal
 import subprocess
+import tempfile
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from pathlib import Path
 
 from anthropic import Anthropic
@@ -90,7 +102,9 @@ Rules:
 # Production name mapping: bash->Bash, read_file->Read, write_file->Write, edit_file->Edit
 # =============================================================================
 
-TOOLS = [
+# A tuple: the schema is sent unchanged on every turn (which also keeps the
+# request prefix stable for prompt caching), so nothing may append to it.
+TOOLS = (
     # Tool 1: Bash - The gateway to everything
     # Can run any command: git, npm, python, curl, etc.
     {
@@ -174,7 +188,7 @@ TOOLS = [
             "required": ["path", "old_text", "new_text"],
         },
     },
-]
+)
 
 
 # =============================================================================
@@ -188,12 +202,122 @@ def safe_path(p: str) -> Path:
     Prevents the model from accessing files outside the project directory.
     Resolves relative paths and checks they don't escape via '../'.
     """
-    path = (WORKDIR / p).resolve()
-    if not path.is_relative_to(WORKDIR):
+    return resolve_in_workdir(WORKDIR, p)
+
+
+@functools.lru_cache(maxsize=2048)
+def resolve_in_workdir(workdir: Path, p: str) -> Path:
+    """
+    The resolve() behind safe_path, memoized: resolving walks every path
+    component with lstat/readlink, and agents touch the same files again
+    and again. Only bash can change what a path resolves to (symlinks,
+    renames), so run_bash clears this cache after every command.
+    """
+    path = (workdir / p).resolve()
+    if not path.is_relative_to(workdir):
         raise ValueError(f"Path escapes workspace: {p}")
     return path
 
 
+# Every bash command is driven by one event loop on a daemon thread, so
+# concurrent bash calls (see TOOL_POOL) wait on a single selector for their
+# pipes instead of each needing its own reader threads.
+BASH_LOOP = asyncio.new_event_loop()
+threading.Thread(target=BASH_LOOP.run_forever, daemon=True).start()
+
+# Long-lived shells waiting for their next command. A command runs in a
+# subshell of an idle one, i.e. a fork of a /bin/sh that is already up
+# instead of fork + exec + startup of a new one. Concurrent calls each take
+# their own shell, so at most one per TOOL_POOL worker is ever started.
+# Only touched from BASH_LOOP, so no lock.
+IDLE_SHELLS = []
+
+# Each command writes to a FIFO of its own in here, not to the pipe its
+# shell shares with every later command, so a job it leaves running in
+# the background (`cmd &`) can't write into someone else's output.
+FIFO_DIR = tempfile.mkdtemp(prefix="agent-bash-")
+atexit.register(shutil.rmtree, FIFO_DIR, True)
+
+
+async def run_bash_async(command: str) -> str:
+    """
+    Run command in a pooled shell on BASH_LOOP; raises subprocess.TimeoutExpired after 120s.
+
+    The command is eval'd in a subshell that starts in WORKDIR with stdin
+    from /dev/null, so cd, exports and `exit` don't leak into the next
+    command and nothing can read the shell's own input. Its output (stderr
+    merged) goes to a fresh FIFO, ended by a random sentinel printed after
+    the command. The FIFO is closed once the sentinel is read, so later
+    writes by background jobs fail (SIGPIPE) instead of showing up in the
+    next command's result. Only the first 50000 bytes are kept: the rest is
+    read and dropped, so a runaway `find /` is never buffered or decoded in
+    full.
+    """
+    shell = IDLE_SHELLS.pop() if IDLE_SHELLS else await asyncio.create_subprocess_exec(
+        "/bin/sh",
+        cwd=WORKDIR,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+        start_new_session=True,  # Its own process group, for killpg on timeout
+    )
+    fifo = os.path.join(FIFO_DIR, uuid.uuid4().hex)
+    os.mkfifo(fifo)
+    reader = asyncio.StreamReader()
+    transport, _ = await BASH_LOOP.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader),
+        open(os.open(fifo, os.O_RDONLY | os.O_NONBLOCK), "rb", buffering=0),
+    )
+    # Our own write end, so the FIFO doesn't read as EOF before the shell opens it
+    write_end = os.open(fifo, os.O_WRONLY)
+    marker = f"__END_{uuid.uuid4().hex}__"
+    shell.stdin.write(
+        f"{{ (cd {shlex.quote(str(WORKDIR))} && eval {shlex.quote(command)}) </dev/null; "
+        f"printf '\\n%s' {marker}; }} >{shlex.quote(fifo)} 2>&1\n".encode()
+    )
+    marker = marker.encode()
+    buf = bytearray()
+
+    async def collect():
+        window = b""
+        while chunk := await reader.read(65536):
+            window += chunk
+            end = window.find(marker)
+            if end >= 0:
+                buf.extend(window[:end][:50000 - len(buf)])
+                return
+            # Hold back a possible partial marker split across two reads
+            done = len(window) - len(marker) + 1
+            if done > 0:
+                buf.extend(window[:done][:50000 - len(buf)])
+                window = window[done:]
+
+    collector = asyncio.ensure_future(collect())
+    exited = asyncio.ensure_future(shell.wait())  # The shell itself went away
+    try:
+        await shell.stdin.drain()
+        done, _ = await asyncio.wait({collector, exited}, timeout=120,
+                                     return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        collector.cancel()
+        exited.cancel()
+        transport.close()
+        os.close(write_end)
+        os.unlink(fifo)
+    if not done:
+        os.killpg(shell.pid, signal.SIGKILL)  # The shell, the command and its children
+        raise subprocess.TimeoutExpired(command, 120)
+    if collector in done:
+        IDLE_SHELLS.append(shell)
+    return buf.decode(errors="replace")
+
+
+# Basic safety blocklist, compiled into one alternation so each command is
+# scanned once by the regex engine instead of once per pattern
+DANGEROUS = ["rm -rf /", "sudo", "shutdown", "reboot", "> /dev/"]
+DANGEROUS_RE = re.compile("|".join(map(re.escape, DANGEROUS)))
+
+
 def run_bash(command: str) -> str:
     """
     Execute shell command with safety checks.
@@ -203,26 +327,67 @@ def run_bash(command: str) -> str:
     Output: Truncated to 50KB to prevent context overflow.
     """
     # Basic safety - block dangerous patterns
-    dangerous = ["rm -rf /", "sudo", "shutdown", "reboot", "> /dev/"]
-    if any(d in command for d in dangerous):
+    if DANGEROUS_RE.search(command):
         return "Error: Dangerous command blocked"
 
     try:
-        result = subprocess.run(
-            command,
-            shell=True,
-            cwd=WORKDIR,
-            capture_output=True,
-            text=True,
-            timeout=120
-        )
-        output = (result.stdout + result.stderr).strip()
+        future = asyncio.run_coroutine_threadsafe(run_bash_async(command), BASH_LOOP)
+        output = future.result().strip()
         return output[:50000] if output else "(no output)"
 
     except subprocess.TimeoutExpired:
         return "Error: Command timed out (120s)"
     except Exception as e:
         return f"Error: {e}"
+    finally:
+        # The command may have moved, re-linked or rewritten paths
+        resolve_in_workdir.cache_clear()
+        read_cached.cache_clear()
+
+
+# Raw bytes that always cover 50000 output chars (UTF-8 is at most 4 bytes/char)
+READ_CAP = 4 * 50000 + 4
+
+
+def read_head(fp: Path, limit: int = None) -> tuple:
+    """
+    Decode only the start of a file, straight from the fd (no BufferedIO).
+
+    Keeps the first `limit` lines (everything when limit is None), never
+    more than READ_CAP bytes, and decodes that once. Also returns the
+    file's total line count, counted on raw bytes so the tail is never
+    decoded; without a limit the count isn't needed and reading stops early.
+    """
+    head = bytearray()
+    newlines = 0
+    last = b""
+    fd = os.open(fp, os.O_RDONLY)
+    try:
+        while chunk := os.read(fd, 65536):
+            if len(head) < READ_CAP and (not limit or newlines <= limit):
+                head += chunk
+            elif not limit:
+                break
+            newlines += chunk.count(b"\n")
+            last = chunk[-1:]
+    finally:
+        os.close(fd)
+    total = newlines + (1 if last not in (b"", b"\n") else 0)
+    return head[:READ_CAP].decode("utf-8", errors="replace"), total
+
+
+# Line breaks other than "\n" that str.splitlines() also honours
+OTHER_LINE_BREAKS = re.compile("[\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]")
+
+
+def head_lines(text: str, n: int) -> str:
+    """text up to its nth "\n" (all of it if shorter), found with str.find, no line list."""
+    end = -1
+    for _ in range(n):
+        end = text.find("\n", end + 1)
+        if end < 0:
+            return text
+    return text[:end]
 
 
 def run_read(path: str, limit: int = None) -> str:
@@ -233,19 +398,68 @@ def run_read(path: str, limit: int = None) -> str:
     Output truncated to 50KB to prevent context overflow.
     """
     try:
-        text = safe_path(path).read_text()
-        lines = text.splitlines()
-
-        if limit and limit < len(lines):
-            lines = lines[:limit]
-            lines.append(f"... ({len(text.splitlines()) - limit} more lines)")
-
-        return "\n".join(lines)[:50000]
+        fp = safe_path(path)
+        st = os.stat(fp)
+        return read_cached(fp, limit, (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns))
 
     except Exception as e:
         return f"Error: {e}"
 
 
+@functools.lru_cache(maxsize=256)
+def read_cached(fp: Path, limit: int, stamp: tuple) -> str:
+    """
+    The body of run_read, memoized: agents re-read the same files across
+    turns, and a repeat read then costs one stat() instead of a read and
+    a decode. `stamp` (inode, size, mtime, ctime) changes whenever the file
+    does; writes inside one timestamp tick are covered by run_write,
+    run_edit and run_bash clearing the cache.
+    """
+    text, total = read_head(fp, limit)
+
+    # Lines are "\n"-joined without a trailing newline; only files with
+    # other line breaks (\r\n, ...) need the split + join to get there
+    if OTHER_LINE_BREAKS.search(text):
+        text = "\n".join(text.splitlines())
+    else:
+        text = text.removesuffix("\n")
+
+    if limit and limit < total:
+        text = head_lines(text, limit) + f"\n... ({total - limit} more lines)"
+
+    return text[:50000]
+
+
+# Contents above one WRITEV_CHUNK go out as a scatter-gather list of
+# chunk-sized slices, at most IOV_MAX of them per writev(2). os.writev and
+# SC_IOV_MAX are POSIX-only: without them (Windows) everything goes through
+# os.write and the fallback IOV_MAX is never used.
+WRITEV_CHUNK = 1 << 20
+HAS_WRITEV = hasattr(os, "writev")
+IOV_MAX = os.sysconf("SC_IOV_MAX") if HAS_WRITEV else 1024
+
+
+def write_raw(fp: Path, data: bytes):
+    """
+    Write data to fp straight through the fd: no BufferedWriter and no
+    st_blksize-sized chunks, so a whole file normally lands in a single
+    write(2), or one writev(2) of 1 MiB slices for large contents (the
+    loop only handles short writes).
+    """
+    fd = os.open(fp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        view = memoryview(data)
+        while view:
+            if HAS_WRITEV and len(view) > WRITEV_CHUNK:
+                stop = min(len(view), IOV_MAX * WRITEV_CHUNK)
+                chunks = [view[i:i + WRITEV_CHUNK] for i in range(0, stop, WRITEV_CHUNK)]
+                view = view[os.writev(fd, chunks):]
+            else:
+                view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
 def run_write(path: str, content: str) -> str:
     """
     Write content to file, creating parent directories if needed.
@@ -256,13 +470,41 @@ def run_write(path: str, content: str) -> str:
     try:
         fp = safe_path(path)
         fp.parent.mkdir(parents=True, exist_ok=True)
-        fp.write_text(content)
+        write_raw(fp, content.encode())
+        read_cached.cache_clear()
         return f"Wrote {len(content)} bytes to {path}"
 
     except Exception as e:
         return f"Error: {e}"
 
 
+def splice_file(fp: Path, old: bytes, new: bytes) -> bool:
+    """
+    Replace the first `old` in fp with `new`, working on raw bytes.
+
+    The match is located through a read-only mmap, so the file is never
+    decoded into a str, and only the bytes from the match onward are
+    rewritten (just the match itself when the lengths are equal).
+    Returns False, leaving the file untouched, if `old` isn't there.
+    """
+    with open(fp, "r+b") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file: nothing to map
+            return False
+        with mm:
+            idx = mm.find(old)
+            if idx < 0:
+                return False
+            tail = mm[idx + len(old):]
+        f.seek(idx)
+        f.write(new)
+        if len(new) != len(old):
+            f.write(tail)
+            f.truncate()
+    return True
+
+
 def run_edit(path: str, old_text: str, new_text: str) -> str:
     """
     Replace exact text in a file (surgical edit).
@@ -272,6 +514,14 @@ def run_edit(path: str, old_text: str, new_text: str) -> str:
     """
     try:
         fp = safe_path(path)
+
+        # Fast path: splice the UTF-8 bytes in place
+        if splice_file(fp, old_text.encode(), new_text.encode()):
+            read_cached.cache_clear()
+            return f"Edited {path}"
+
+        # Text path: read_text() normalizes newlines, so e.g. a "\n" in
+        # old_text can still match a CRLF file here
         content = fp.read_text()
 
         if old_text not in content:
@@ -280,6 +530,7 @@ def run_edit(path: str, old_text: str, new_text: str) -> str:
         # Replace only first occurrence for safety
         new_content = content.replace(old_text, new_text, 1)
         fp.write_text(new_content)
+        read_cached.cache_clear()
         return f"Edited {path}"
 
     except Exception as e:
@@ -308,6 +559,50 @@ def execute_tool(name: str, args: dict) -> str:
 # The Agent Loop - This is the CORE of everything
 # =============================================================================
 
+# Model, system prompt, tools and token budget never change between turns;
+# bind them once so each turn only supplies the growing message list.
+# Streamed, so each tool call can start as soon as its block is complete.
+stream_message = functools.partial(
+    client.messages.stream,
+    model=MODEL,
+    system=SYSTEM,
+    tools=TOOLS,
+    max_tokens=8000,
+)
+
+# Tool calls are I/O-bound, so the read_file calls of one turn run side by
+# side: N reads take max(latency), not sum(latency). bash, write_file and
+# edit_file can change files, so each waits for the calls before it and runs
+# on its own, in call order (two edits of one file must not race).
+PARALLEL_TOOLS = frozenset({"read_file"})
+TOOL_POOL = ThreadPoolExecutor(max_workers=8)
+
+
+def start_tool_call(tc, futures: list):
+    """
+    Start one tool call of the current turn, appending its future to futures.
+
+    PARALLEL_TOOLS calls are submitted to TOOL_POOL as they come. Any other
+    call first waits for everything before it, then runs on this thread,
+    so a write lands after the reads that preceded it and before the ones
+    that follow.
+    """
+    if tc.name in PARALLEL_TOOLS:
+        futures.append(TOOL_POOL.submit(execute_tool, tc.name, tc.input))
+    else:
+        wait(futures)
+        future = Future()
+        future.set_result(execute_tool(tc.name, tc.input))
+        futures.append(future)
+
+
+def cancel_and_wait(futures: list):
+    """Drop the tool calls still queued and wait for the ones already running."""
+    for future in futures:
+        future.cancel()
+    wait(futures)
+
+
 def agent_loop(messages: list) -> list:
     """
     The complete agent in one function.
@@ -330,38 +625,57 @@ def agent_loop(messages: list) -> list:
       3. Conversation history maintains context across turns
     """
     while True:
-        # Step 1: Call the model
-        response = client.messages.create(
-            model=MODEL,
-            system=SYSTEM,
-            messages=messages,
-            tools=TOOLS,
-            max_tokens=8000,
-        )
-
-        # Step 2: Collect any tool calls and print text output
-        tool_calls = []
-        for block in response.content:
-            if hasattr(block, "text"):
-                print(block.text)
-            if block.type == "tool_use":
-                tool_calls.append(block)
-
-        # Step 3: If no tool calls, task is complete
+        # Steps 1-2: Call the model, printing text as it streams in. Reads
+        # start while the model is still generating the rest of the turn;
+        # the first call that may write (and everything after it) waits
+        # until the stream has closed. A tool call cut off by max_tokens
+        # still arrives with whatever input was parsed so far, so a call
+        # only counts as complete once the next block starts: the last one
+        # waits for the stop reason.
+        tool_calls, futures = [], []
+        try:
+            with stream_message(messages=messages) as stream:
+                for event in stream:
+                    match event.type:
+                        case "content_block_start":
+                            if len(futures) == len(tool_calls) - 1 and tool_calls[-1].name in PARALLEL_TOOLS:
+                                tc = tool_calls[-1]
+                                futures.append(TOOL_POOL.submit(execute_tool, tc.name, tc.input))
+                        case "content_block_stop" if event.content_block.type == "text":
+                            print(event.content_block.text)
+                        case "content_block_stop" if event.content_block.type == "tool_use":
+                            tool_calls.append(event.content_block)
+                response = stream.get_final_message()
+        except BaseException:
+            # Don't leave tools running behind a failed turn
+            cancel_and_wait(futures)
+            raise
+
+        # History keeps plain dicts, not SDK models: they are dumped once
+        # here instead of on every later turn that resends them
+        content = [block.to_dict() for block in response.content]
+
+        # Step 3: If the model didn't ask for tools, task is complete. That
+        # includes a turn cut short (e.g. max_tokens): its last call may be
+        # truncated, so nothing more runs and the reads already started are
+        # only awaited
         if response.stop_reason != "tool_use":
-            messages.append({"role": "assistant", "content": response.content})
+            cancel_and_wait(futures)
+            messages.append({"role": "assistant", "content": content})
             return messages
 
-        # Step 4: Execute each tool and collect results
+        # Step 4: Run the rest in call order, then collect the results in
+        # order (each tool_result must pair with its tool_use id)
+        for tc in tool_calls[len(futures):]:
+            start_tool_call(tc, futures)
         results = []
-        for tc in tool_calls:
+        for tc, future in zip(tool_calls, futures):
             # Display what's being executed
             print(f"\n> {tc.name}: {tc.input}")
 
-            # Execute and show result preview
-            output = execute_tool(tc.name, tc.input)
-            preview = output[:200] + "..." if len(output) > 200 else output
-            print(f"  {preview}")
+            # Wait for the result and show a preview
+            output = future.result()
+            print(f"  {output[:200]}{'...' if len(output) > 200 else ''}")
 
             # Collect result for the model
             results.append({
@@ -373,7 +687,7 @@ def agent_loop(messages: list) -> list:
         # Step 5: Append to conversation and continue
         # Note: We append assistant's response, then user's tool results
         # This maintains the alternating user/assistant pattern
-        messages.append({"role": "assistant", "content": response.content})
+        messages.append({"role": "assistant", "content": content})
         messages.append({"role": "user", "content": results})
 
 
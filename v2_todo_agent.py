@@ -56,8 +56,20 @@ Usage:
     python v2_todo_agent.py
 """
 
+import asyncio
+import atexit
+import functools
+import mmap
 import os
+import re
+import shlex
+import shutil
+import signal
 import subprocess
+import tempfile
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from pathlib import Path
 
 from anthropic import Anthropic
@@ -85,6 +97,17 @@ MODEL = os.getenv("MODEL_ID", "claude-sonnet-4-5-20250929")
 # TodoManager - The core addition in v2
 # =============================================================================
 
+# One render template per status (see TodoManager.render)
+STATUS_FMT = {
+    "completed": "[x] {content}",
+    "in_progress": "[>] {content} <- {activeForm}",
+    "pending": "[ ] {content}",
+}
+
+# Checked once per item on every TodoWrite: a hash probe, not a tuple scan
+VALID_STATUSES = frozenset(STATUS_FMT)
+
+
 # Production uses TaskCreate/TaskUpdate (TodoWrite is legacy)
 class TodoManager:
     """
@@ -106,6 +129,7 @@ class TodoManager:
 
     def __init__(self):
         self.items = []
+        self._rendered = None  # (items list it was rendered from, text)
 
     def update(self, items: list) -> str:
         """
@@ -123,41 +147,37 @@ class TodoManager:
         Returns:
             Rendered text view of the todo list
         """
-        validated = []
-        in_progress_count = 0
-
-        for i, item in enumerate(items):
-            # Extract and validate fields
-            content = str(item.get("content", "")).strip()
-            status = str(item.get("status", "pending")).lower()
-            active_form = str(item.get("activeForm", "")).strip()
-
-            # Validation checks
-            if not content:
-                raise ValueError(f"Item {i}: content required")
-            if status not in ("pending", "in_progress", "completed"):
-                raise ValueError(f"Item {i}: invalid status '{status}'")
-            if not active_form:
-                raise ValueError(f"Item {i}: activeForm required")
-
-            if status == "in_progress":
-                in_progress_count += 1
-
-            validated.append({
-                "content": content,
-                "status": status,
-                "activeForm": active_form
-            })
+        validated = [self._validate_one(i, item) for i, item in enumerate(items)]
 
         # Enforce constraints
         if len(validated) > 20:
             raise ValueError("Max 20 todos allowed")
-        if in_progress_count > 1:
+        if sum(v["status"] == "in_progress" for v in validated) > 1:
             raise ValueError("Only one task can be in_progress at a time")
 
-        self.items = validated
+        # A resent, unchanged list keeps the current one, and with it the
+        # cached rendering
+        if validated != self.items:
+            self.items = validated
         return self.render()
 
+    @staticmethod
+    def _validate_one(i: int, item: dict) -> dict:
+        """Check one raw item and return its normalized dict (ValueError if invalid)."""
+        get = item.get
+        content = str(get("content", "")).strip()
+        status = str(get("status", "pending")).lower()
+        active_form = str(get("activeForm", "")).strip()
+
+        if not content:
+            raise ValueError(f"Item {i}: content required")
+        if status not in VALID_STATUSES:
+            raise ValueError(f"Item {i}: invalid status '{status}'")
+        if not active_form:
+            raise ValueError(f"Item {i}: activeForm required")
+
+        return {"content": content, "status": status, "activeForm": active_form}
+
     def render(self) -> str:
         """
         Render the todo list as human-readable text.
@@ -171,23 +191,22 @@ class TodoManager:
 
         This rendered text is what the model sees as the tool result.
         It can then update the list based on its current state.
+
+        The text is cached until self.items is replaced (update() always
+        replaces it with a new list rather than mutating it).
         """
+        if self._rendered and self._rendered[0] is self.items:
+            return self._rendered[1]
         if not self.items:
             return "No todos."
 
-        lines = []
-        for item in self.items:
-            if item["status"] == "completed":
-                lines.append(f"[x] {item['content']}")
-            elif item["status"] == "in_progress":
-                lines.append(f"[>] {item['content']} <- {item['activeForm']}")
-            else:
-                lines.append(f"[ ] {item['content']}")
+        lines = [STATUS_FMT[item["status"]].format_map(item) for item in self.items]
 
         completed = sum(1 for t in self.items if t["status"] == "completed")
         lines.append(f"\n({completed}/{len(self.items)} completed)")
 
-        return "\n".join(lines)
+        self._rendered = (self.items, "\n".join(lines))
+        return self._rendered[1]
 
 
 # Global todo manager instance
@@ -224,7 +243,8 @@ NAG_REMINDER = "<reminder>10+ turns without todo update. Please update todos.</r
 # Tool Definitions (v1 tools + TodoWrite)
 # =============================================================================
 
-TOOLS = [
+# Frozen as a tuple: sent unchanged every turn (see stream_message)
+TOOLS = (
     # v1 tools (unchanged)
     {
         "name": "bash",
@@ -308,7 +328,7 @@ TOOLS = [
             "required": ["items"],
         },
     },
-]
+)
 
 
 # =============================================================================
@@ -317,61 +337,231 @@ TOOLS = [
 
 def safe_path(p: str) -> Path:
     """Ensure path stays within workspace."""
-    path = (WORKDIR / p).resolve()
-    if not path.is_relative_to(WORKDIR):
+    return resolve_in_workdir(WORKDIR, p)
+
+
+@functools.lru_cache(maxsize=2048)
+def resolve_in_workdir(workdir: Path, p: str) -> Path:
+    """Memoized resolve() for safe_path; run_bash clears it since only bash can re-link paths."""
+    path = (workdir / p).resolve()
+    if not path.is_relative_to(workdir):
         raise ValueError(f"Path escapes workspace: {p}")
     return path
 
 
+# One event loop thread drives every bash subprocess (calls arrive concurrently from TOOL_POOL)
+BASH_LOOP = asyncio.new_event_loop()
+threading.Thread(target=BASH_LOOP.run_forever, daemon=True).start()
+
+
+# Idle long-lived shells; each command runs in a subshell (a fork of a
+# running /bin/sh, no exec). Only touched from BASH_LOOP, so no lock.
+IDLE_SHELLS = []
+
+# Per-command FIFOs: background jobs (`cmd &`) can't write into the next
+# command's output through a pipe the shell shares with it
+FIFO_DIR = tempfile.mkdtemp(prefix="agent-bash-")
+atexit.register(shutil.rmtree, FIFO_DIR, True)
+
+
+async def run_bash_async(cmd: str) -> str:
+    """Run cmd in a pooled shell on BASH_LOOP, keeping only the first 50000 bytes of combined output; raises TimeoutExpired after 120s."""
+    shell = IDLE_SHELLS.pop() if IDLE_SHELLS else await asyncio.create_subprocess_exec(
+        "/bin/sh", cwd=WORKDIR, start_new_session=True,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+    )
+    fifo = os.path.join(FIFO_DIR, uuid.uuid4().hex)
+    os.mkfifo(fifo)
+    reader = asyncio.StreamReader()
+    transport, _ = await BASH_LOOP.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader),
+        open(os.open(fifo, os.O_RDONLY | os.O_NONBLOCK), "rb", buffering=0),
+    )
+    write_end = os.open(fifo, os.O_WRONLY)  # No EOF before the shell opens it
+    # Subshell: cd/exports/exit don't leak; a random sentinel marks the end
+    marker = f"__END_{uuid.uuid4().hex}__"
+    shell.stdin.write(
+        f"{{ (cd {shlex.quote(str(WORKDIR))} && eval {shlex.quote(cmd)}) </dev/null; "
+        f"printf '\\n%s' {marker}; }} >{shlex.quote(fifo)} 2>&1\n".encode()
+    )
+    marker = marker.encode()
+    buf = bytearray()
+
+    async def collect():
+        window = b""
+        while chunk := await reader.read(65536):
+            window += chunk
+            end = window.find(marker)
+            if end >= 0:
+                buf.extend(window[:end][:50000 - len(buf)])
+                return
+            done = len(window) - len(marker) + 1  # Keep a possible partial marker
+            if done > 0:
+                buf.extend(window[:done][:50000 - len(buf)])  # Past the cap: drain, don't keep
+                window = window[done:]
+
+    collector, exited = asyncio.ensure_future(collect()), asyncio.ensure_future(shell.wait())
+    try:
+        await shell.stdin.drain()
+        done, _ = await asyncio.wait({collector, exited}, timeout=120, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        collector.cancel()
+        exited.cancel()
+        transport.close()  # Later background writes get SIGPIPE
+        os.close(write_end)
+        os.unlink(fifo)
+    if not done:
+        os.killpg(shell.pid, signal.SIGKILL)  # Shell, command and its children
+        raise subprocess.TimeoutExpired(cmd, 120)
+    if collector in done:
+        IDLE_SHELLS.append(shell)
+    return buf.decode(errors="replace")
+
+
+DANGEROUS = ["rm -rf /", "sudo", "shutdown", "reboot"]
+DANGEROUS_RE = re.compile("|".join(map(re.escape, DANGEROUS)))  # One scan per command
+
+
 def run_bash(cmd: str) -> str:
     """Execute shell command with safety checks."""
-    dangerous = ["rm -rf /", "sudo", "shutdown", "reboot"]
-    if any(d in cmd for d in dangerous):
+    if DANGEROUS_RE.search(cmd):
         return "Error: Dangerous command blocked"
     try:
-        result = subprocess.run(
-            cmd, shell=True, cwd=WORKDIR,
-            capture_output=True, text=True, timeout=120
-        )
-        output = (result.stdout + result.stderr).strip()
+        output = asyncio.run_coroutine_threadsafe(run_bash_async(cmd), BASH_LOOP).result().strip()
         return output[:50000] if output else "(no output)"
     except subprocess.TimeoutExpired:
         return "Error: Timeout"
     except Exception as e:
         return f"Error: {e}"
+    finally:
+        resolve_in_workdir.cache_clear()  # The command may have moved, re-linked
+        read_cached.cache_clear()  # or rewritten paths
+
+
+READ_CAP = 4 * 50000 + 4  # Raw bytes that always cover 50000 output chars
+
+
+def read_head(fp: Path, limit: int = None) -> tuple:
+    """Decode only the first `limit` lines (capped at READ_CAP bytes) via os.read; also return the total line count."""
+    head = bytearray()
+    newlines = 0
+    last = b""
+    fd = os.open(fp, os.O_RDONLY)
+    try:
+        while chunk := os.read(fd, 65536):
+            if len(head) < READ_CAP and (not limit or newlines <= limit):
+                head += chunk
+            elif not limit:
+                break  # No limit: the line count isn't needed
+            newlines += chunk.count(b"\n")
+            last = chunk[-1:]
+    finally:
+        os.close(fd)
+    total = newlines + (1 if last not in (b"", b"\n") else 0)
+    return head[:READ_CAP].decode("utf-8", errors="replace"), total
+
+
+OTHER_LINE_BREAKS = re.compile("[\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]")  # Also split by splitlines()
+
+
+def head_lines(text: str, n: int) -> str:
+    """text up to its nth newline (all of it if shorter), without building a line list."""
+    end = -1
+    for _ in range(n):
+        end = text.find("\n", end + 1)
+        if end < 0:
+            return text
+    return text[:end]
 
 
 def run_read(path: str, limit: int = None) -> str:
     """Read file contents."""
     try:
-        text = safe_path(path).read_text()
-        lines = text.splitlines()
-        if limit and limit < len(lines):
-            lines = lines[:limit] + [f"... ({len(text.splitlines()) - limit} more)"]
-        return "\n".join(lines)[:50000]
+        fp = safe_path(path)
+        st = os.stat(fp)
+        return read_cached(fp, limit, (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns))
     except Exception as e:
         return f"Error: {e}"
 
 
+@functools.lru_cache(maxsize=256)
+def read_cached(fp: Path, limit: int, stamp: tuple) -> str:
+    """run_read's body, memoized on the file's stat stamp; writes and bash also clear it."""
+    text, total = read_head(fp, limit)
+    if OTHER_LINE_BREAKS.search(text):  # \r\n etc.: normalize the slow way
+        text = "\n".join(text.splitlines())
+    else:
+        text = text.removesuffix("\n")
+    if limit and limit < total:
+        text = head_lines(text, limit) + f"\n... ({total - limit} more)"
+    return text[:50000]
+
+
+WRITEV_CHUNK = 1 << 20  # Above this, one writev(2) of 1 MiB slices (<= IOV_MAX of them)
+HAS_WRITEV = hasattr(os, "writev")  # POSIX only; elsewhere (Windows) just os.write
+IOV_MAX = os.sysconf("SC_IOV_MAX") if HAS_WRITEV else 1024
+
+
+def write_raw(fp: Path, data: bytes):
+    """Write data through the raw fd, normally as one write(2) or writev(2) (no BufferedWriter)."""
+    fd = os.open(fp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        view = memoryview(data)
+        while view:
+            if HAS_WRITEV and len(view) > WRITEV_CHUNK:
+                stop = min(len(view), IOV_MAX * WRITEV_CHUNK)
+                chunks = [view[i:i + WRITEV_CHUNK] for i in range(0, stop, WRITEV_CHUNK)]
+                view = view[os.writev(fd, chunks):]
+            else:
+                view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
 def run_write(path: str, content: str) -> str:
     """Write content to file."""
     try:
         fp = safe_path(path)
         fp.parent.mkdir(parents=True, exist_ok=True)
-        fp.write_text(content)
+        write_raw(fp, content.encode())
+        read_cached.cache_clear()
         return f"Wrote {len(content)} bytes to {path}"
     except Exception as e:
         return f"Error: {e}"
 
 
+def splice_file(fp: Path, old: bytes, new: bytes) -> bool:
+    """Replace the first `old` in fp with `new` via a read-only mmap search, rewriting only from the match on; False if absent."""
+    with open(fp, "r+b") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            return False
+        with mm:
+            idx = mm.find(old)
+            if idx < 0:
+                return False
+            tail = mm[idx + len(old):]
+        f.seek(idx)
+        f.write(new)
+        if len(new) != len(old):
+            f.write(tail)
+            f.truncate()
+    return True
+
+
 def run_edit(path: str, old_text: str, new_text: str) -> str:
     """Replace exact text in file."""
     try:
         fp = safe_path(path)
-        content = fp.read_text()
+        if splice_file(fp, old_text.encode(), new_text.encode()):
+            read_cached.cache_clear()
+            return f"Edited {path}"
+        content = fp.read_text()  # Fallback: newline-normalized match (CRLF files)
         if old_text not in content:
             return f"Error: Text not found in {path}"
         fp.write_text(content.replace(old_text, new_text, 1))
+        read_cached.cache_clear()
         return f"Edited {path}"
     except Exception as e:
         return f"Error: {e}"
@@ -412,6 +602,40 @@ def execute_tool(name: str, args: dict) -> str:
 # Track how many rounds since last todo update
 rounds_without_todo = 0
 
+# read_file calls of one turn run side by side on this pool. Everything
+# else (bash, writes, edits, TodoWrite) waits for the calls before it and
+# runs on the loop thread, in call order, as in v1.
+PARALLEL_TOOLS = frozenset({"read_file"})
+TOOL_POOL = ThreadPoolExecutor(max_workers=8)
+
+
+def start_tool_call(tc, futures: list):
+    """Submit a PARALLEL_TOOLS call, or run any other after the earlier ones; append its future."""
+    if tc.name in PARALLEL_TOOLS:
+        futures.append(TOOL_POOL.submit(execute_tool, tc.name, tc.input))
+    else:
+        wait(futures)
+        future = Future()
+        future.set_result(execute_tool(tc.name, tc.input))
+        futures.append(future)
+
+# Everything but the message list is constant across turns: bind it once.
+# Streamed, so tool calls can start before the whole response is in.
+stream_message = functools.partial(
+    client.messages.stream,
+    model=MODEL,
+    system=SYSTEM,
+    tools=TOOLS,
+    max_tokens=8000,
+)
+
+
+def cancel_and_wait(futures: list):
+    """Drop the tool calls still queued and wait for the ones already running."""
+    for future in futures:
+        future.cancel()
+    wait(futures)
+
 
 def agent_loop(messages: list) -> list:
     """
@@ -424,33 +648,53 @@ def agent_loop(messages: list) -> list:
     global rounds_without_todo
 
     while True:
-        response = client.messages.create(
-            model=MODEL,
-            system=SYSTEM,
-            messages=messages,
-            tools=TOOLS,
-            max_tokens=8000,
-        )
-
-        tool_calls = []
-        for block in response.content:
-            if hasattr(block, "text"):
-                print(block.text)
-            if block.type == "tool_use":
-                tool_calls.append(block)
-
+        # Reads start mid-stream once the next block begins (a call cut off
+        # by max_tokens looks complete, so the last one waits for the stop
+        # reason); the rest run after the stream closes, as in v1
+        tool_calls, futures = [], []
+        try:
+            with stream_message(messages=messages) as stream:
+                for event in stream:
+                    match event.type:
+                        case "content_block_start":
+                            if len(futures) == len(tool_calls) - 1 and tool_calls[-1].name in PARALLEL_TOOLS:
+                                tc = tool_calls[-1]
+                                futures.append(TOOL_POOL.submit(execute_tool, tc.name, tc.input))
+                        case "content_block_stop" if event.content_block.type == "text":
+                            print(event.content_block.text)
+                        case "content_block_stop" if event.content_block.type == "tool_use":
+                            tool_calls.append(event.content_block)
+                response = stream.get_final_message()
+        except BaseException:
+            cancel_and_wait(futures)
+            raise
+        content = [block.to_dict() for block in response.content]  # Dumped once, not every turn
+
+        # Done, or cut short: a truncated last call must not run
         if response.stop_reason != "tool_use":
-            messages.append({"role": "assistant", "content": response.content})
+            cancel_and_wait(futures)
+            messages.append({"role": "assistant", "content": content})
             return messages
 
-        results = []
-        used_todo = False
+        # Update counter: reset if this turn uses todo, increment otherwise.
+        # Known up front, so the reminder goes in first instead of being
+        # inserted at the front of the results afterwards
+        if any(tc.name == "TodoWrite" for tc in tool_calls):
+            rounds_without_todo = 0
+        else:
+            rounds_without_todo += 1
+
+        # Inject NAG_REMINDER into user message if model hasn't used todos
+        # This happens INSIDE the agent loop, so model sees it during task execution
+        results = [{"type": "text", "text": NAG_REMINDER}] if rounds_without_todo > 10 else []
 
-        for tc in tool_calls:
+        # Run the rest in call order, then reap in order
+        for tc in tool_calls[len(futures):]:
+            start_tool_call(tc, futures)
+        for tc, future in zip(tool_calls, futures):
             print(f"\n> {tc.name}")
-            output = execute_tool(tc.name, tc.input)
-            preview = output[:300] + "..." if len(output) > 300 else output
-            print(f"  {preview}")
+            output = future.result()
+            print(f"  {output[:300]}{'...' if len(output) > 300 else ''}")
 
             results.append({
                 "type": "tool_result",
@@ -458,23 +702,7 @@ def agent_loop(messages: list) -> list:
                 "content": output,
             })
 
-            # Track todo usage
-            if tc.name == "TodoWrite":
-                used_todo = True
-
-        # Update counter: reset if used todo, increment otherwise
-        if used_todo:
-            rounds_without_todo = 0
-        else:
-            rounds_without_todo += 1
-
-        messages.append({"role": "assistant", "content": response.content})
-
-        # Inject NAG_REMINDER into user message if model hasn't used todos
-        # This happens INSIDE the agent loop, so model sees it during task execution
-        if rounds_without_todo > 10:
-            results.insert(0, {"type": "text", "text": NAG_REMINDER})
-
+        messages.append({"role": "assistant", "content": content})
         messages.append({"role": "user", "content": results})
 
 
@@ -73,10 +73,24 @@ Usage:
     python v3_subagent.py
 """
 
+import asyncio
+import atexit
+import functools
+import itertools
+import mmap
 import os
+import re
+import shlex
+import shutil
+import signal
 import subprocess
 import sys
+import tempfile
+import threading
 import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
 from pathlib import Path
 
 from anthropic import Anthropic
@@ -95,8 +109,20 @@ if os.getenv("ANTHROPIC_BASE_URL"):
     os.environ.pop("ANTHROPIC_AUTH_TOKEN", None)
 
 WORKDIR = Path.cwd()
-
-client = Anthropic(base_url=os.getenv("ANTHROPIC_BASE_URL"))
+TOOL_OUTPUT_DIR = WORKDIR / ".agent_cache"  # Full text of large tool results
+
+# HTTP/2 when h2 is installed: concurrent subagent requests then share one
+# connection instead of each opening its own (the SDK's default client
+# already keeps connections alive between turns)
+try:
+    import h2  # noqa: F401
+except ImportError:
+    http_client = None
+else:
+    from anthropic import DefaultHttpxClient
+    http_client = DefaultHttpxClient(http2=True)
+
+client = Anthropic(base_url=os.getenv("ANTHROPIC_BASE_URL"), http_client=http_client)
 MODEL = os.getenv("MODEL_ID", "claude-sonnet-4-5-20250929")
 
 
@@ -140,53 +166,77 @@ def get_agent_descriptions() -> str:
 
 
 # =============================================================================
-# TodoManager (from v2, unchanged)
+# TodoManager (from v2)
 # =============================================================================
 
+STATUS_MARK = {"completed": "[x]", "in_progress": "[>]", "pending": "[ ]"}
+VALID_STATUSES = frozenset(STATUS_MARK)
+
+
+@dataclass(slots=True)
+class Todo:
+    """One validated todo item: the fields are fixed, so slots, not a dict."""
+    content: str
+    status: str
+    activeForm: str
+
+
 class TodoManager:
     """Task list manager with constraints (max 20 items, single in_progress)."""
 
     def __init__(self):
         self.items = []
+        self.lock = threading.Lock()  # Parallel subagents may update it at once
+        self.last = None  # (raw items, rendering) of the last accepted update
 
     def update(self, items: list) -> str:
+        # Resending the list unchanged (a common "ping") skips validation
+        # and returns the last rendering; the raw fields are compared, not
+        # a hash of them, so a collision can't return a stale view
+        key = [(item.get("content"), item.get("status"), item.get("activeForm"))
+               for item in items]
+        last = self.last
+        if last and last[0] == key:
+            return last[1]
+
         validated = []
+        append = validated.append
         in_progress = 0
 
+        # Every item is validated, even past the 20 that are kept
         for i, item in enumerate(items):
-            content = str(item.get("content", "")).strip()
-            status = str(item.get("status", "pending")).lower()
-            active = str(item.get("activeForm", "")).strip()
+            get = item.get
+            content = str(get("content", "")).strip()
+            status = str(get("status", "pending")).lower()
+            active = str(get("activeForm", "")).strip()
 
             if not content or not active:
                 raise ValueError(f"Item {i}: content and activeForm required")
-            if status not in ("pending", "in_progress", "completed"):
+            if status not in VALID_STATUSES:
                 raise ValueError(f"Item {i}: invalid status")
-            if status == "in_progress":
-                in_progress += 1
+            in_progress += status == "in_progress"
 
-            validated.append({
-                "content": content,
-                "status": status,
-                "activeForm": active
-            })
+            append(Todo(content, status, active))
 
         if in_progress > 1:
             raise ValueError("Only one task can be in_progress")
 
-        self.items = validated[:20]
-        return self.render()
+        with self.lock:
+            self.items = validated[:20]
+            rendered = self.render()
+            self.last = (key, rendered)
+        return rendered
 
     def render(self) -> str:
         if not self.items:
             return "No todos."
         lines = []
-        for t in self.items:
-            mark = "[x]" if t["status"] == "completed" else \
-                   "[>]" if t["status"] == "in_progress" else "[ ]"
-            lines.append(f"{mark} {t['content']}")
-        done = sum(1 for t in self.items if t["status"] == "completed")
-        return "\n".join(lines) + f"\n({done}/{len(self.items)} done)"
+        done = 0
+        for t in self.items:  # One pass renders and counts
+            status = t.status
+            lines.append(f"{STATUS_MARK[status]} {t.content}")
+            done += status == "completed"
+        return "\n".join(lines) + f"\n({done}/{len(lines)} done)"
 
 
 TODO = TodoManager()
@@ -324,6 +374,12 @@ Example uses:
                 "enum": list(AGENT_TYPES.keys()),
                 "description": "Type of agent to spawn"
             },
+            "subcontext_id": {
+                "type": "string",
+                "description": "Optional name for this subagent's conversation. "
+                               "Pass the same id and type again to ask it a follow-up "
+                               "with its earlier work still in context."
+            },
         },
         "required": ["description", "prompt", "subagent_type"],
     },
@@ -348,62 +404,238 @@ def get_tools_for_agent(agent_type: str) -> list:
     return [t for t in BASE_TOOLS if t["name"] in allowed]
 
 
+# A subagent's system prompt and tools depend only on its type, so they are
+# built once here. Every fork of a type then sends a byte-identical prefix,
+# and the cache_control breakpoint lets forks after the first read that
+# prefix (tools + system) from the prompt cache instead of re-processing it.
+SUB_SYSTEM = {
+    name: [{
+        "type": "text",
+        "text": f"""You are a {name} subagent at {WORKDIR}.
+
+{config["prompt"]}
+
+Complete the task and return a clear, concise summary.""",
+        "cache_control": {"type": "ephemeral"},
+    }]
+    for name, config in AGENT_TYPES.items()
+}
+SUB_TOOLS = {name: get_tools_for_agent(name) for name in AGENT_TYPES}
+
+# The main agent's prefix (tools + SYSTEM) is fixed for the whole session
+# too: mark it the same way so every turn after the first reads it from
+# the prompt cache.
+SYSTEM_BLOCKS = [{"type": "text", "text": SYSTEM, "cache_control": {"type": "ephemeral"}}]
+
+
 # =============================================================================
 # Tool Implementations
 # =============================================================================
 
 def safe_path(p: str) -> Path:
     """Ensure path stays within workspace."""
-    path = (WORKDIR / p).resolve()
-    if not path.is_relative_to(WORKDIR):
+    return resolve_in_workdir(WORKDIR, p)
+
+
+@functools.lru_cache(maxsize=2048)
+def resolve_in_workdir(workdir: Path, p: str) -> Path:
+    """Memoized resolve() for safe_path; run_bash clears it since only bash can re-link paths."""
+    path = (workdir / p).resolve()
+    if not path.is_relative_to(workdir):
         raise ValueError(f"Path escapes workspace: {p}")
     return path
 
 
+DANGEROUS = ["rm -rf /", "sudo", "shutdown"]
+DANGEROUS_RE = re.compile("|".join(map(re.escape, DANGEROUS)))  # One scan per command
+
+
+# One event loop thread drives every bash subprocess (calls arrive
+# concurrently from TOOL_POOL and from subagents)
+BASH_LOOP = asyncio.new_event_loop()
+threading.Thread(target=BASH_LOOP.run_forever, daemon=True).start()
+
+
+# Idle long-lived shells (from v1): each command runs in a subshell, a
+# fork of an already running /bin/sh, so no exec or shell startup per call.
+# Only touched from BASH_LOOP, so no lock.
+IDLE_SHELLS = []
+
+# Each command writes to a FIFO of its own in here, not to the pipe its
+# shell shares with later commands, so background jobs (`cmd &`) can't
+# write into another command's output
+FIFO_DIR = tempfile.mkdtemp(prefix="agent-bash-")
+atexit.register(shutil.rmtree, FIFO_DIR, True)
+
+
+async def run_bash_async(cmd: str) -> str:
+    """
+    Run cmd in a pooled shell on BASH_LOOP; raises subprocess.TimeoutExpired
+    after 120s (killing that shell's whole process group).
+
+    stderr is merged into stdout and only the first 50000 bytes are kept:
+    the rest is read and dropped (the command still runs to completion),
+    so a runaway `find /` is never buffered or decoded in full. Output goes
+    to a fresh FIFO, ended by a random sentinel printed after the command,
+    and the FIFO is closed once the sentinel is read.
+    """
+    shell = IDLE_SHELLS.pop() if IDLE_SHELLS else await asyncio.create_subprocess_exec(
+        "/bin/sh", cwd=WORKDIR, start_new_session=True,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+    )
+    fifo = os.path.join(FIFO_DIR, uuid.uuid4().hex)
+    os.mkfifo(fifo)
+    reader = asyncio.StreamReader()
+    transport, _ = await BASH_LOOP.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader),
+        open(os.open(fifo, os.O_RDONLY | os.O_NONBLOCK), "rb", buffering=0),
+    )
+    write_end = os.open(fifo, os.O_WRONLY)  # No EOF before the shell opens it
+    # Subshell: cd/exports/exit don't leak into the next command
+    marker = f"__END_{uuid.uuid4().hex}__"
+    shell.stdin.write(
+        f"{{ (cd {shlex.quote(str(WORKDIR))} && eval {shlex.quote(cmd)}) </dev/null; "
+        f"printf '\\n%s' {marker}; }} >{shlex.quote(fifo)} 2>&1\n".encode()
+    )
+    marker = marker.encode()
+    buf = bytearray()
+
+    async def collect():
+        window = b""
+        while chunk := await reader.read(65536):
+            window += chunk
+            end = window.find(marker)
+            if end >= 0:
+                buf.extend(window[:end][:50000 - len(buf)])
+                return
+            done = len(window) - len(marker) + 1  # Keep a possible partial marker
+            if done > 0:
+                buf.extend(window[:done][:50000 - len(buf)])
+                window = window[done:]
+
+    collector, exited = asyncio.ensure_future(collect()), asyncio.ensure_future(shell.wait())
+    try:
+        await shell.stdin.drain()
+        done, _ = await asyncio.wait({collector, exited}, timeout=120, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        collector.cancel()
+        exited.cancel()
+        transport.close()  # Later background writes get SIGPIPE
+        os.close(write_end)
+        os.unlink(fifo)
+    if not done:
+        os.killpg(shell.pid, signal.SIGKILL)  # Shell, command and its children
+        raise subprocess.TimeoutExpired(cmd, 120)
+    if collector in done:
+        IDLE_SHELLS.append(shell)
+    return buf.decode(errors="replace")
+
+
 def run_bash(cmd: str) -> str:
     """Execute shell command with safety checks."""
-    if any(d in cmd for d in ["rm -rf /", "sudo", "shutdown"]):
+    if DANGEROUS_RE.search(cmd):
         return "Error: Dangerous command"
     try:
-        r = subprocess.run(
-            cmd, shell=True, cwd=WORKDIR,
-            capture_output=True, text=True, timeout=120
-        )
-        return ((r.stdout + r.stderr).strip() or "(no output)")[:50000]
+        output = asyncio.run_coroutine_threadsafe(run_bash_async(cmd), BASH_LOOP).result()
+        return output.strip() or "(no output)"
     except Exception as e:
         return f"Error: {e}"
+    finally:
+        resolve_in_workdir.cache_clear()  # The command may have moved, re-linked
+        read_cached.cache_clear()  # or rewritten paths
 
 
 def run_read(path: str, limit: int = None) -> str:
     """Read file contents."""
     try:
-        lines = safe_path(path).read_text().splitlines()
-        if limit:
-            lines = lines[:limit]
-        return "\n".join(lines)[:50000]
+        fp = safe_path(path)
+        st = os.stat(fp)
+        return read_cached(fp, limit, (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns))
     except Exception as e:
         return f"Error: {e}"
 
 
+@functools.lru_cache(maxsize=256)
+def read_cached(fp: Path, limit: int, stamp: tuple) -> str:
+    """
+    The body of run_read, memoized on the file's stat stamp (as in v1).
+    Shared by the main agent and every subagent, since they run in one
+    process; write, edit and bash clear it.
+    """
+    with open(fp) as f:
+        # Decode only what can be returned: the first `limit` lines, or one
+        # char past the output cap (never the whole of a huge file)
+        head = "".join(itertools.islice(f, limit)) if limit else f.read(50001)
+    lines = head.splitlines()
+    if limit:
+        lines = lines[:limit]
+    return "\n".join(lines)[:50000]
+
+
+WRITEV_CHUNK = 1 << 20  # Above this, one writev(2) of 1 MiB slices (<= IOV_MAX of them)
+HAS_WRITEV = hasattr(os, "writev")  # POSIX only; elsewhere (Windows) just os.write
+IOV_MAX = os.sysconf("SC_IOV_MAX") if HAS_WRITEV else 1024
+
+
+def write_raw(fp: Path, data: bytes):
+    """Write data through the raw fd (from v2), normally as one write(2) or writev(2)."""
+    fd = os.open(fp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        view = memoryview(data)
+        while view:
+            if HAS_WRITEV and len(view) > WRITEV_CHUNK:
+                stop = min(len(view), IOV_MAX * WRITEV_CHUNK)
+                chunks = [view[i:i + WRITEV_CHUNK] for i in range(0, stop, WRITEV_CHUNK)]
+                view = view[os.writev(fd, chunks):]
+            else:
+                view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
 def run_write(path: str, content: str) -> str:
     """Write content to file."""
     try:
         fp = safe_path(path)
         fp.parent.mkdir(parents=True, exist_ok=True)
-        fp.write_text(content)
+        write_raw(fp, content.encode())
+        read_cached.cache_clear()
         return f"Wrote {len(content)} bytes to {path}"
     except Exception as e:
         return f"Error: {e}"
 
 
+def splice_file(fp: Path, old: bytes, new: bytes) -> bool:
+    """Replace the first `old` in fp with `new` (from v2): one mmap search, rewrite from the match on; False if absent."""
+    with open(fp, "r+b") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            return False
+        with mm:
+            idx = mm.find(old)
+            if idx < 0:
+                return False
+            tail = mm[idx + len(old):]
+        f.seek(idx)
+        f.write(new)
+        if len(new) != len(old):
+            f.write(tail)
+            f.truncate()
+    return True
+
+
 def run_edit(path: str, old_text: str, new_text: str) -> str:
     """Replace exact text in file."""
     try:
         fp = safe_path(path)
-        text = fp.read_text()
-        if old_text not in text:
-            return f"Error: Text not found in {path}"
-        fp.write_text(text.replace(old_text, new_text, 1))
+        if not splice_file(fp, old_text.encode(), new_text.encode()):
+            text = fp.read_text()  # Fallback: newline-normalized match (CRLF files)
+            idx = text.find(old_text)
+            if idx < 0:
+                return f"Error: Text not found in {path}"
+            fp.write_text(text[:idx] + new_text + text[idx + len(old_text):])
+        read_cached.cache_clear()
         return f"Edited {path}"
     except Exception as e:
         return f"Error: {e}"
@@ -421,7 +653,105 @@ def run_todo(items: list) -> str:
 # Subagent Execution - The heart of v3
 # =============================================================================
 
-def run_task(description: str, prompt: str, subagent_type: str) -> str:
+class ProgressReporter:
+    """
+    Sole writer of the subagent progress lines.
+
+    Parallel subagents only record their latest status line here; a
+    daemon thread repaints the whole block at most 10 times a second,
+    moving the cursor up to the first row (ANSI ESC[nA) and rewriting each
+    row in place. N subagents making M tool calls then cost ~10 writes a
+    second instead of N*M write+flush pairs, and their lines can't garble
+    each other. A row's start and finish are painted immediately. Other
+    output printed while rows are up must go through print(), which puts
+    it above the block instead of letting the next repaint overwrite it.
+    """
+
+    INTERVAL = 0.1
+
+    def __init__(self, out=None):
+        self.out = out  # None: whatever sys.stdout is at paint time
+        self.lock = threading.Lock()
+        self.rows = {}  # row id -> status line, in start order
+        self.running = set()
+        self.drawn = 0  # Rows of the block currently on screen
+        self.next_row = 0
+        self.dirty = threading.Event()
+        self.painter = None  # Repaint thread, started by the first update
+
+    def start(self, line: str) -> int:
+        with self.lock:
+            row = self.next_row
+            self.next_row += 1
+            self.rows[row] = line
+            self.running.add(row)
+            self._paint()
+        return row
+
+    def update(self, row: int, line: str):
+        with self.lock:
+            self.rows[row] = line
+            if self.painter is None:
+                self.painter = threading.Thread(target=self._repaint_loop, daemon=True)
+                self.painter.start()
+        self.dirty.set()
+
+    def finish(self, row: int, line: str):
+        with self.lock:
+            self.rows[row] = line
+            self.running.discard(row)
+            self._paint()
+            if not self.running:
+                # Block complete: later output goes below it
+                self.rows.clear()
+                self.drawn = 0
+
+    def print(self, text: str):
+        """Print text above the block (erased, then redrawn below it)."""
+        with self.lock:
+            out = self.out or sys.stdout
+            if self.drawn:
+                out.write(f"\x1b[{self.drawn}A\r\x1b[J")
+                self.drawn = 0
+            out.write(f"{text}\n")
+            if self.rows:
+                self._paint()
+            else:
+                out.flush()
+
+    def _paint(self):
+        up = f"\x1b[{self.drawn}A" if self.drawn else ""
+        out = self.out or sys.stdout
+        out.write(up + "".join(f"\r\x1b[K{line}\n" for line in self.rows.values()))
+        out.flush()
+        self.drawn = len(self.rows)
+
+    def _repaint_loop(self):
+        while True:
+            self.dirty.wait()
+            time.sleep(self.INTERVAL)  # Coalesce everything reported meanwhile
+            with self.lock:
+                self.dirty.clear()
+                if self.rows:
+                    self._paint()
+
+
+PROGRESS = ProgressReporter()
+
+# (subagent_type, subcontext_id) -> that subagent's message history, kept
+# so the parent can continue a conversation instead of re-briefing a fresh one
+SUBCONTEXTS = {}
+
+# Tasks of one turn run side by side on TOOL_POOL, but at most
+# MAX_SUBAGENTS of them have a request in flight at once: a burst of Task
+# calls can't open a connection (and buffer a response) each; the rest wait
+# here while the others run their tools.
+MAX_SUBAGENTS = int(os.getenv("MAX_SUBAGENTS", "6"))
+SUBAGENT_SLOTS = threading.BoundedSemaphore(MAX_SUBAGENTS)
+
+
+def run_task(description: str, prompt: str, subagent_type: str,
+             subcontext_id: str = None) -> str:
     """
     Execute a subagent task with isolated context.
 
@@ -445,98 +775,231 @@ def run_task(description: str, prompt: str, subagent_type: str) -> str:
     if subagent_type not in AGENT_TYPES:
         return f"Error: Unknown agent type '{subagent_type}'"
 
-    config = AGENT_TYPES[subagent_type]
-
-    # Agent-specific system prompt
-    sub_system = f"""You are a {subagent_type} subagent at {WORKDIR}.
-
-{config["prompt"]}
-
-Complete the task and return a clear, concise summary."""
-
-    # Filtered tools for this agent type
-    sub_tools = get_tools_for_agent(subagent_type)
+    # Agent-specific system prompt and filtered tools (shared by all forks)
+    sub_system = SUB_SYSTEM[subagent_type]
+    sub_tools = SUB_TOOLS[subagent_type]
 
     # ISOLATED message history - this is the key!
-    # The subagent starts fresh, doesn't see parent's conversation
-    sub_messages = [{"role": "user", "content": prompt}]
+    # The subagent starts fresh, doesn't see parent's conversation.
+    # A subcontext_id used before instead resumes that subagent's own
+    # history (taken out while it runs, so a parallel call with the same
+    # id starts fresh rather than interleaving turns).
+    key = (subagent_type, subcontext_id)
+    sub_messages = SUBCONTEXTS.pop(key, None) if subcontext_id else None
+    if sub_messages:
+        sub_messages.append({"role": "user", "content": prompt})
+    else:
+        sub_messages = [{"role": "user", "content": prompt}]
 
     # Progress tracking
-    print(f"  [{subagent_type}] {description}")
+    label = f"  [{subagent_type}] {description}"
+    row = PROGRESS.start(label)
     start = time.time()
     tool_count = 0
 
-    # Run the same agent loop (silently - don't print to main chat)
-    while True:
-        response = client.messages.create(
-            model=MODEL,
-            system=sub_system,
-            messages=sub_messages,
-            tools=sub_tools,
-            max_tokens=8000,
-        )
-
-        if response.stop_reason != "tool_use":
-            break
-
-        tool_calls = [b for b in response.content if b.type == "tool_use"]
-        results = []
-
-        for tc in tool_calls:
-            tool_count += 1
-            output = execute_tool(tc.name, tc.input)
-            results.append({
-                "type": "tool_result",
-                "tool_use_id": tc.id,
-                "content": output
-            })
-
-            # Update progress line (in-place)
-            elapsed = time.time() - start
-            sys.stdout.write(
-                f"\r  [{subagent_type}] {description} ... {tool_count} tools, {elapsed:.1f}s"
-            )
-            sys.stdout.flush()
-
+    status = "failed"  # Unless the loop below completes
+    try:
+        # Run the same agent loop (silently - don't print to main chat)
+        while True:
+            mark_cache_breakpoint(sub_messages)
+
+            # Streamed like the main loop: read-only calls start mid-stream
+            # (see start_early), the rest once the stream and its slot are
+            # released; the first text block is the final answer
+            tool_calls, futures = [], []
+            final_text = None
+            try:
+                with SUBAGENT_SLOTS, client.messages.stream(
+                    model=MODEL,
+                    system=sub_system,
+                    messages=sub_messages,
+                    tools=sub_tools,
+                    max_tokens=8000,
+                ) as stream:
+                    for event in stream:
+                        if event.type == "content_block_start":
+                            start_early(tool_calls, futures, SUB_TOOL_POOL)
+                        elif event.type != "content_block_stop":
+                            continue
+                        elif event.content_block.type == "tool_use":
+                            tool_calls.append(event.content_block)
+                        elif event.content_block.type == "text" and final_text is None:
+                            final_text = event.content_block.text
+                    response = stream.get_final_message()
+            except BaseException:
+                cancel_and_wait(futures)
+                raise
+
+            if response.stop_reason != "tool_use":
+                cancel_and_wait(futures)
+                break
+
+            for tc in tool_calls[len(futures):]:
+                start_tool_call(tc, futures, SUB_TOOL_POOL)
+            results = []
+
+            for tc, future in zip(tool_calls, futures):
+                tool_count += 1
+                output = future.result()
+                results.append({
+                    "type": "tool_result",
+                    "tool_use_id": tc.id,
+                    "content": externalize(tc, output)
+                })
+
+                # Update progress line (repainted in place by PROGRESS)
+                elapsed = time.time() - start
+                PROGRESS.update(row, f"{label} ... {tool_count} tools, {elapsed:.1f}s")
+
+            sub_messages.append({"role": "assistant", "content": response.content})
+            sub_messages.append({"role": "user", "content": results})
+        status = "done"
+    finally:
+        # Final progress update, even if the subagent raised
+        elapsed = time.time() - start
+        PROGRESS.finish(row, f"{label} - {status} ({tool_count} tools, {elapsed:.1f}s)")
+
+    if subcontext_id:
         sub_messages.append({"role": "assistant", "content": response.content})
-        sub_messages.append({"role": "user", "content": results})
+        SUBCONTEXTS[key] = sub_messages
 
-    # Final progress update
-    elapsed = time.time() - start
-    sys.stdout.write(
-        f"\r  [{subagent_type}] {description} - done ({tool_count} tools, {elapsed:.1f}s)\n"
-    )
-
-    # Extract and return only the final text
+    # Return only the final text
     # This is what the parent agent sees - a clean summary
-    for block in response.content:
-        if hasattr(block, "text"):
-            return block.text
-
-    return "(subagent returned no text)"
+    return "(subagent returned no text)" if final_text is None else final_text
+
+
+# Tool name -> handler taking the tool input, so dispatch is one dict lookup
+TOOL_DISPATCH = {
+    "bash": lambda args: run_bash(args["command"]),
+    "read_file": lambda args: run_read(args["path"], args.get("limit")),
+    "write_file": lambda args: run_write(args["path"], args["content"]),
+    "edit_file": lambda args: run_edit(args["path"], args["old_text"], args["new_text"]),
+    "TodoWrite": lambda args: run_todo(args["items"]),
+    "Task": lambda args: run_task(args["description"], args["prompt"], args["subagent_type"],
+                                  args.get("subcontext_id")),
+}
 
 
 def execute_tool(name: str, args: dict) -> str:
     """Dispatch tool call to implementation."""
-    if name == "bash":
-        return run_bash(args["command"])
-    if name == "read_file":
-        return run_read(args["path"], args.get("limit"))
-    if name == "write_file":
-        return run_write(args["path"], args["content"])
-    if name == "edit_file":
-        return run_edit(args["path"], args["old_text"], args["new_text"])
-    if name == "TodoWrite":
-        return run_todo(args["items"])
-    if name == "Task":
-        return run_task(args["description"], args["prompt"], args["subagent_type"])
-    return f"Unknown tool: {name}"
+    handler = TOOL_DISPATCH.get(name)
+    if handler is None:
+        return f"Unknown tool: {name}"
+    return handler(args)
 
 
 # =============================================================================
 # Main Agent Loop
 # =============================================================================
 
+# Subagents spend most of their time waiting on the API, so the read-only
+# calls of one turn run side by side: N Explore Tasks take max(t_i), not
+# sum(t_i). Only read_file and Tasks of the read-only agent types overlap;
+# bash and other Tasks can change files, so they and the writes run one at
+# a time, in call order.
+PARALLEL_TOOLS = frozenset({"read_file"})
+PARALLEL_AGENTS = frozenset({"Explore"})
+TOOL_POOL = ThreadPoolExecutor(max_workers=8)
+
+
+# A subagent's own tool calls get a pool of their own: the subagent itself
+# runs on TOOL_POOL, and waiting on work queued behind you in your own pool
+# deadlocks once every worker is a waiting subagent
+SUB_TOOL_POOL = ThreadPoolExecutor(max_workers=8)
+
+
+def is_read_only(tc) -> bool:
+    """Whether tc can't change files: one of PARALLEL_TOOLS, or a Task for one of PARALLEL_AGENTS."""
+    if tc.name == "Task":
+        return tc.input.get("subagent_type") in PARALLEL_AGENTS
+    return tc.name in PARALLEL_TOOLS
+
+
+def start_tool_call(tc, futures: list, pool: ThreadPoolExecutor = TOOL_POOL):
+    """
+    Start one tool call of the current turn, appending its future to futures.
+
+    Read-only calls (see is_read_only) are submitted to pool as they come.
+    Any other call first waits for everything before it, then runs on this
+    thread, so a write still lands after the reads that preceded it and
+    before the ones that follow.
+    """
+    if is_read_only(tc):
+        futures.append(pool.submit(execute_tool, tc.name, tc.input))
+    else:
+        wait(futures)
+        future = Future()
+        future.set_result(execute_tool(tc.name, tc.input))
+        futures.append(future)
+
+
+def start_early(tool_calls: list, futures: list, pool: ThreadPoolExecutor = TOOL_POOL):
+    """
+    Called as a new block starts streaming: start the newest tool call if it
+    is read-only and every call before it has started.
+
+    A call only counts as complete once the next block starts: one cut off
+    by max_tokens still arrives with its partially parsed input, so the
+    last call of a turn never starts here. It, and everything from the
+    first call that may write, runs once the stream has closed and the
+    stop reason is known.
+    """
+    if len(futures) == len(tool_calls) - 1 and is_read_only(tool_calls[-1]):
+        tc = tool_calls[-1]
+        futures.append(pool.submit(execute_tool, tc.name, tc.input))
+
+
+def cancel_and_wait(futures: list):
+    """Drop the tool calls still queued and wait for the ones already running."""
+    for future in futures:
+        future.cancel()
+    wait(futures)
+
+
+# A tool result is resent on every later turn, so one over MAX_RESULT chars
+# goes to a file under TOOL_OUTPUT_DIR as soon as it is recorded and the
+# message keeps a pointer plus the first PREVIEW chars: request size stops
+# growing with every large output while nothing is lost, since the model
+# can read_file the full text back. It happens once, when the result is
+# appended, so the history is append-only and each turn's request is a
+# valid prompt-cache prefix of the next (see mark_cache_breakpoint).
+# read_file results stay whole: reading is how stored output comes back.
+# (v5 goes further and summarizes whole stretches of the conversation.)
+MAX_RESULT = 8000
+PREVIEW = 2000
+KEEP_WHOLE = {"read_file"}
+
+
+def externalize(tc, output: str) -> str:
+    """Content of tc's tool_result: output itself, or a pointer to it in TOOL_OUTPUT_DIR if large."""
+    if len(output) <= MAX_RESULT or tc.name in KEEP_WHOLE:
+        return output
+    TOOL_OUTPUT_DIR.mkdir(exist_ok=True)
+    path = TOOL_OUTPUT_DIR / f"tool_{tc.id}.txt"
+    path.write_text(output)
+    return (f"[output stored at {path.relative_to(WORKDIR)}, "
+            f"{len(output)} chars]\n{output[:PREVIEW]}...")
+
+
+# Everything up to the newest user message is resent unchanged next turn,
+# so a cache breakpoint there lets that request read the whole history from
+# the prompt cache and pay full price only for the new turn. One such marker
+# is kept (plus the system prompt's), well inside the API's limit of four.
+CACHE_MARK = {"type": "ephemeral"}
+
+
+def mark_cache_breakpoint(messages: list):
+    """Move the conversation's cache breakpoint to the newest user message's last block."""
+    last = messages[-1]
+    if last["role"] != "user" or not isinstance(last["content"], list) or not last["content"]:
+        return
+    for msg in reversed(messages[:-1]):  # Drop the previous marker (one at most)
+        if msg["role"] == "user" and isinstance(msg["content"], list) and msg["content"] \
+                and msg["content"][-1].pop("cache_control", None):
+            break
+    last["content"][-1]["cache_control"] = CACHE_MARK
+
+
 def agent_loop(messages: list) -> list:
     """
     Main agent loop with subagent support.
@@ -545,44 +1008,64 @@ def agent_loop(messages: list) -> list:
     When model calls Task, it spawns a subagent with isolated context.
     """
     while True:
-        response = client.messages.create(
-            model=MODEL,
-            system=SYSTEM,
-            messages=messages,
-            tools=ALL_TOOLS,
-            max_tokens=8000,
-        )
-
-        tool_calls = []
-        for block in response.content:
-            if hasattr(block, "text"):
-                print(block.text)
-            if block.type == "tool_use":
-                tool_calls.append(block)
+        mark_cache_breakpoint(messages)
 
+        # Print text as it streams in. Read-only calls (and Explore
+        # subagents) start while the model is still generating the rest of
+        # the turn (see start_early); anything that may write waits until
+        # the stream has closed, so it never holds the connection open
+        tool_calls, futures = [], []
+        try:
+            with client.messages.stream(
+                model=MODEL,
+                system=SYSTEM_BLOCKS,
+                messages=messages,
+                tools=ALL_TOOLS,
+                max_tokens=8000,
+            ) as stream:
+                for event in stream:
+                    if event.type == "content_block_start":
+                        start_early(tool_calls, futures)
+                    elif event.type != "content_block_stop":
+                        continue
+                    elif event.content_block.type == "text":
+                        PROGRESS.print(event.content_block.text)
+                    elif event.content_block.type == "tool_use":
+                        tool_calls.append(event.content_block)
+                response = stream.get_final_message()
+        except BaseException:
+            # Don't leave tools (or subagents) running behind a failed turn
+            cancel_and_wait(futures)
+            raise
+
+        # Done, or cut short: a truncated last call must not run, and early
+        # calls are cancelled or awaited rather than left running
         if response.stop_reason != "tool_use":
+            cancel_and_wait(futures)
             messages.append({"role": "assistant", "content": response.content})
             return messages
 
+        # Run the rest in call order, then collect the results in call
+        # order (each tool_result pairs with its id)
+        for tc in tool_calls[len(futures):]:
+            start_tool_call(tc, futures)
         results = []
-        for tc in tool_calls:
+        for tc, future in zip(tool_calls, futures):
+            output = future.result()
             # Task tool has special display handling
             if tc.name == "Task":
-                print(f"\n> Task: {tc.input.get('description', 'subtask')}")
+                PROGRESS.print(f"\n> Task: {tc.input.get('description', 'subtask')}")
             else:
-                print(f"\n> {tc.name}")
-
-            output = execute_tool(tc.name, tc.input)
+                PROGRESS.print(f"\n> {tc.name}")
 
             # Don't print full Task output (it manages its own display)
             if tc.name != "Task":
-                preview = output[:200] + "..." if len(output) > 200 else output
-                print(f"  {preview}")
+                PROGRESS.print(f"  {output[:200]}{'...' if len(output) > 200 else ''}")
 
             results.append({
                 "type": "tool_result",
                 "tool_use_id": tc.id,
-                "content": output
+                "content": externalize(tc, output)
             })
 
         messages.append({"role": "assistant", "content": response.content})
@@ -77,11 +77,25 @@ Usage:
     python v4_skills_agent.py
 """
 
+import asyncio
+import atexit
+import functools
+import itertools
+import json
+import mmap
 import os
 import re
+import shlex
+import shutil
+import signal
 import subprocess
 import sys
+import tempfile
+import threading
 import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
 from pathlib import Path
 
 from anthropic import Anthropic
@@ -100,9 +114,22 @@ if os.getenv("ANTHROPIC_BASE_URL"):
     os.environ.pop("ANTHROPIC_AUTH_TOKEN", None)
 
 WORKDIR = Path.cwd()
+TOOL_OUTPUT_DIR = WORKDIR / ".agent_cache"  # Full text of large tool results
 SKILLS_DIR = WORKDIR / "skills"
-
-client = Anthropic(base_url=os.getenv("ANTHROPIC_BASE_URL"))
+SKILL_CACHE = ".cache.json"  # Parsed SKILL.md files, inside SKILLS_DIR
+
+# HTTP/2 when h2 is installed: concurrent subagent requests then share one
+# connection instead of each opening its own (the SDK's default client
+# already keeps connections alive between turns)
+try:
+    import h2  # noqa: F401
+except ImportError:
+    http_client = None
+else:
+    from anthropic import DefaultHttpxClient
+    http_client = DefaultHttpxClient(http2=True)
+
+client = Anthropic(base_url=os.getenv("ANTHROPIC_BASE_URL"), http_client=http_client)
 MODEL = os.getenv("MODEL_ID", "claude-sonnet-4-5-20250929")
 
 
@@ -110,6 +137,57 @@ MODEL = os.getenv("MODEL_ID", "claude-sonnet-4-5-20250929")
 # SkillLoader - The core addition in v4
 # =============================================================================
 
+def is_marker(line: bytes) -> bool:
+    """A complete frontmatter --- line (trailing whitespace allowed, newline required)."""
+    return line.endswith(b"\n") and line.rstrip() == b"---"
+
+
+def read_frontmatter(f) -> list:
+    """The frontmatter lines of an open SKILL.md, leaving f at the body; None if it has none."""
+    if not is_marker(f.readline()):
+        return None
+    frontmatter = []
+    for line in iter(f.readline, b""):
+        if frontmatter and is_marker(line):
+            return frontmatter
+        frontmatter.append(line)
+    return None
+
+
+def read_skill_body(path: Path, offset: int, stamp: list) -> str:
+    """
+    The body of a SKILL.md: everything from byte `offset` on, mapped
+    rather than read through a buffer, newline-normalized and stripped.
+
+    offset was recorded when the file had the (mtime, size) `stamp`; if
+    it has been edited since, the frontmatter is read again to find
+    where the body starts now.
+    """
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        if [st.st_mtime_ns, st.st_size] != stamp:
+            offset = f.tell() if read_frontmatter(f) is not None else 0
+        if offset >= st.st_size:
+            return ""  # Nothing to map (mmap rejects empty files)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text = mm[offset:].decode()
+    return text.replace("\r\n", "\n").replace("\r", "\n").strip()
+
+
+class Skill(dict):
+    """
+    A parsed skill whose "body" is only read from SKILL.md when first
+    asked for (the Skill tool), so bodies of skills a session never uses
+    are never loaded. Everything else is plain dict access.
+    """
+
+    def __missing__(self, key):
+        if key != "body":
+            raise KeyError(key)
+        self["body"] = body = read_skill_body(self["path"], self["body_offset"], self["stamp"])
+        return body
+
+
 class SkillLoader:
     """
     Loads and manages skills from SKILL.md files.
@@ -144,42 +222,45 @@ class SkillLoader:
     def __init__(self, skills_dir: Path):
         self.skills_dir = skills_dir
         self.skills = {}
+        self._descriptions = None
         self.load_skills()
 
     def parse_skill_md(self, path: Path) -> dict:
         """
         Parse a SKILL.md file into metadata and body.
 
-        Returns dict with: name, description, body, path, dir
+        Returns a Skill with: name, description, body_offset, stamp, path, dir
+        (and body, loaded on first access).
         Returns None if file doesn't match format.
         """
-        content = path.read_text()
-
-        # Match YAML frontmatter between --- markers
-        match = re.match(r"^---\s*\n(.*?)\n---\s*\n(.*)$", content, re.DOTALL)
-        if not match:
-            return None
-
-        frontmatter, body = match.groups()
+        with open(path, "rb") as f:
+            # Frontmatter between --- marker lines; only its lines are
+            # read here, the body just gets its offset (see Skill)
+            frontmatter = read_frontmatter(f)
+            if frontmatter is None:
+                return None
+            body_offset = f.tell()
+            st = os.fstat(f.fileno())
 
         # Parse YAML-like frontmatter (simple key: value)
-        metadata = {}
-        for line in frontmatter.strip().split("\n"):
-            if ":" in line:
-                key, value = line.split(":", 1)
-                metadata[key.strip()] = value.strip().strip("\"'")
+        metadata = {
+            key.strip(): value.strip().strip("\"'")
+            for key, sep, value in (line.decode().partition(":") for line in frontmatter)
+            if sep
+        }
 
         # Require name and description
         if "name" not in metadata or "description" not in metadata:
             return None
 
-        return {
-            "name": metadata["name"],
-            "description": metadata["description"],
-            "body": body.strip(),
-            "path": path,
-            "dir": path.parent,
-        }
+        return Skill(
+            name=metadata["name"],
+            description=metadata["description"],
+            body_offset=body_offset,
+            stamp=[st.st_mtime_ns, st.st_size],
+            path=path,
+            dir=path.parent,
+        )
 
     def load_skills(self):
         """
@@ -187,21 +268,69 @@ class SkillLoader:
 
         Only loads metadata at startup - body is loaded on-demand.
         This keeps the initial context lean.
+
+        Parse results are cached in SKILL_CACHE, keyed by skill folder and
+        stamped with SKILL.md's (mtime, size): on a warm start an unchanged
+        skill costs one stat() instead of a read and parse. The cache is
+        only rewritten when something changed.
         """
-        if not self.skills_dir.exists():
+        self._descriptions = None
+        try:
+            # Sorted: listing order is filesystem-dependent, and the
+            # descriptions built from it go into the cached prompt prefix
+            entries = sorted(os.scandir(self.skills_dir), key=lambda e: e.name)
+        except FileNotFoundError:
             return
 
-        for skill_dir in self.skills_dir.iterdir():
-            if not skill_dir.is_dir():
+        cache_path = self.skills_dir / SKILL_CACHE
+        cache = self._read_cache(cache_path)
+        fresh = {}
+
+        # scandir reports each entry's type from the directory listing, so
+        # only SKILL.md itself is looked at (no per-entry stat/exists calls)
+        for entry in entries:
+            if not entry.is_dir():
                 continue
 
-            skill_md = skill_dir / "SKILL.md"
-            if not skill_md.exists():
+            skill_md = Path(entry.path, "SKILL.md")
+            try:
+                st = os.stat(skill_md)
+            except FileNotFoundError:
                 continue
 
-            skill = self.parse_skill_md(skill_md)
-            if skill:
-                self.skills[skill["name"]] = skill
+            stamp = [st.st_mtime_ns, st.st_size]
+            cached = cache.get(entry.name)
+            if cached and cached.get("stamp") == stamp:
+                meta = cached.get("skill")
+            else:
+                skill = self.parse_skill_md(skill_md)
+                meta = skill and {k: skill[k] for k in ("name", "description", "body_offset")}
+            fresh[entry.name] = {"stamp": stamp, "skill": meta}  # Invalid files too
+
+            if meta:
+                self.skills[meta["name"]] = Skill(meta, stamp=stamp, path=skill_md, dir=skill_md.parent)
+
+        if fresh != cache:
+            self._write_cache(cache_path, fresh)
+
+    @staticmethod
+    def _read_cache(path: Path) -> dict:
+        """Load the parse cache; missing or unreadable means empty."""
+        try:
+            cache = json.loads(path.read_bytes())
+        except (OSError, ValueError):
+            return {}
+        return cache if isinstance(cache, dict) else {}
+
+    @staticmethod
+    def _write_cache(path: Path, cache: dict):
+        """Replace the parse cache atomically; a read-only skills dir just goes uncached."""
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            tmp.write_text(json.dumps(cache))
+            os.replace(tmp, path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
 
     def get_descriptions(self) -> str:
         """
@@ -213,10 +342,13 @@ class SkillLoader:
         if not self.skills:
             return "(no skills available)"
 
-        return "\n".join(
-            f"- {name}: {skill['description']}"
-            for name, skill in self.skills.items()
-        )
+        # Built once per load_skills() (it goes into both SYSTEM and the Skill tool)
+        if self._descriptions is None:
+            self._descriptions = "\n".join(
+                f"- {name}: {skill['description']}"
+                for name, skill in self.skills.items()
+            )
+        return self._descriptions
 
     def get_skill_content(self, name: str) -> str:
         """
@@ -301,50 +433,74 @@ def get_agent_descriptions() -> str:
 # TodoManager (from v2)
 # =============================================================================
 
+STATUS_MARK = {"completed": "[x]", "in_progress": "[>]", "pending": "[ ]"}
+VALID_STATUSES = frozenset(STATUS_MARK)
+
+
+@dataclass(slots=True)
+class Todo:
+    """One validated todo item: the fields are fixed, so slots, not a dict."""
+    content: str
+    status: str
+    activeForm: str
+
+
 class TodoManager:
     """Task list manager with constraints (max 20 items, single in_progress)."""
 
     def __init__(self):
         self.items = []
+        self.lock = threading.Lock()  # Parallel subagents may update it at once
+        self.last = None  # (raw items, rendering) of the last accepted update
 
     def update(self, items: list) -> str:
+        # Resending the list unchanged (a common "ping") skips validation
+        # and returns the last rendering; the raw fields are compared, not
+        # a hash of them, so a collision can't return a stale view
+        key = [(item.get("content"), item.get("status"), item.get("activeForm"))
+               for item in items]
+        last = self.last
+        if last and last[0] == key:
+            return last[1]
+
         validated = []
+        append = validated.append
         in_progress = 0
 
+        # Every item is validated, even past the 20 that are kept
         for i, item in enumerate(items):
-            content = str(item.get("content", "")).strip()
-            status = str(item.get("status", "pending")).lower()
-            active = str(item.get("activeForm", "")).strip()
+            get = item.get
+            content = str(get("content", "")).strip()
+            status = str(get("status", "pending")).lower()
+            active = str(get("activeForm", "")).strip()
 
             if not content or not active:
                 raise ValueError(f"Item {i}: content and activeForm required")
-            if status not in ("pending", "in_progress", "completed"):
+            if status not in VALID_STATUSES:
                 raise ValueError(f"Item {i}: invalid status")
-            if status == "in_progress":
-                in_progress += 1
+            in_progress += status == "in_progress"
 
-            validated.append({
-                "content": content,
-                "status": status,
-                "activeForm": active
-            })
+            append(Todo(content, status, active))
 
         if in_progress > 1:
             raise ValueError("Only one task can be in_progress")
 
-        self.items = validated[:20]
-        return self.render()
+        with self.lock:
+            self.items = validated[:20]
+            rendered = self.render()
+            self.last = (key, rendered)
+        return rendered
 
     def render(self) -> str:
         if not self.items:
             return "No todos."
         lines = []
-        for t in self.items:
-            mark = "[x]" if t["status"] == "completed" else \
-                   "[>]" if t["status"] == "in_progress" else "[ ]"
-            lines.append(f"{mark} {t['content']}")
-        done = sum(1 for t in self.items if t["status"] == "completed")
-        return "\n".join(lines) + f"\n({done}/{len(self.items)} done)"
+        done = 0
+        for t in self.items:  # One pass renders and counts
+            status = t.status
+            lines.append(f"{STATUS_MARK[status]} {t.content}")
+            done += status == "completed"
+        return "\n".join(lines) + f"\n({done}/{len(lines)} done)"
 
 
 TODO = TodoManager()
@@ -354,6 +510,9 @@ TODO = TodoManager()
 # System Prompt - Updated for v4
 # =============================================================================
 
+# Built once at import, like the Task and Skill tool descriptions below, so
+# every request sends the same bytes and hits the prompt cache. Skills added
+# after startup only show up after a restart.
 SYSTEM = f"""You are a coding agent at {WORKDIR}.
 
 Loop: plan -> act with tools -> report.
@@ -469,6 +628,10 @@ TASK_TOOL = {
                 "type": "string",
                 "enum": list(AGENT_TYPES.keys())
             },
+            "subcontext_id": {
+                "type": "string",
+                "description": "Optional; reuse an id (same type) to continue that subagent's conversation"
+            },
         },
         "required": ["description", "prompt", "subagent_type"],
     },
@@ -515,62 +678,221 @@ def get_tools_for_agent(agent_type: str) -> list:
     return [t for t in BASE_TOOLS if t["name"] in allowed]
 
 
+# Fixed per agent type / per session, so built once and marked cacheable:
+# every turn and every fork of a type sends a byte-identical prefix that
+# the API can read from the prompt cache (see v3)
+SUB_SYSTEM = {
+    name: [{
+        "type": "text",
+        "text": f"""You are a {name} subagent at {WORKDIR}.
+
+{config["prompt"]}
+
+Complete the task and return a clear, concise summary.""",
+        "cache_control": {"type": "ephemeral"},
+    }]
+    for name, config in AGENT_TYPES.items()
+}
+SUB_TOOLS = {name: get_tools_for_agent(name) for name in AGENT_TYPES}
+SYSTEM_BLOCKS = [{"type": "text", "text": SYSTEM, "cache_control": {"type": "ephemeral"}}]
+
+
 # =============================================================================
 # Tool Implementations
 # =============================================================================
 
 def safe_path(p: str) -> Path:
     """Ensure path stays within workspace."""
-    path = (WORKDIR / p).resolve()
-    if not path.is_relative_to(WORKDIR):
+    return resolve_in_workdir(WORKDIR, p)
+
+
+@functools.lru_cache(maxsize=2048)
+def resolve_in_workdir(workdir: Path, p: str) -> Path:
+    """Memoized resolve() for safe_path; run_bash clears it since only bash can re-link paths."""
+    path = (workdir / p).resolve()
+    if not path.is_relative_to(workdir):
         raise ValueError(f"Path escapes workspace: {p}")
     return path
 
 
+DANGEROUS = ["rm -rf /", "sudo", "shutdown"]
+DANGEROUS_RE = re.compile("|".join(map(re.escape, DANGEROUS)))  # One scan per command
+
+
+# One event loop thread drives every bash subprocess: run_bash stays a
+# plain function for its callers and just waits on the loop
+BASH_LOOP = asyncio.new_event_loop()
+threading.Thread(target=BASH_LOOP.run_forever, daemon=True).start()
+
+
+# Idle long-lived shells (from v1); each command runs in a forked
+# subshell. Only touched from BASH_LOOP, so no lock.
+IDLE_SHELLS = []
+
+# Per-command FIFOs (from v1): background jobs can't leak into later output
+FIFO_DIR = tempfile.mkdtemp(prefix="agent-bash-")
+atexit.register(shutil.rmtree, FIFO_DIR, True)
+
+
+async def run_bash_async(cmd: str) -> str:
+    """Run cmd in a pooled shell on BASH_LOOP, keeping only the first 50000 bytes of combined output; raises TimeoutExpired after 120s."""
+    shell = IDLE_SHELLS.pop() if IDLE_SHELLS else await asyncio.create_subprocess_exec(
+        "/bin/sh", cwd=WORKDIR, start_new_session=True,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+    )
+    fifo = os.path.join(FIFO_DIR, uuid.uuid4().hex)
+    os.mkfifo(fifo)
+    reader = asyncio.StreamReader()
+    transport, _ = await BASH_LOOP.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader),
+        open(os.open(fifo, os.O_RDONLY | os.O_NONBLOCK), "rb", buffering=0),
+    )
+    write_end = os.open(fifo, os.O_WRONLY)  # No EOF before the shell opens it
+    # Subshell: cd/exports/exit don't leak into the next command
+    marker = f"__END_{uuid.uuid4().hex}__"
+    shell.stdin.write(
+        f"{{ (cd {shlex.quote(str(WORKDIR))} && eval {shlex.quote(cmd)}) </dev/null; "
+        f"printf '\\n%s' {marker}; }} >{shlex.quote(fifo)} 2>&1\n".encode()
+    )
+    marker = marker.encode()
+    buf = bytearray()
+
+    async def collect():
+        window = b""
+        while chunk := await reader.read(65536):
+            window += chunk
+            end = window.find(marker)
+            if end >= 0:
+                buf.extend(window[:end][:50000 - len(buf)])
+                return
+            done = len(window) - len(marker) + 1  # Keep a possible partial marker
+            if done > 0:
+                buf.extend(window[:done][:50000 - len(buf)])
+                window = window[done:]
+
+    collector, exited = asyncio.ensure_future(collect()), asyncio.ensure_future(shell.wait())
+    try:
+        await shell.stdin.drain()
+        done, _ = await asyncio.wait({collector, exited}, timeout=120, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        collector.cancel()
+        exited.cancel()
+        transport.close()  # Later background writes get SIGPIPE
+        os.close(write_end)
+        os.unlink(fifo)
+    if not done:
+        os.killpg(shell.pid, signal.SIGKILL)  # Shell, command and its children
+        raise subprocess.TimeoutExpired(cmd, 120)
+    if collector in done:
+        IDLE_SHELLS.append(shell)
+    return buf.decode(errors="replace")
+
+
 def run_bash(cmd: str) -> str:
     """Execute shell command."""
-    if any(d in cmd for d in ["rm -rf /", "sudo", "shutdown"]):
+    if DANGEROUS_RE.search(cmd):
         return "Error: Dangerous command"
     try:
-        r = subprocess.run(
-            cmd, shell=True, cwd=WORKDIR,
-            capture_output=True, text=True, timeout=120
-        )
-        return ((r.stdout + r.stderr).strip() or "(no output)")[:50000]
+        output = asyncio.run_coroutine_threadsafe(run_bash_async(cmd), BASH_LOOP).result()
+        return output.strip() or "(no output)"
     except Exception as e:
         return f"Error: {e}"
+    finally:
+        resolve_in_workdir.cache_clear()  # The command may have moved, re-linked
+        read_cached.cache_clear()  # or rewritten paths
 
 
 def run_read(path: str, limit: int = None) -> str:
     """Read file contents."""
     try:
-        lines = safe_path(path).read_text().splitlines()
-        if limit:
-            lines = lines[:limit]
-        return "\n".join(lines)[:50000]
+        fp = safe_path(path)
+        st = os.stat(fp)
+        return read_cached(fp, limit, (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns))
     except Exception as e:
         return f"Error: {e}"
 
 
+@functools.lru_cache(maxsize=256)
+def read_cached(fp: Path, limit: int, stamp: tuple) -> str:
+    """
+    The body of run_read, memoized on the file's stat stamp (as in v1).
+    Shared by the main agent and every subagent, since they run in one
+    process; write, edit and bash clear it.
+    """
+    with open(fp) as f:
+        # Decode only what can be returned: the first `limit` lines, or one
+        # char past the output cap (never the whole of a huge file)
+        head = "".join(itertools.islice(f, limit)) if limit else f.read(50001)
+    lines = head.splitlines()
+    if limit:
+        lines = lines[:limit]
+    return "\n".join(lines)[:50000]
+
+
+WRITEV_CHUNK = 1 << 20  # Above this, one writev(2) of 1 MiB slices (<= IOV_MAX of them)
+HAS_WRITEV = hasattr(os, "writev")  # POSIX only; elsewhere (Windows) just os.write
+IOV_MAX = os.sysconf("SC_IOV_MAX") if HAS_WRITEV else 1024
+
+
+def write_raw(fp: Path, data: bytes):
+    """Write data through the raw fd (from v2), normally as one write(2) or writev(2)."""
+    fd = os.open(fp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        view = memoryview(data)
+        while view:
+            if HAS_WRITEV and len(view) > WRITEV_CHUNK:
+                stop = min(len(view), IOV_MAX * WRITEV_CHUNK)
+                chunks = [view[i:i + WRITEV_CHUNK] for i in range(0, stop, WRITEV_CHUNK)]
+                view = view[os.writev(fd, chunks):]
+            else:
+                view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
 def run_write(path: str, content: str) -> str:
     """Write content to file."""
     try:
         fp = safe_path(path)
         fp.parent.mkdir(parents=True, exist_ok=True)
-        fp.write_text(content)
+        write_raw(fp, content.encode())
+        read_cached.cache_clear()
         return f"Wrote {len(content)} bytes to {path}"
     except Exception as e:
         return f"Error: {e}"
 
 
+def splice_file(fp: Path, old: bytes, new: bytes) -> bool:
+    """Replace the first `old` in fp with `new` (from v2): one mmap search, rewrite from the match on; False if absent."""
+    with open(fp, "r+b") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            return False
+        with mm:
+            idx = mm.find(old)
+            if idx < 0:
+                return False
+            tail = mm[idx + len(old):]
+        f.seek(idx)
+        f.write(new)
+        if len(new) != len(old):
+            f.write(tail)
+            f.truncate()
+    return True
+
+
 def run_edit(path: str, old_text: str, new_text: str) -> str:
     """Replace exact text in file."""
     try:
         fp = safe_path(path)
-        text = fp.read_text()
-        if old_text not in text:
-            return f"Error: Text not found in {path}"
-        fp.write_text(text.replace(old_text, new_text, 1))
+        if not splice_file(fp, old_text.encode(), new_text.encode()):
+            text = fp.read_text()  # Fallback: newline-normalized match (CRLF files)
+            idx = text.find(old_text)
+            if idx < 0:
+                return f"Error: Text not found in {path}"
+            fp.write_text(text[:idx] + new_text + text[idx + len(old_text):])
+        read_cached.cache_clear()
         return f"Edited {path}"
     except Exception as e:
         return f"Error: {e}"
@@ -600,11 +922,26 @@ def run_skill(skill_name: str, args: str = None) -> str:
 
     This is how production systems stay cost-efficient.
     """
-    content = SKILLS.get_skill_content(skill_name)
+    message = skill_message(skill_name, str(args) if args else None)
 
-    if content is None:
+    if message is None:
         available = ", ".join(SKILLS.list_skills()) or "none"
         return f"Error: Unknown skill '{skill_name}'. Available: {available}"
+    return message
+
+
+@functools.lru_cache(maxsize=64)
+def skill_message(skill_name: str, args: str = None) -> str:
+    """
+    The <skill-loaded> tool result for a skill (None if there is no such skill).
+
+    Skills are fixed once loaded, so reloading one (subagents often do)
+    returns the same string without re-listing its resource folders, and
+    the result is byte-identical every time.
+    """
+    content = SKILLS.get_skill_content(skill_name)
+    if content is None:
+        return None
 
     # Wrap in tags so model knows it's skill content
     args_attr = f' args="{args}"' if args else ""
@@ -615,93 +952,265 @@ def run_skill(skill_name: str, args: str = None) -> str:
 Follow the instructions in the skill above to complete the user's task."""
 
 
-def run_task(description: str, prompt: str, subagent_type: str) -> str:
-    """Execute a subagent task with isolated context and filtered tools."""
-    if subagent_type not in AGENT_TYPES:
-        return f"Error: Unknown agent type '{subagent_type}'"
+class ProgressReporter:
+    """
+    Sole writer of the subagent progress lines (from v3): per-tool updates
+    are coalesced and repainted in place by a daemon thread at most 10
+    times a second; a row's start and finish are painted immediately.
+    Other output goes through print(), so repaints can't overwrite it.
+    """
 
-    config = AGENT_TYPES[subagent_type]
-    sub_system = f"""You are a {subagent_type} subagent at {WORKDIR}.
+    INTERVAL = 0.1
+
+    def __init__(self, out=None):
+        self.out = out  # None: whatever sys.stdout is at paint time
+        self.lock = threading.Lock()
+        self.rows = {}  # row id -> status line, in start order
+        self.running = set()
+        self.drawn = 0  # Rows of the block currently on screen
+        self.next_row = 0
+        self.dirty = threading.Event()
+        self.painter = None  # Repaint thread, started by the first update
+
+    def start(self, line: str) -> int:
+        with self.lock:
+            row = self.next_row
+            self.next_row += 1
+            self.rows[row] = line
+            self.running.add(row)
+            self._paint()
+        return row
+
+    def update(self, row: int, line: str):
+        with self.lock:
+            self.rows[row] = line
+            if self.painter is None:
+                self.painter = threading.Thread(target=self._repaint_loop, daemon=True)
+                self.painter.start()
+        self.dirty.set()
+
+    def finish(self, row: int, line: str):
+        with self.lock:
+            self.rows[row] = line
+            self.running.discard(row)
+            self._paint()
+            if not self.running:
+                # Block complete: later output goes below it
+                self.rows.clear()
+                self.drawn = 0
+
+    def print(self, text: str):
+        """Print text above the block (erased, then redrawn below it)."""
+        with self.lock:
+            out = self.out or sys.stdout
+            if self.drawn:
+                out.write(f"\x1b[{self.drawn}A\r\x1b[J")
+                self.drawn = 0
+            out.write(f"{text}\n")
+            if self.rows:
+                self._paint()
+            else:
+                out.flush()
 
-{config["prompt"]}
+    def _paint(self):
+        up = f"\x1b[{self.drawn}A" if self.drawn else ""
+        out = self.out or sys.stdout
+        out.write(up + "".join(f"\r\x1b[K{line}\n" for line in self.rows.values()))
+        out.flush()
+        self.drawn = len(self.rows)
 
-Complete the task and return a clear, concise summary."""
+    def _repaint_loop(self):
+        while True:
+            self.dirty.wait()
+            time.sleep(self.INTERVAL)  # Coalesce everything reported meanwhile
+            with self.lock:
+                self.dirty.clear()
+                if self.rows:
+                    self._paint()
 
-    sub_tools = get_tools_for_agent(subagent_type)
-    sub_messages = [{"role": "user", "content": prompt}]
 
-    print(f"  [{subagent_type}] {description}")
-    start = time.time()
-    tool_count = 0
+PROGRESS = ProgressReporter()
 
-    while True:
-        response = client.messages.create(
-            model=MODEL,
-            system=sub_system,
-            messages=sub_messages,
-            tools=sub_tools,
-            max_tokens=8000,
-        )
+# (subagent_type, subcontext_id) -> resumable subagent message history
+SUBCONTEXTS = {}
 
-        if response.stop_reason != "tool_use":
-            break
+# At most MAX_SUBAGENTS parallel Tasks have a request in flight (from v3)
+MAX_SUBAGENTS = int(os.getenv("MAX_SUBAGENTS", "6"))
+SUBAGENT_SLOTS = threading.BoundedSemaphore(MAX_SUBAGENTS)
 
-        tool_calls = [b for b in response.content if b.type == "tool_use"]
-        results = []
 
-        for tc in tool_calls:
-            tool_count += 1
-            output = execute_tool(tc.name, tc.input)
-            results.append({
-                "type": "tool_result",
-                "tool_use_id": tc.id,
-                "content": output
-            })
+def run_task(description: str, prompt: str, subagent_type: str,
+             subcontext_id: str = None) -> str:
+    """Execute a subagent task with isolated context and filtered tools."""
+    if subagent_type not in AGENT_TYPES:
+        return f"Error: Unknown agent type '{subagent_type}'"
 
-            elapsed = time.time() - start
-            sys.stdout.write(
-                f"\r  [{subagent_type}] {description} ... {tool_count} tools, {elapsed:.1f}s"
-            )
-            sys.stdout.flush()
+    sub_system = SUB_SYSTEM[subagent_type]
+    sub_tools = SUB_TOOLS[subagent_type]
+    key = (subagent_type, subcontext_id)
+    sub_messages = SUBCONTEXTS.pop(key, None) if subcontext_id else None
+    if sub_messages:
+        sub_messages.append({"role": "user", "content": prompt})
+    else:
+        sub_messages = [{"role": "user", "content": prompt}]
+
+    label = f"  [{subagent_type}] {description}"
+    row = PROGRESS.start(label)
+    start = time.time()
+    tool_count = 0
 
+    status = "failed"  # Unless the loop below completes
+    try:
+        while True:
+            mark_cache_breakpoint(sub_messages)
+            with SUBAGENT_SLOTS:
+                response = client.messages.create(
+                    model=MODEL,
+                    system=sub_system,
+                    messages=sub_messages,
+                    tools=sub_tools,
+                    max_tokens=8000,
+                )
+
+            # One pass: tool calls for this turn, first text for the final answer
+            tool_calls = []
+            final_text = None
+            for block in response.content:
+                if block.type == "tool_use":
+                    tool_calls.append(block)
+                elif block.type == "text" and final_text is None:
+                    final_text = block.text
+
+            if response.stop_reason != "tool_use":
+                break
+
+            results = []
+
+            for tc, output in zip(tool_calls, run_tool_calls(tool_calls, SUB_TOOL_POOL)):
+                tool_count += 1
+                results.append({
+                    "type": "tool_result",
+                    "tool_use_id": tc.id,
+                    "content": externalize(tc, output)
+                })
+
+                elapsed = time.time() - start
+                PROGRESS.update(row, f"{label} ... {tool_count} tools, {elapsed:.1f}s")
+
+            sub_messages.append({"role": "assistant", "content": response.content})
+            sub_messages.append({"role": "user", "content": results})
+        status = "done"
+    finally:
+        elapsed = time.time() - start
+        PROGRESS.finish(row, f"{label} - {status} ({tool_count} tools, {elapsed:.1f}s)")
+
+    if subcontext_id:
         sub_messages.append({"role": "assistant", "content": response.content})
-        sub_messages.append({"role": "user", "content": results})
+        SUBCONTEXTS[key] = sub_messages
 
-    elapsed = time.time() - start
-    sys.stdout.write(
-        f"\r  [{subagent_type}] {description} - done ({tool_count} tools, {elapsed:.1f}s)\n"
-    )
+    return "(subagent returned no text)" if final_text is None else final_text
 
-    for block in response.content:
-        if hasattr(block, "text"):
-            return block.text
 
-    return "(subagent returned no text)"
+# Tool name -> handler taking the tool input, so dispatch is one dict lookup
+TOOL_DISPATCH = {
+    "bash": lambda args: run_bash(args["command"]),
+    "read_file": lambda args: run_read(args["path"], args.get("limit")),
+    "write_file": lambda args: run_write(args["path"], args["content"]),
+    "edit_file": lambda args: run_edit(args["path"], args["old_text"], args["new_text"]),
+    "TodoWrite": lambda args: run_todo(args["items"]),
+    "Task": lambda args: run_task(args["description"], args["prompt"], args["subagent_type"],
+                                  args.get("subcontext_id")),
+    "Skill": lambda args: run_skill(args["skill"], args.get("args")),
+}
 
 
 def execute_tool(name: str, args: dict) -> str:
     """Dispatch tool call to implementation."""
-    if name == "bash":
-        return run_bash(args["command"])
-    if name == "read_file":
-        return run_read(args["path"], args.get("limit"))
-    if name == "write_file":
-        return run_write(args["path"], args["content"])
-    if name == "edit_file":
-        return run_edit(args["path"], args["old_text"], args["new_text"])
-    if name == "TodoWrite":
-        return run_todo(args["items"])
-    if name == "Task":
-        return run_task(args["description"], args["prompt"], args["subagent_type"])
-    if name == "Skill":
-        return run_skill(args["skill"], args.get("args"))
-    return f"Unknown tool: {name}"
+    handler = TOOL_DISPATCH.get(name)
+    if handler is None:
+        return f"Unknown tool: {name}"
+    return handler(args)
 
 
 # =============================================================================
 # Main Agent Loop
 # =============================================================================
 
+# The read-only calls of one turn run side by side (from v3): read_file,
+# Skill loads and Explore Tasks overlap; bash, writes and other Tasks run
+# one at a time, in order. Subagents' own calls get a separate pool, since
+# waiting on your own pool from inside it deadlocks once every worker is a
+# waiting subagent.
+PARALLEL_TOOLS = frozenset({"Skill", "read_file"})
+PARALLEL_AGENTS = frozenset({"Explore"})
+TOOL_POOL = ThreadPoolExecutor(max_workers=8)
+SUB_TOOL_POOL = ThreadPoolExecutor(max_workers=8)
+
+
+def is_read_only(tc) -> bool:
+    """Whether tc can't change files: one of PARALLEL_TOOLS, or a Task for one of PARALLEL_AGENTS."""
+    if tc.name == "Task":
+        return tc.input.get("subagent_type") in PARALLEL_AGENTS
+    return tc.name in PARALLEL_TOOLS
+
+
+def run_tool_calls(tool_calls: list, pool: ThreadPoolExecutor = TOOL_POOL) -> list:
+    """
+    Execute one turn's tool calls, returning their outputs in call order.
+
+    Read-only calls go to pool as they come; any other call first waits for
+    everything before it, then runs on this thread.
+    """
+    futures = []
+    for tc in tool_calls:
+        if is_read_only(tc):
+            futures.append(pool.submit(execute_tool, tc.name, tc.input))
+        else:
+            wait(futures)
+            future = Future()
+            future.set_result(execute_tool(tc.name, tc.input))
+            futures.append(future)
+    return [f.result() for f in futures]
+
+
+# Tool results over MAX_RESULT chars move to TOOL_OUTPUT_DIR when first
+# recorded, leaving a pointer + preview, so history stays append-only and
+# cacheable (from v3). Skill bodies are instructions: they stay whole too.
+MAX_RESULT = 8000
+PREVIEW = 2000
+KEEP_WHOLE = {"read_file", "Skill"}
+
+
+def externalize(tc, output: str) -> str:
+    """Content of tc's tool_result: output itself, or a pointer to it in TOOL_OUTPUT_DIR if large."""
+    if len(output) <= MAX_RESULT or tc.name in KEEP_WHOLE:
+        return output
+    TOOL_OUTPUT_DIR.mkdir(exist_ok=True)
+    path = TOOL_OUTPUT_DIR / f"tool_{tc.id}.txt"
+    path.write_text(output)
+    return (f"[output stored at {path.relative_to(WORKDIR)}, "
+            f"{len(output)} chars]\n{output[:PREVIEW]}...")
+
+
+# Everything up to the newest user message is resent unchanged next turn,
+# so a cache breakpoint there lets that request read the whole history from
+# the prompt cache and pay full price only for the new turn. One such marker
+# is kept (plus the system prompt's), well inside the API's limit of four.
+CACHE_MARK = {"type": "ephemeral"}
+
+
+def mark_cache_breakpoint(messages: list):
+    """Move the conversation's cache breakpoint to the newest user message's last block."""
+    last = messages[-1]
+    if last["role"] != "user" or not isinstance(last["content"], list) or not last["content"]:
+        return
+    for msg in reversed(messages[:-1]):  # Drop the previous marker (one at most)
+        if msg["role"] == "user" and isinstance(msg["content"], list) and msg["content"] \
+                and msg["content"][-1].pop("cache_control", None):
+            break
+    last["content"][-1]["cache_control"] = CACHE_MARK
+
+
 def agent_loop(messages: list) -> list:
     """
     Main agent loop with skills support.
@@ -710,9 +1219,10 @@ def agent_loop(messages: list) -> list:
     When model loads a skill, it receives domain knowledge.
     """
     while True:
+        mark_cache_breakpoint(messages)
         response = client.messages.create(
             model=MODEL,
-            system=SYSTEM,
+            system=SYSTEM_BLOCKS,
             messages=messages,
             tools=ALL_TOOLS,
             max_tokens=8000,
@@ -720,9 +1230,9 @@ def agent_loop(messages: list) -> list:
 
         tool_calls = []
         for block in response.content:
-            if hasattr(block, "text"):
-                print(block.text)
-            if block.type == "tool_use":
+            if block.type == "text":
+                PROGRESS.print(block.text)
+            elif block.type == "tool_use":
                 tool_calls.append(block)
 
         if response.stop_reason != "tool_use":
@@ -730,28 +1240,25 @@ def agent_loop(messages: list) -> list:
             return messages
 
         results = []
-        for tc in tool_calls:
+        for tc, output in zip(tool_calls, run_tool_calls(tool_calls)):
             # Special display for different tool types
             if tc.name == "Task":
-                print(f"\n> Task: {tc.input.get('description', 'subtask')}")
+                PROGRESS.print(f"\n> Task: {tc.input.get('description', 'subtask')}")
             elif tc.name == "Skill":
-                print(f"\n> Loading skill: {tc.input.get('skill', '?')}")
+                PROGRESS.print(f"\n> Loading skill: {tc.input.get('skill', '?')}")
             else:
-                print(f"\n> {tc.name}")
-
-            output = execute_tool(tc.name, tc.input)
+                PROGRESS.print(f"\n> {tc.name}")
 
             # Skill tool shows summary, not full content
             if tc.name == "Skill":
-                print(f"  Skill loaded ({len(output)} chars)")
+                PROGRESS.print(f"  Skill loaded ({len(output)} chars)")
             elif tc.name != "Task":
-                preview = output[:200] + "..." if len(output) > 200 else output
-                print(f"  {preview}")
+                PROGRESS.print(f"  {output[:200]}{'...' if len(output) > 200 else ''}")
 
             results.append({
                 "type": "tool_result",
                 "tool_use_id": tc.id,
-                "content": output
+                "content": externalize(tc, output)
             })
 
         messages.append({"role": "assistant", "content": response.content})
@@ -55,12 +55,16 @@ Usage:
     python v5_compression_agent.py
 """
 
+import functools
 import json
 import os
 import re
+import selectors
+import signal
 import subprocess
 import sys
 import time
+from dataclasses import dataclass
 from pathlib import Path
 
 from anthropic import Anthropic
@@ -368,7 +372,7 @@ class SkillLoader:
     def load_skills(self):
         if not self.skills_dir.exists():
             return
-        for skill_dir in self.skills_dir.iterdir():
+        for skill_dir in sorted(self.skills_dir.iterdir()):  # Stable prompt bytes
             if not skill_dir.is_dir():
                 continue
             skill_md = skill_dir / "SKILL.md"
@@ -444,42 +448,68 @@ def get_agent_descriptions() -> str:
 # TodoManager (from v2)
 # =============================================================================
 
+STATUS_MARK = {"completed": "[x]", "in_progress": "[>]", "pending": "[ ]"}
+VALID_STATUSES = frozenset(STATUS_MARK)
+
+
+@dataclass(slots=True)
+class Todo:
+    """One validated todo item: the fields are fixed, so slots, not a dict."""
+    content: str
+    status: str
+    activeForm: str
+
+
 class TodoManager:
     """Task list manager with constraints (max 20 items, single in_progress)."""
 
     def __init__(self):
         self.items = []
+        self.last = None  # (raw items, rendering) of the last accepted update
 
     def update(self, items: list) -> str:
+        # Resending the list unchanged (a common "ping") skips validation
+        # and returns the last rendering; the raw fields are compared, not
+        # a hash of them, so a collision can't return a stale view
+        key = [(item.get("content"), item.get("status"), item.get("activeForm"))
+               for item in items]
+        last = self.last
+        if last and last[0] == key:
+            return last[1]
+
         validated = []
+        append = validated.append
         in_progress = 0
+
+        # Every item is validated, even past the 20 that are kept
         for i, item in enumerate(items):
-            content = str(item.get("content", "")).strip()
-            status = str(item.get("status", "pending")).lower()
-            active = str(item.get("activeForm", "")).strip()
+            get = item.get
+            content = str(get("content", "")).strip()
+            status = str(get("status", "pending")).lower()
+            active = str(get("activeForm", "")).strip()
             if not content or not active:
                 raise ValueError(f"Item {i}: content and activeForm required")
-            if status not in ("pending", "in_progress", "completed"):
+            if status not in VALID_STATUSES:
                 raise ValueError(f"Item {i}: invalid status")
-            if status == "in_progress":
-                in_progress += 1
-            validated.append({"content": content, "status": status, "activeForm": active})
+            in_progress += status == "in_progress"
+            append(Todo(content, status, active))
 
         if in_progress > 1:
             raise ValueError("Only one task can be in_progress")
         self.items = validated[:20]
-        return self.render()
+        self.last = (key, self.render())
+        return self.last[1]
 
     def render(self) -> str:
         if not self.items:
             return "No todos."
         lines = []
-        for t in self.items:
-            mark = "[x]" if t["status"] == "completed" else \
-                   "[>]" if t["status"] == "in_progress" else "[ ]"
-            lines.append(f"{mark} {t['content']}")
-        done = sum(1 for t in self.items if t["status"] == "completed")
-        return "\n".join(lines) + f"\n({done}/{len(self.items)} done)"
+        done = 0
+        for t in self.items:  # One pass renders and counts
+            status = t.status
+            lines.append(f"{STATUS_MARK[status]} {t.content}")
+            done += status == "completed"
+        return "\n".join(lines) + f"\n({done}/{len(lines)} done)"
 
 
 TODO = TodoManager()
@@ -627,42 +657,101 @@ def get_tools_for_agent(agent_type: str) -> list:
     return [t for t in BASE_TOOLS if t["name"] in allowed]
 
 
+# Agent types are fixed, so each one's tool list is built once, at import
+SUB_TOOLS = {name: get_tools_for_agent(name) for name in AGENT_TYPES}
+
+
 # =============================================================================
 # Tool Implementations
 # =============================================================================
 
+# Resolved once, so safe_path is a realpath() plus a string prefix check
+WORKDIR_REAL = os.path.realpath(WORKDIR)
+WORKDIR_PREFIX = os.path.join(WORKDIR_REAL, "")
+
+
 def safe_path(p: str) -> Path:
-    path = (WORKDIR / p).resolve()
-    if not path.is_relative_to(WORKDIR):
+    path = os.path.realpath(os.path.join(WORKDIR_REAL, p))
+    if path != WORKDIR_REAL and not path.startswith(WORKDIR_PREFIX):
         raise ValueError(f"Path escapes workspace: {p}")
-    return path
+    return Path(path)
+
+
+DANGEROUS = ["rm -rf /", "sudo", "shutdown"]
+DANGEROUS_RE = re.compile("|".join(map(re.escape, DANGEROUS)))  # One scan per command
 
 
 def run_bash(cmd: str) -> str:
-    if any(d in cmd for d in ["rm -rf /", "sudo", "shutdown"]):
+    if DANGEROUS_RE.search(cmd):
         return "Error: Dangerous command"
     try:
-        r = subprocess.run(cmd, shell=True, cwd=WORKDIR, capture_output=True, text=True, timeout=120)
-        return ((r.stdout + r.stderr).strip() or "(no output)")[:50000]
+        return _exec_bash(cmd)
+    finally:
+        read_cached.cache_clear()  # The command may have changed any file
+
+
+def _exec_bash(cmd: str, timeout=120) -> str:
+    """
+    Run cmd (stderr merged), keeping only the first 50000 bytes of output.
+
+    Output is read as it arrives instead of buffered whole by
+    subprocess.run: past the cap it is read and dropped, so a runaway
+    `find /` costs 50KB of memory while the command still runs to the end.
+    On timeout the command's whole process group is killed.
+    """
+    try:
+        p = subprocess.Popen(cmd, shell=True, cwd=WORKDIR, stdout=subprocess.PIPE,
+                             stderr=subprocess.STDOUT, start_new_session=True)
+        deadline = time.monotonic() + timeout
+        buf = bytearray()
+        with p.stdout, selectors.DefaultSelector() as sel:
+            sel.register(p.stdout, selectors.EVENT_READ)
+            while sel.select(deadline - time.monotonic()):
+                chunk = os.read(p.stdout.fileno(), 65536)
+                if not chunk:
+                    break
+                buf += chunk[:50000 - len(buf)]
+        try:
+            # The deadline still holds if the command closed stdout early
+            p.wait(timeout=max(deadline - time.monotonic(), 0))
+        except subprocess.TimeoutExpired:
+            os.killpg(p.pid, signal.SIGKILL)  # Shell, command and its children
+            p.wait()
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        return buf.decode(errors="replace").strip() or "(no output)"
     except Exception as e:
         return f"Error: {e}"
 
 
 def run_read(path: str, limit: int = None) -> str:
     try:
-        lines = safe_path(path).read_text().splitlines()
-        if limit:
-            lines = lines[:limit]
-        return "\n".join(lines)[:50000]
+        fp = safe_path(path)
+        st = os.stat(fp)
+        return read_cached(fp, limit, (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns))
     except Exception as e:
         return f"Error: {e}"
 
 
+@functools.lru_cache(maxsize=256)
+def read_cached(fp: Path, limit: int, stamp: tuple) -> str:
+    """
+    The body of run_read, memoized on the file's stat stamp (as in v1-v4).
+    Re-reading is how the model gets back a result microcompact cleared,
+    so in v5 the same files come back again and again; write, edit and
+    bash clear the cache.
+    """
+    lines = fp.read_text().splitlines()
+    if limit:
+        lines = lines[:limit]
+    return "\n".join(lines)[:50000]
+
+
 def run_write(path: str, content: str) -> str:
     try:
         fp = safe_path(path)
         fp.parent.mkdir(parents=True, exist_ok=True)
         fp.write_text(content)
+        read_cached.cache_clear()
         return f"Wrote {len(content)} bytes to {path}"
     except Exception as e:
         return f"Error: {e}"
@@ -675,6 +764,7 @@ def run_edit(path: str, old_text: str, new_text: str) -> str:
         if old_text not in text:
             return f"Error: Text not found in {path}"
         fp.write_text(text.replace(old_text, new_text, 1))
+        read_cached.cache_clear()
         return f"Edited {path}"
     except Exception as e:
         return f"Error: {e}"
@@ -711,12 +801,13 @@ def run_task(description: str, prompt: str, agent_type: str) -> str:
 
 Complete the task and return a clear, concise summary."""
 
-    sub_tools = get_tools_for_agent(agent_type)
+    sub_tools = SUB_TOOLS[agent_type]
     sub_messages = [{"role": "user", "content": prompt}]
 
     print(f"  [{agent_type}] {description}")
     start = time.time()
     tool_count = 0
+    painted = -1.0  # Elapsed time of the last progress repaint
 
     while True:
         # v5: Subagents also compress when needed
@@ -740,8 +831,10 @@ Complete the task and return a clear, concise summary."""
             output = CTX.handle_large_output(output)
             results.append({"type": "tool_result", "tool_use_id": tc.id, "content": output})
             elapsed = time.time() - start
-            sys.stdout.write(f"\r  [{agent_type}] {description} ... {tool_count} tools, {elapsed:.1f}s")
-            sys.stdout.flush()
+            if elapsed - painted >= 0.1:  # At most 10 repaints/s; "done" always shows
+                painted = elapsed
+                sys.stdout.write(f"\r  [{agent_type}] {description} ... {tool_count} tools, {elapsed:.1f}s")
+                sys.stdout.flush()
 
         sub_messages.append({"role": "assistant", "content": response.content})
         sub_messages.append({"role": "user", "content": results})
@@ -755,22 +848,23 @@ Complete the task and return a clear, concise summary."""
     return "(subagent returned no text)"
 
 
+# Tool name -> handler taking the tool input, so dispatch is one dict lookup
+TOOL_DISPATCH = {
+    "bash": lambda args: run_bash(args["command"]),
+    "read_file": lambda args: run_read(args["path"], args.get("limit")),
+    "write_file": lambda args: run_write(args["path"], args["content"]),
+    "edit_file": lambda args: run_edit(args["path"], args["old_text"], args["new_text"]),
+    "TodoWrite": lambda args: run_todo(args["items"]),
+    "Task": lambda args: run_task(args["description"], args["prompt"], args["agent_type"]),
+    "Skill": lambda args: run_skill(args["skill"]),
+}
+
+
 def execute_tool(name: str, args: dict) -> str:
-    if name == "bash":
-        return run_bash(args["command"])
-    if name == "read_file":
-        return run_read(args["path"], args.get("limit"))
-    if name == "write_file":
-        return run_write(args["path"], args["content"])
-    if name == "edit_file":
-        return run_edit(args["path"], args["old_text"], args["new_text"])
-    if name == "TodoWrite":
-        return run_todo(args["items"])
-    if name == "Task":
-        return run_task(args["description"], args["prompt"], args["agent_type"])
-    if name == "Skill":
-        return run_skill(args["skill"])
-    return f"Unknown tool: {name}"
+    handler = TOOL_DISPATCH.get(name)
+    if handler is None:
+        return f"Unknown tool: {name}"
+    return handler(args)
 
 
 # =============================================================================
@@ -843,8 +937,7 @@ def agent_loop(messages: list) -> list:
             if tc.name == "Skill":
                 print(f"  Skill loaded ({len(output)} chars)")
             elif tc.name != "Task":
-                preview = output[:200] + "..." if len(output) > 200 else output
-                print(f"  {preview}")
+                print(f"  {output[:200]}{'...' if len(output) > 200 else ''}")
 
             results.append({"type": "tool_result", "tool_use_id": tc.id, "content": output})
 
@@ -56,6 +56,8 @@ Usage:
 import json
 import os
 import re
+import selectors
+import signal
 import subprocess
 import sys
 import time
@@ -554,7 +556,7 @@ class SkillLoader:
     def load_skills(self):
         if not self.skills_dir.exists():
             return
-        for skill_dir in self.skills_dir.iterdir():
+        for skill_dir in sorted(self.skills_dir.iterdir()):  # Stable prompt bytes
             if not skill_dir.is_dir():
                 continue
             skill_md = skill_dir / "SKILL.md"
@@ -623,40 +625,68 @@ def get_agent_descriptions() -> str:
 # TodoManager (from v2) - Only used when TASKS_ENABLED=False
 # =============================================================================
 
+STATUS_MARK = {"completed": "[x]", "in_progress": "[>]", "pending": "[ ]"}
+VALID_STATUSES = frozenset(STATUS_MARK)
+
+
+@dataclass(slots=True)
+class Todo:
+    """One validated todo item: the fields are fixed, so slots, not a dict."""
+    content: str
+    status: str
+    activeForm: str
+
+
 class TodoManager:
     """Task list manager with constraints (max 20 items, single in_progress)."""
 
     def __init__(self):
         self.items = []
+        self.last = None  # (raw items, rendering) of the last accepted update
 
     def update(self, items: list) -> str:
+        # Resending the list unchanged (a common "ping") skips validation
+        # and returns the last rendering; the raw fields are compared, not
+        # a hash of them, so a collision can't return a stale view
+        key = [(item.get("content"), item.get("status"), item.get("activeForm"))
+               for item in items]
+        last = self.last
+        if last and last[0] == key:
+            return last[1]
+
         validated = []
+        append = validated.append
         in_progress = 0
+
+        # Every item is validated, even past the 20 that are kept
         for i, item in enumerate(items):
-            content = str(item.get("content", "")).strip()
-            status = str(item.get("status", "pending")).lower()
-            active = str(item.get("activeForm", "")).strip()
+            get = item.get
+            content = str(get("content", "")).strip()
+            status = str(get("status", "pending")).lower()
+            active = str(get("activeForm", "")).strip()
             if not content or not active:
                 raise ValueError(f"Item {i}: content and activeForm required")
-            if status not in ("pending", "in_progress", "completed"):
+            if status not in VALID_STATUSES:
                 raise ValueError(f"Item {i}: invalid status")
-            if status == "in_progress":
-                in_progress += 1
-            validated.append({"content": content, "status": status, "activeForm": active})
+            in_progress += status == "in_progress"
+            append(Todo(content, status, active))
+
         if in_progress > 1:
             raise ValueError("Only one task can be in_progress")
         self.items = validated[:20]
-        return self.render()
+        self.last = (key, self.render())
+        return self.last[1]
 
     def render(self) -> str:
         if not self.items:
             return "No todos."
         lines = []
-        for t in self.items:
-            mark = "[x]" if t["status"] == "completed" else "[>]" if t["status"] == "in_progress" else "[ ]"
-            lines.append(f"{mark} {t['content']}")
-        done = sum(1 for t in self.items if t["status"] == "completed")
-        return "\n".join(lines) + f"\n({done}/{len(self.items)} done)"
+        done = 0
+        for t in self.items:  # One pass renders and counts
+            status = t.status
+            lines.append(f"{STATUS_MARK[status]} {t.content}")
+            done += status == "completed"
+        return "\n".join(lines) + f"\n({done}/{len(lines)} done)"
 
 
 TODO = TodoManager()
@@ -792,23 +822,65 @@ def get_tools_for_agent(agent_type: str) -> list:
     return [t for t in BASE_TOOLS if t["name"] in allowed]
 
 
+# Agent types are fixed, so each one's tool list is built once, at import
+SUB_TOOLS = {name: get_tools_for_agent(name) for name in AGENT_TYPES}
+
+
 # =============================================================================
 # Tool Implementations
 # =============================================================================
 
+# Resolved once, so safe_path is a realpath() plus a string prefix check
+WORKDIR_REAL = os.path.realpath(WORKDIR)
+WORKDIR_PREFIX = os.path.join(WORKDIR_REAL, "")
+
+
 def safe_path(p: str) -> Path:
-    path = (WORKDIR / p).resolve()
-    if not path.is_relative_to(WORKDIR):
+    path = os.path.realpath(os.path.join(WORKDIR_REAL, p))
+    if path != WORKDIR_REAL and not path.startswith(WORKDIR_PREFIX):
         raise ValueError(f"Path escapes workspace: {p}")
-    return path
+    return Path(path)
+
+
+DANGEROUS = ["rm -rf /", "sudo", "shutdown"]
+DANGEROUS_RE = re.compile("|".join(map(re.escape, DANGEROUS)))  # One scan per command
 
 
 def run_bash(cmd: str) -> str:
-    if any(d in cmd for d in ["rm -rf /", "sudo", "shutdown"]):
+    if DANGEROUS_RE.search(cmd):
         return "Error: Dangerous command"
+    return _exec_bash(cmd)
+
+
+def _exec_bash(cmd: str, timeout=120) -> str:
+    """
+    Run cmd (stderr merged), keeping only the first 50000 bytes of output.
+
+    Output is read as it arrives instead of buffered whole by
+    subprocess.run: past the cap it is read and dropped, so a runaway
+    `find /` costs 50KB of memory while the command still runs to the end.
+    On timeout the command's whole process group is killed.
+    """
     try:
-        r = subprocess.run(cmd, shell=True, cwd=WORKDIR, capture_output=True, text=True, timeout=120)
-        return ((r.stdout + r.stderr).strip() or "(no output)")[:50000]
+        p = subprocess.Popen(cmd, shell=True, cwd=WORKDIR, stdout=subprocess.PIPE,
+                             stderr=subprocess.STDOUT, start_new_session=True)
+        deadline = time.monotonic() + timeout
+        buf = bytearray()
+        with p.stdout, selectors.DefaultSelector() as sel:
+            sel.register(p.stdout, selectors.EVENT_READ)
+            while sel.select(deadline - time.monotonic()):
+                chunk = os.read(p.stdout.fileno(), 65536)
+                if not chunk:
+                    break
+                buf += chunk[:50000 - len(buf)]
+        try:
+            # The deadline still holds if the command closed stdout early
+            p.wait(timeout=max(deadline - time.monotonic(), 0))
+        except subprocess.TimeoutExpired:
+            os.killpg(p.pid, signal.SIGKILL)  # Shell, command and its children
+            p.wait()
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        return buf.decode(errors="replace").strip() or "(no output)"
     except Exception as e:
         return f"Error: {e}"
 
@@ -904,12 +976,13 @@ def run_subagent(description: str, prompt: str, agent_type: str) -> str:
 
     config = AGENT_TYPES[agent_type]
     sub_system = f"You are a {agent_type} subagent at {WORKDIR}.\n\n{config['prompt']}\n\nComplete the task and return a clear, concise summary."
-    sub_tools = get_tools_for_agent(agent_type)
+    sub_tools = SUB_TOOLS[agent_type]
     sub_messages = [{"role": "user", "content": prompt}]
 
     print(f"  [{agent_type}] {description}")
     start = time.time()
     tool_count = 0
+    painted = -1.0  # Elapsed time of the last progress repaint
 
     while True:
         sub_messages = CTX.microcompact(sub_messages)
@@ -927,8 +1000,11 @@ def run_subagent(description: str, prompt: str, agent_type: str) -> str:
             output = execute_tool(tc.name, tc.input)
             output = CTX.handle_large_output(output)
             results.append({"type": "tool_result", "tool_use_id": tc.id, "content": output})
-            sys.stdout.write(f"\r  [{agent_type}] {description} ... {tool_count} tools, {time.time()-start:.1f}s")
-            sys.stdout.flush()
+            elapsed = time.time() - start
+            if elapsed - painted >= 0.1:  # At most 10 repaints/s; "done" always shows
+                painted = elapsed
+                sys.stdout.write(f"\r  [{agent_type}] {description} ... {tool_count} tools, {elapsed:.1f}s")
+                sys.stdout.flush()
 
         sub_messages.append({"role": "assistant", "content": response.content})
         sub_messages.append({"role": "user", "content": results})
@@ -1024,8 +1100,7 @@ def agent_loop(messages: list) -> list:
             if tc.name == "Skill":
                 print(f"  Skill loaded ({len(output)} chars)")
             elif tc.name != "Task":
-                preview = output[:200] + "..." if len(output) > 200 else output
-                print(f"  {preview}")
+                print(f"  {output[:200]}{'...' if len(output) > 200 else ''}")
 
             results.append({"type": "tool_result", "tool_use_id": tc.id, "content": output})
 
@@ -61,6 +61,8 @@ Usage:
 import json
 import os
 import re
+import selectors
+import signal
 import subprocess
 import sys
 import time
@@ -870,7 +872,7 @@ class SkillLoader:
     def load_skills(self):
         if not self.skills_dir.exists():
             return
-        for skill_dir in self.skills_dir.iterdir():
+        for skill_dir in sorted(self.skills_dir.iterdir()):  # Stable prompt bytes
             if not skill_dir.is_dir():
                 continue
             skill_md = skill_dir / "SKILL.md"
@@ -1078,6 +1080,10 @@ def get_tools_for_agent(agent_type: str) -> list:
     return [t for t in BASE_TOOLS if t["name"] in allowed]
 
 
+# Agent types are fixed, so each one's tool list is built once, at import
+SUB_TOOLS = {name: get_tools_for_agent(name) for name in AGENT_TYPES}
+
+
 def _get_teammate_tools() -> list:
     """Get tools for a persistent teammate (base + tasks).
     In production, tools would be filtered per agent_type."""
@@ -1088,15 +1094,24 @@ def _get_teammate_tools() -> list:
 # Tool Implementations
 # =============================================================================
 
+# Resolved once, so safe_path is a realpath() plus a string prefix check
+WORKDIR_REAL = os.path.realpath(WORKDIR)
+WORKDIR_PREFIX = os.path.join(WORKDIR_REAL, "")
+
+
 def safe_path(p: str) -> Path:
-    path = (WORKDIR / p).resolve()
-    if not path.is_relative_to(WORKDIR):
+    path = os.path.realpath(os.path.join(WORKDIR_REAL, p))
+    if path != WORKDIR_REAL and not path.startswith(WORKDIR_PREFIX):
         raise ValueError(f"Path escapes workspace: {p}")
-    return path
+    return Path(path)
+
+
+DANGEROUS = ["rm -rf /", "sudo", "shutdown"]
+DANGEROUS_RE = re.compile("|".join(map(re.escape, DANGEROUS)))  # One scan per command
 
 
 def run_bash(cmd: str, background: bool = False) -> str:
-    if any(d in cmd for d in ["rm -rf /", "sudo", "shutdown"]):
+    if DANGEROUS_RE.search(cmd):
         return "Error: Dangerous command"
 
     if background:
@@ -1106,10 +1121,35 @@ def run_bash(cmd: str, background: bool = False) -> str:
     return _exec_bash(cmd)
 
 
-def _exec_bash(cmd: str) -> str:
+def _exec_bash(cmd: str, timeout=120) -> str:
+    """
+    Run cmd (stderr merged), keeping only the first 50000 bytes of output.
+
+    Output is read as it arrives instead of buffered whole by
+    subprocess.run: past the cap it is read and dropped, so a runaway
+    `find /` costs 50KB of memory while the command still runs to the end.
+    On timeout the command's whole process group is killed.
+    """
     try:
-        r = subprocess.run(cmd, shell=True, cwd=WORKDIR, capture_output=True, text=True, timeout=120)
-        return ((r.stdout + r.stderr).strip() or "(no output)")[:50000]
+        p = subprocess.Popen(cmd, shell=True, cwd=WORKDIR, stdout=subprocess.PIPE,
+                             stderr=subprocess.STDOUT, start_new_session=True)
+        deadline = time.monotonic() + timeout
+        buf = bytearray()
+        with p.stdout, selectors.DefaultSelector() as sel:
+            sel.register(p.stdout, selectors.EVENT_READ)
+            while sel.select(deadline - time.monotonic()):
+                chunk = os.read(p.stdout.fileno(), 65536)
+                if not chunk:
+                    break
+                buf += chunk[:50000 - len(buf)]
+        try:
+            # The deadline still holds if the command closed stdout early
+            p.wait(timeout=max(deadline - time.monotonic(), 0))
+        except subprocess.TimeoutExpired:
+            os.killpg(p.pid, signal.SIGKILL)  # Shell, command and its children
+            p.wait()
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        return buf.decode(errors="replace").strip() or "(no output)"
     except Exception as e:
         return f"Error: {e}"
 
@@ -1175,7 +1215,7 @@ def run_subagent(description: str, prompt: str, agent_type: str,
 def _exec_subagent(description: str, prompt: str, agent_type: str) -> str:
     config = AGENT_TYPES[agent_type]
     sub_system = f"You are a {agent_type} subagent at {WORKDIR}.\n\n{config['prompt']}\n\nComplete the task and return a concise summary."
-    sub_tools = get_tools_for_agent(agent_type)
+    sub_tools = SUB_TOOLS[agent_type]
     sub_messages = [{"role": "user", "content": prompt}]
 
     while True:
@@ -1349,8 +1389,7 @@ def agent_loop(messages: list) -> list:
             if tc.name == "Skill":
                 print(f"  Skill loaded ({len(output)} chars)")
             elif tc.name != "Task" or tc.input.get("run_in_background") or tc.input.get("team_name"):
-                preview = output[:200] + "..." if len(output) > 200 else output
-                print(f"  {preview}")
+                print(f"  {output[:200]}{'...' if len(output) > 200 else ''}")
 
             results.append({"type": "tool_result", "tool_use_id": tc.id, "content": output})
 
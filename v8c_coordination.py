@@ -75,6 +75,8 @@ Usage:
 import json
 import os
 import re
+import selectors
+import signal
 import subprocess
 import sys
 import time
@@ -177,18 +179,19 @@ class TeammateManager:
         plan_approval_response - team lead approves/rejects a plan
     """
 
-    def __init__(self):
+    def __init__(self, teams_dir: Path = None):
+        self.teams_dir = teams_dir or TEAMS_DIR
         self._teams: dict[str, dict[str, Teammate]] = {}
         self._lock = threading.Lock()
         self._pending_shutdowns: dict[str, str] = {}  # request_id -> teammate_name
-        TEAMS_DIR.mkdir(exist_ok=True)
+        self.teams_dir.mkdir(exist_ok=True)
 
     def create_team(self, name: str, description: str = "", lead_agent_id: str = "lead") -> str:
         with self._lock:
             if name in self._teams:
                 return f"Team '{name}' already exists"
             self._teams[name] = {}
-            team_dir = TEAMS_DIR / name
+            team_dir = self.teams_dir / name
             team_dir.mkdir(exist_ok=True)
             config_path = team_dir / "config.json"
             config_path.write_text(json.dumps({
@@ -209,7 +212,7 @@ class TeammateManager:
                 return f"Error: Teammate '{name}' already exists in team '{team_name}'"
 
             color_idx = len(self._teams[team_name]) % len(TEAMMATE_COLORS)
-            inbox_path = TEAMS_DIR / team_name / f"{name}_inbox.jsonl"
+            inbox_path = self.teams_dir / team_name / f"{name}_inbox.jsonl"
             teammate = Teammate(
                 name=name,
                 team_name=team_name,
@@ -235,7 +238,7 @@ class TeammateManager:
 
     def _update_team_config(self, team_name: str):
         """Update config.json to reflect current team membership and status."""
-        team_dir = TEAMS_DIR / team_name
+        team_dir = self.teams_dir / team_name
         config_path = team_dir / "config.json"
         config = {}
         if config_path.exists():
@@ -727,6 +730,23 @@ class TaskManager:
     def get(self, task_id: str) -> Task:
         return self._load_task(task_id)
 
+    def claim(self, task_id: str, owner: str) -> Task:
+        """
+        Make owner the task's owner unless someone else already is.
+
+        Check and write happen under one lock, so of two teammates racing
+        for the same task exactly one wins; the other gets a ValueError.
+        """
+        with self._lock:
+            task = self._load_task(task_id)
+            if not task:
+                return None
+            if task.owner and task.owner != owner:
+                raise ValueError(f"Task {task_id} already claimed by {task.owner}")
+            task.owner = owner
+            self._save_task(task)
+            return task
+
     def update(self, task_id: str, **kwargs) -> Task:
         with self._lock:
             task = self._load_task(task_id)
@@ -1061,7 +1081,7 @@ class SkillLoader:
     def load_skills(self):
         if not self.skills_dir.exists():
             return
-        for skill_dir in self.skills_dir.iterdir():
+        for skill_dir in sorted(self.skills_dir.iterdir()):  # Stable prompt bytes
             if not skill_dir.is_dir():
                 continue
             skill_md = skill_dir / "SKILL.md"
@@ -1285,6 +1305,10 @@ def get_tools_for_agent(agent_type: str) -> list:
     return [t for t in BASE_TOOLS if t["name"] in allowed]
 
 
+# Agent types are fixed, so each one's tool list is built once, at import
+SUB_TOOLS = {name: get_tools_for_agent(name) for name in AGENT_TYPES}
+
+
 def _get_teammate_tools() -> list:
     """Get tools for a persistent teammate (base + tasks + messaging)."""
     return TEAMMATE_TOOLS
@@ -1294,15 +1318,24 @@ def _get_teammate_tools() -> list:
 # Tool Implementations
 # =============================================================================
 
+# Resolved once, so safe_path is a realpath() plus a string prefix check
+WORKDIR_REAL = os.path.realpath(WORKDIR)
+WORKDIR_PREFIX = os.path.join(WORKDIR_REAL, "")
+
+
 def safe_path(p: str) -> Path:
-    path = (WORKDIR / p).resolve()
-    if not path.is_relative_to(WORKDIR):
+    path = os.path.realpath(os.path.join(WORKDIR_REAL, p))
+    if path != WORKDIR_REAL and not path.startswith(WORKDIR_PREFIX):
         raise ValueError(f"Path escapes workspace: {p}")
-    return path
+    return Path(path)
+
+
+DANGEROUS = ["rm -rf /", "sudo", "shutdown"]
+DANGEROUS_RE = re.compile("|".join(map(re.escape, DANGEROUS)))  # One scan per command
 
 
 def run_bash(cmd: str, background: bool = False) -> str:
-    if any(d in cmd for d in ["rm -rf /", "sudo", "shutdown"]):
+    if DANGEROUS_RE.search(cmd):
         return "Error: Dangerous command"
 
     if background:
@@ -1312,10 +1345,35 @@ def run_bash(cmd: str, background: bool = False) -> str:
     return _exec_bash(cmd)
 
 
-def _exec_bash(cmd: str) -> str:
+def _exec_bash(cmd: str, timeout=120) -> str:
+    """
+    Run cmd (stderr merged), keeping only the first 50000 bytes of output.
+
+    Output is read as it arrives instead of buffered whole by
+    subprocess.run: past the cap it is read and dropped, so a runaway
+    `find /` costs 50KB of memory while the command still runs to the end.
+    On timeout the command's whole process group is killed.
+    """
     try:
-        r = subprocess.run(cmd, shell=True, cwd=WORKDIR, capture_output=True, text=True, timeout=120)
-        return ((r.stdout + r.stderr).strip() or "(no output)")[:50000]
+        p = subprocess.Popen(cmd, shell=True, cwd=WORKDIR, stdout=subprocess.PIPE,
+                             stderr=subprocess.STDOUT, start_new_session=True)
+        deadline = time.monotonic() + timeout
+        buf = bytearray()
+        with p.stdout, selectors.DefaultSelector() as sel:
+            sel.register(p.stdout, selectors.EVENT_READ)
+            while sel.select(deadline - time.monotonic()):
+                chunk = os.read(p.stdout.fileno(), 65536)
+                if not chunk:
+                    break
+                buf += chunk[:50000 - len(buf)]
+        try:
+            # The deadline still holds if the command closed stdout early
+            p.wait(timeout=max(deadline - time.monotonic(), 0))
+        except subprocess.TimeoutExpired:
+            os.killpg(p.pid, signal.SIGKILL)  # Shell, command and its children
+            p.wait()
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        return buf.decode(errors="replace").strip() or "(no output)"
     except Exception as e:
         return f"Error: {e}"
 
@@ -1381,7 +1439,7 @@ def run_subagent(description: str, prompt: str, agent_type: str,
 def _exec_subagent(description: str, prompt: str, agent_type: str) -> str:
     config = AGENT_TYPES[agent_type]
     sub_system = f"You are a {agent_type} subagent at {WORKDIR}.\n\n{config['prompt']}\n\nComplete the task and return a concise summary."
-    sub_tools = get_tools_for_agent(agent_type)
+    sub_tools = SUB_TOOLS[agent_type]
     sub_messages = [{"role": "user", "content": prompt}]
 
     while True:
@@ -1425,7 +1483,12 @@ def run_task_update(task_id: str, **kwargs) -> str:
         if TASK_MGR.delete(task_id):
             return f"Task {task_id} deleted"
         return f"Error: Task {task_id} not found"
-    task = TASK_MGR.update(task_id, **kwargs)
+    try:
+        if kwargs.get("owner"):  # Claims are first come, first served
+            TASK_MGR.claim(task_id, kwargs.pop("owner"))
+        task = TASK_MGR.update(task_id, **kwargs)
+    except ValueError as e:
+        return f"Error: {e}"
     if not task:
         return f"Error: Task {task_id} not found"
     return json.dumps({"id": task.id, "status": task.status, "blocked_by": task.blocked_by})
@@ -1566,8 +1629,7 @@ def agent_loop(messages: list) -> list:
             if tc.name == "Skill":
                 print(f"  Skill loaded ({len(output)} chars)")
             elif tc.name != "Task" or tc.input.get("run_in_background") or tc.input.get("team_name"):
-                preview = output[:200] + "..." if len(output) > 200 else output
-                print(f"  {preview}")
+                print(f"  {output[:200]}{'...' if len(output) > 200 else ''}")
 
             results.append({"type": "tool_result", "tool_use_id": tc.id, "content": output})
 